@@ -12,6 +12,9 @@ from app.models.reference import Reference
 from app.models.pdf_source import PDFSource
 from app.models.document_version import DocumentVersion
 from app.models.comment import Comment
+from app.models.chunk_fingerprint import ChunkFingerprint
+from app.models.paper_metadata import PaperMetadata
+from app.models.reference_fingerprint import ReferenceFingerprint
 from app.db.database import Base
 
 # this is the Alembic Config object, which provides
@@ -3,10 +3,15 @@ from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
+from datetime import datetime
+import tempfile
+import asyncio
 import os
 
 from app.db.database import get_db
-from app.services.pdf_service import PDFService
+from app.services.pdf_service import PDFService, PDFSearchFilters
+from app.services.storage_service import get_storage
+from app.services.import_service import ImportService
 
 router = APIRouter()
 
@@ -61,12 +66,24 @@ async def upload_pdf(
         user_id=None  # 实际应该使用current_user.id
     )
     
+    # 登记PDF源文件记录，供按文档检索时解析PDF集合
+    pdf_source = PDFService.register_pdf_source(db, file_info, document_id)
+    
+    # 相同内容的文件已完成索引或正在处理时不重复处理，返回已有记录的状态；此前处理失败或中断的重新处理
+    if not PDFService.claim_processing(db, file_info["id"]):
+        db.refresh(pdf_source)
+        return {
+            "message": "PDF文件已存在" if pdf_source.index_status == "completed" else "PDF文件正在处理中",
+            "pdf_id": file_info["id"],
+            "filename": file_info["filename"],
+            "size": file_info["size"],
+            "document_id": document_id,
+            "index_status": pdf_source.index_status
+        }
+    
     # 在后台处理PDF
     async def process_pdf_task():
-        await PDFService.process_pdf(
-            pdf_id=file_info["id"],
-            file_path=file_info["path"]
-        )
+        await PDFService.process_stored_pdf(file_info["id"])
     
     # 添加后台任务
     background_tasks.add_task(process_pdf_task)
@@ -80,6 +97,71 @@ async def upload_pdf(
     }
 
 
+@router.post("/import")
+async def import_pdfs(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    document_id: Optional[int] = Form(None),
+    # current_user = Depends(get_current_user) # 暂时注释掉认证
+):
+    """
+    批量导入PDF
+    
+    上传包含PDF的ZIP文件，后台逐个流式解压、按内容哈希跳过重复文件并并行处理
+    """
+    if not file.filename.lower().endswith('.zip'):
+        raise HTTPException(
+            status_code=400,
+            detail="只接受ZIP文件"
+        )
+    
+    # 分块写入临时文件，避免将整个压缩包读入内存
+    fd, zip_path = tempfile.mkstemp(suffix=".zip")
+    queued = False
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                block = await file.read(ImportService.CHUNK_SIZE)
+                if not block:
+                    break
+                await asyncio.to_thread(f.write, block)
+        
+        job = ImportService.create_job(file.filename)
+        
+        async def import_task():
+            await ImportService.run_import(job, zip_path, document_id=document_id, cleanup=True)
+        
+        background_tasks.add_task(import_task)
+        queued = True
+    finally:
+        # 上传失败时删除临时文件，成功时由导入任务完成后删除
+        if not queued:
+            os.remove(zip_path)
+    
+    return {
+        "message": "ZIP文件已上传，正在导入",
+        "job_id": job["job_id"]
+    }
+
+
+@router.get("/import/{job_id}")
+async def get_import_status(
+    job_id: str,
+    # current_user = Depends(get_current_user) # 暂时注释掉认证
+):
+    """
+    获取批量导入进度
+    """
+    job = await ImportService.get_job(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=404,
+            detail=f"找不到ID为 {job_id} 的导入任务"
+        )
+    
+    return job
+
+
 @router.get("/status/{pdf_id}")
 async def get_pdf_status(
     pdf_id: str,
@@ -91,32 +173,32 @@ async def get_pdf_status(
     
     检查PDF是否已完成处理和向量化
     """
-    # 检查向量存储是否存在
-    collection_name = f"pdf_{pdf_id}"
-    vector_db_path = PDFService.VECTOR_DIR + f"/{collection_name}"
+    # 按ID直接读取文件元数据
+    file_info = await asyncio.to_thread(get_storage().get_metadata, pdf_id)
     
-    if os.path.exists(vector_db_path):
-        return {
-            "pdf_id": pdf_id,
-            "status": "processed",
-            "vector_db": True
-        }
+    if not file_info:
+        raise HTTPException(
+            status_code=404,
+            detail=f"找不到ID为 {pdf_id} 的PDF文件"
+        )
     
-    # 检查PDF文件是否存在
-    pdf_files = [f for f in os.listdir(PDFService.PDF_DIR) if f.startswith(f"{pdf_id}_")]
+    # 旧布局文件没有持久化状态，以向量存储是否存在为准
+    status = file_info.get("status")
+    if file_info.get("legacy") and os.path.exists(os.path.join(PDFService.VECTOR_DIR, f"pdf_{pdf_id}")):
+        status = "processed"
     
-    if pdf_files:
+    if status == "processed":
         return {
             "pdf_id": pdf_id,
-            "status": "processing",
-            "filename": pdf_files[0]
+            "status": "processed",
+            "vector_db": True
         }
     
-    # 文件不存在
-    raise HTTPException(
-        status_code=404,
-        detail=f"找不到ID为 {pdf_id} 的PDF文件"
-    )
+    return {
+        "pdf_id": pdf_id,
+        "status": "failed" if status == "failed" else "processing",
+        "filename": file_info["filename"]
+    }
 
 
 @router.get("/search/{pdf_id}")
@@ -191,29 +273,29 @@ async def list_pdfs(
     
     返回所有上传的PDF文件信息
     """
-    # 获取PDF目录中的所有文件
-    pdf_files = os.listdir(PDFService.PDF_DIR)
-    
-    # 解析文件信息
-    pdf_list = []
-    for file in pdf_files:
-        if file.endswith(".pdf"):
-            parts = file.split("_", 1)
-            if len(parts) == 2:
-                pdf_id = parts[0]
-                filename = parts[1]
-                
-                # 检查向量存储状态
-                collection_name = f"pdf_{pdf_id}"
-                vector_db_path = os.path.join(PDFService.VECTOR_DIR, collection_name)
+    def collect_pdfs():
+        pdf_list = []
+        for file_info in get_storage().iter_metadata():
+            processed = file_info.get("status") == "processed"
+            if file_info.get("legacy"):
+                # 旧布局文件以向量存储是否存在判断状态
+                vector_db_path = os.path.join(PDFService.VECTOR_DIR, f"pdf_{file_info['id']}")
                 processed = os.path.exists(vector_db_path)
-                
-                pdf_list.append({
-                    "pdf_id": pdf_id,
-                    "filename": filename,
-                    "processed": processed,
-                    "upload_time": os.path.getctime(os.path.join(PDFService.PDF_DIR, file))
-                })
+            
+            upload_time = file_info.get("upload_time")
+            if isinstance(upload_time, str):
+                upload_time = datetime.fromisoformat(upload_time).timestamp()
+            
+            pdf_list.append({
+                "pdf_id": file_info["id"],
+                "filename": file_info["filename"],
+                "processed": processed,
+                "upload_time": upload_time
+            })
+        return pdf_list
+    
+    # 遍历存储后端中的文件元数据
+    pdf_list = await asyncio.to_thread(collect_pdfs)
     
     # 按上传时间排序
     pdf_list.sort(key=lambda x: x["upload_time"], reverse=True)
@@ -230,31 +312,26 @@ async def bulk_search_pdfs(
     pdf_ids: List[str] = Query(None, description="要搜索的PDF ID列表，为空则搜索所有PDF"),
     limit_per_pdf: int = Query(2, description="每个PDF返回的结果数量", ge=1, le=5),
     total_limit: int = Query(10, description="总结果数量限制", ge=1, le=20),
+    filters: PDFSearchFilters = Depends(),
     db: Session = Depends(get_db),
     # current_user = Depends(get_current_user) # 暂时注释掉认证
 ):
     """
     批量搜索多个PDF
     
-    在多个PDF中搜索相同查询，返回综合结果
+    在多个PDF中搜索相同查询，返回综合结果；可按年份、作者、期刊、关键词预过滤
     """
-    # TODO: 如果pdf_ids为空，从数据库获取用户所有PDF
-    # 暂时使用模拟列表
-    if not pdf_ids:
-        pdf_ids = ["1", "2"]
-    
-    all_results = []
+    # pdf_ids为空时在所有PDF中检索，作者等文本条件先在PDF目录中缩小范围
+    pdf_ids = PDFService.filter_pdf_ids(db, pdf_ids or None, filters)
     
-    # 对每个PDF执行搜索
-    for pdf_id in pdf_ids:
-        results = await PDFService.search_pdf(pdf_id, query, limit_per_pdf)
-        all_results.extend(results)
-    
-    # 按相关性得分排序
-    all_results.sort(key=lambda x: x.get("relevance_score", 0), reverse=True)
-    
-    # 限制总结果数量
-    all_results = all_results[:total_limit]
+    # 所有PDF共用一次过滤检索
+    all_results = await PDFService.search_pdfs(
+        pdf_ids,
+        query,
+        limit=total_limit,
+        limit_per_pdf=limit_per_pdf,
+        filters=filters
+    )
     
     # 将搜索结果转换为引用格式
     citations = []
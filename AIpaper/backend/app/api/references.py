@@ -1,12 +1,19 @@
 from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+import json
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
 
+from app.core.config import get_settings
 from app.db.database import get_db
+from app.services.citation_style_service import CitationStyleService
+from app.services.dedup_service import DedupService
 from app.services.reference_service import ReferenceService
+from app.services.typeahead_service import TypeaheadService
 
 router = APIRouter()
+settings = get_settings()
 
 
 class ReferenceSearchRequest(BaseModel):
@@ -19,12 +26,28 @@ class ReferenceSearchResponse(BaseModel):
     """引用搜索响应模型"""
     results: List[Dict[str, Any]]
     count: int
+    sources: Dict[str, str] = {}  # 各数据源（local、crossref、semantic_scholar）状态：ok, timeout, rate_limited, error
+    partial: bool = False  # 是否有数据源未在预算内返回
+
+
+class ReferenceResolveRequest(BaseModel):
+    """批量解析请求模型"""
+    items: List[str]  # DOI或完整的引用字符串
+    concurrency: Optional[int] = None
 
 
 class ReferenceFormatRequest(BaseModel):
     """引用格式化请求模型"""
     reference: Dict[str, Any]
-    style: str = "apa"  # "apa", "mla", "gb"
+    style: str = "apa"  # "apa", "mla", "chicago", "gb" 或CSL样式名称
+
+
+class ReferenceBibliographyRequest(BaseModel):
+    """参考文献列表请求模型"""
+    references: List[Dict[str, Any]]
+    style: str = "apa"
+    output: str = "text"  # "text", "html"
+    sort: bool = True  # 按样式规则排序
 
 
 class ReferenceFormatResponse(BaseModel):
@@ -42,7 +65,8 @@ async def search_references(
     """
     搜索学术引用
     
-    同时搜索Crossref和Semantic Scholar API，返回合并去重的结果
+    同时搜索Crossref和Semantic Scholar API，返回合并去重的结果。
+    超出延迟预算的数据源会被跳过，并在sources中标记为timeout
     """
     if not query or len(query.strip()) < 3:
         raise HTTPException(
@@ -50,13 +74,137 @@ async def search_references(
             detail="搜索关键词至少需要3个字符"
         )
     
-    results = await ReferenceService.search_references(query, limit)
+    response = await ReferenceService.search_references(query, limit)
+    
+    return {
+        "results": response["results"],
+        "count": len(response["results"]),
+        "sources": response["sources"],
+        "partial": response["partial"]
+    }
+
+
+@router.get("/search/stream")
+async def stream_search_references(
+    query: str = Query(..., description="搜索关键词"),
+    limit: int = Query(10, ge=1, le=50, description="结果数量限制"),
+    # current_user = Depends(get_current_user) # 暂时注释掉认证
+):
+    """
+    以Server-Sent Events流式搜索学术引用
+    
+    每个数据源返回后立即推送results事件（新增条目added及被Crossref结果替换的条目updated），
+    并推送该数据源的status事件，全部结束或超出延迟预算后推送done事件
+    """
+    if not query or len(query.strip()) < 3:
+        raise HTTPException(
+            status_code=400,
+            detail="搜索关键词至少需要3个字符"
+        )
+    
+    async def generate():
+        async for event in ReferenceService.stream_search(query, limit):
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
+    
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        # 禁止代理缓冲，保证事件即时送达
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/typeahead")
+async def typeahead_references(
+    q: str = Query(..., description="输入的标题、作者或引用键前缀"),
+    user_id: int = Query(..., description="用户ID"),
+    limit: int = Query(10, description="返回结果数量限制", ge=1, le=50),
+    db: Session = Depends(get_db),
+    # current_user = Depends(get_current_user) # 暂时注释掉认证
+):
+    """
+    在用户文献库中按前缀查找引用
+    
+    使用进程内前缀索引，首次查询时加载，之后不访问数据库或外部接口
+    """
+    results = TypeaheadService.search(db, user_id, q, limit)
     
     return {
         "results": results,
         "count": len(results)
     }
 
+@router.post("/resolve")
+async def resolve_references(
+    request: ReferenceResolveRequest,
+    # current_user = Depends(get_current_user) # 暂时注释掉认证
+):
+    """
+    批量解析DOI或引用字符串
+    
+    以有限并发解析，结果按完成顺序以NDJSON逐行返回，每行包含输入序号index
+    """
+    if not request.items:
+        raise HTTPException(
+            status_code=400,
+            detail="待解析列表不能为空"
+        )
+    
+    if len(request.items) > settings.REFERENCE_RESOLVE_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"单次最多解析{settings.REFERENCE_RESOLVE_MAX_ITEMS}条"
+        )
+    
+    concurrency = request.concurrency
+    if concurrency is not None:
+        concurrency = max(1, min(concurrency, settings.REFERENCE_RESOLVE_CONCURRENCY))
+    
+    async def generate():
+        async for result in ReferenceService.resolve_many(request.items, concurrency):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+@router.get("/duplicates")
+async def find_duplicate_references(
+    user_id: Optional[int] = Query(None, description="用户ID，检查该用户所有文档的引用"),
+    document_id: Optional[int] = Query(None, description="文档ID，只检查该文档的引用"),
+    db: Session = Depends(get_db),
+    # current_user = Depends(get_current_user) # 暂时注释掉认证
+):
+    """
+    查找文献库中的重复引用
+    
+    按DOI、规范化标题和近似标题分组，只重新计算新增或修改过的引用的指纹
+    """
+    if user_id is None and document_id is None:
+        raise HTTPException(
+            status_code=400,
+            detail="需要指定user_id或document_id"
+        )
+    
+    groups = DedupService.find_library_duplicates(db, user_id=user_id, document_id=document_id)
+    
+    return {
+        "groups": [
+            [
+                {
+                    "id": reference.id,
+                    "title": reference.title,
+                    "authors": reference.authors,
+                    "year": reference.year,
+                    "doi": reference.doi,
+                    "document_id": reference.document_id
+                }
+                for reference in group
+            ]
+            for group in groups
+        ],
+        "count": len(groups)
+    }
+
 
 @router.post("/format", response_model=ReferenceFormatResponse)
 async def format_citation(
@@ -75,10 +223,10 @@ async def format_citation(
             detail="引用数据不能为空"
         )
     
-    if request.style not in ["apa", "mla", "gb"]:
+    if not ReferenceService.is_supported_style(request.style):
         raise HTTPException(
             status_code=400,
-            detail="不支持的引用格式。支持的格式：apa, mla, gb"
+            detail="不支持的引用格式。支持的格式：apa, mla, chicago, gb 及 /api/references/styles 中的CSL样式"
         )
     
     formatted = ReferenceService.format_citation(request.reference, request.style)
@@ -106,15 +254,14 @@ async def batch_format_citations(
             detail="引用数据列表不能为空"
         )
     
-    if style not in ["apa", "mla", "gb"]:
+    if not ReferenceService.is_supported_style(style):
         raise HTTPException(
             status_code=400,
-            detail="不支持的引用格式。支持的格式：apa, mla, gb"
+            detail="不支持的引用格式。支持的格式：apa, mla, chicago, gb 及 /api/references/styles 中的CSL样式"
         )
     
     formatted_references = []
-    for ref in references:
-        formatted = ReferenceService.format_citation(ref, style)
+    for ref, formatted in zip(references, ReferenceService.format_citations(references, style)):
         formatted_references.append({
             "original": ref,
             "formatted": formatted
@@ -123,4 +270,55 @@ async def batch_format_citations(
     return {
         "results": formatted_references,
         "count": len(formatted_references)
-    } 
\ No newline at end of file
+    } 
+
+
+@router.get("/styles")
+async def list_citation_styles():
+    """
+    列出可用的引用样式
+    
+    包括内置样式和CSL样式目录中的样式
+    """
+    return {
+        "builtin": list(ReferenceService.BUILTIN_STYLES),
+        "csl": CitationStyleService.list_styles()
+    }
+
+
+@router.post("/bibliography")
+async def render_bibliography(
+    request: ReferenceBibliographyRequest,
+    # current_user = Depends(get_current_user) # 暂时注释掉认证
+):
+    """
+    生成参考文献列表
+    
+    CSL样式只加载一次并在所有条目间共用，可选按样式规则排序
+    """
+    if not request.references:
+        raise HTTPException(
+            status_code=400,
+            detail="引用数据列表不能为空"
+        )
+    
+    if not ReferenceService.is_supported_style(request.style):
+        raise HTTPException(
+            status_code=400,
+            detail="不支持的引用格式。支持的格式：apa, mla, chicago, gb 及 /api/references/styles 中的CSL样式"
+        )
+    
+    if request.output not in ["text", "html"]:
+        raise HTTPException(
+            status_code=400,
+            detail="不支持的输出格式。支持的格式：text, html"
+        )
+    
+    entries = ReferenceService.format_citations(
+        request.references, request.style, output=request.output, sort=request.sort
+    )
+    
+    return {
+        "entries": entries,
+        "count": len(entries)
+    }
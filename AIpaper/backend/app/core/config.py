@@ -22,6 +22,85 @@ class Settings(BaseSettings):
     
     # 文件存储路径
     UPLOAD_DIR: str = "/opt/app/uploads/"
+
+    # PDF存储后端配置
+    STORAGE_BACKEND: str = "local"  # local, s3
+    S3_ENDPOINT_URL: Optional[str] = None  # 如本地MinIO: http://localhost:9000
+    S3_BUCKET: str = "aipaper"
+    S3_ACCESS_KEY: Optional[str] = None
+    S3_SECRET_KEY: Optional[str] = None
+    S3_REGION: Optional[str] = None
+    
+    # PDF批量导入时并行处理的数量
+    IMPORT_CONCURRENCY: int = 4
+    IMPORT_JOB_TTL: int = 24 * 3600  # 导入任务结束后保留进度的时间（秒）
+    PDF_PROCESSING_TIMEOUT: int = 3600  # PDF处于processing状态超过该时间（秒）视为中断，重复上传时重新处理
+    
+    # 分块去重：SimHash汉明距离不超过该值视为近似重复（最大为3）
+    CHUNK_DEDUP_MAX_DISTANCE: int = 3
+    
+    # PDF参考文献提取：处理PDF时解析参考文献列表并批量解析为引用记录
+    PDF_EXTRACT_REFERENCES: bool = True
+    PDF_MAX_REFERENCES: int = 500  # 单个PDF最多提取的参考文献条目数
+
+    # 上游API地址，压测时可指向本地模拟服务（scripts/fake_upstream.py）
+    CROSSREF_API_URL: str = "https://api.crossref.org/works"
+    SEMANTIC_SCHOLAR_API_URL: str = "https://api.semanticscholar.org/graph/v1"
+
+    # 上游HTTP客户端配置（Crossref、Semantic Scholar等）
+    HTTP_TIMEOUT: float = 10.0  # 单次请求总超时（秒）
+    HTTP_CONNECT_TIMEOUT: float = 3.0  # 建立连接超时（秒）
+    HTTP_POOL_LIMIT: int = 100  # 连接池总连接数
+    HTTP_POOL_LIMIT_PER_HOST: int = 20  # 每个上游主机的连接数
+    HTTP_KEEPALIVE_TIMEOUT: float = 60.0  # 空闲长连接保持时间（秒）
+    REFERENCE_SEARCH_BUDGET: float = 1.5  # 引用搜索延迟预算（秒），超时的数据源返回部分结果
+    REFERENCE_HEDGE_DELAY: float = 0.6  # 首个上游请求超过该时间未返回时发起对冲请求（秒）
+    
+    # 上游限流配置（令牌桶，速率单位为请求/秒）
+    # 令牌桶在每个worker进程内独立计数，以下速率为整个部署的总速率，按RATE_LIMIT_WORKERS均分到各进程；
+    # 上游返回的Retry-After也只暂停收到该响应的进程
+    RATE_LIMIT_WORKERS: int = 1  # 共享上游配额的worker进程数（如uvicorn --workers的值）
+    CROSSREF_RATE_LIMIT: float = 10.0
+    CROSSREF_RATE_BURST: int = 10
+    CROSSREF_MAILTO: Optional[str] = None  # 设置后请求携带mailto进入Crossref polite pool
+    SEMANTIC_SCHOLAR_RATE_LIMIT: float = 1.0  # 无API Key时的共享配额较低
+    SEMANTIC_SCHOLAR_RATE_BURST: int = 3
+    SEMANTIC_SCHOLAR_API_KEY: Optional[str] = None
+    UPSTREAM_RATE_LIMIT: float = 5.0  # 其他上游的默认速率
+    UPSTREAM_RATE_BURST: int = 5
+    RATE_LIMIT_MAX_WAIT: float = 1.0  # 交互式请求最长排队时间（秒）
+    RATE_LIMIT_BATCH_MAX_WAIT: float = 30.0  # 批量任务最长排队时间（秒）
+    REFERENCE_RESOLVE_CONCURRENCY: int = 8  # 批量解析DOI/引用时的最大并发数
+    REFERENCE_RESOLVE_MAX_ITEMS: int = 1000  # 单次批量解析的最大条目数
+    TYPEAHEAD_MAX_ENTRIES: int = 200000  # 进程内文献库前缀索引的总条目上限，超出时淘汰最久未使用的用户索引
+    TYPEAHEAD_INDEX_TTL: int = 900  # 前缀索引的最长使用时间（秒），到期后从数据库重新加载以同步其他进程的写入
+    
+    # 文档版本配置
+    DOCUMENT_VERSION_KEYFRAME_INTERVAL: int = 50  # 每隔多少个版本保存一个完整快照，决定还原任一版本最多需要应用的增量数
+    DIFF_CACHE_SIZE: int = 256  # 进程内缓存的版本差异数量（版本内容不可变，差异结果可长期复用）
+    DIFF_CACHE_TTL: int = 24 * 3600  # 版本差异缓存时间（秒）
+    AUTOSAVE_IDLE_SECONDS: float = 5.0  # 自动保存的编辑停止该时间后写入数据库（秒）
+    AUTOSAVE_MAX_INTERVAL: float = 60.0  # 持续编辑时最长每隔该时间写入一次（秒），每次写入生成一个版本
+    AUTOSAVE_MAX_PENDING: int = 1000  # 内存中缓冲的文档数上限，超出时立即写入最早的文档
+    
+    # 大文本列压缩配置（文档内容、版本快照）
+    COMPRESSED_TEXT_CODEC: str = "zlib"  # zlib, zstd（需要安装zstandard）, none
+    COMPRESSED_TEXT_MIN_SIZE: int = 1024  # 小于该字节数的文本不压缩
+    COMPRESSED_TEXT_LEVEL: Optional[int] = None  # 压缩级别，默认zlib为6、zstd为3
+    COMPRESSED_TEXT_DICTIONARY: Optional[str] = None  # 预置字典文件（scripts/benchmark_compression.py生成），同目录下的其他*.dict文件用于解压旧数据
+    
+    # 缓存配置
+    REFERENCE_CACHE_TTL: int = 3600  # 引用搜索结果缓存时间（秒）
+    REFERENCE_CACHE_SIZE: int = 2048  # 进程内缓存条目数
+    CACHE_SHARED_BACKEND: str = "none"  # none, sqlite, redis
+    CACHE_SQLITE_PATH: Optional[str] = None  # 默认为 UPLOAD_DIR/cache/cache.sqlite3
+    CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+    
+    # 引用格式化配置
+    CSL_STYLES_DIR: Optional[str] = None  # 额外CSL样式文件目录（<样式名>.csl），未设置时只使用citeproc-py自带样式
+    CSL_STYLE_CACHE_SIZE: int = 64  # 每个进程缓存的已解析样式数量
+    CITATION_MEMO_SIZE: int = 4096  # 临时引用格式化结果的进程内缓存条目数
+    REFERENCE_EXPORT_BATCH_SIZE: int = 500  # 导出参考文献时每批从数据库游标读取的记录数
     
     # CORS配置
     CORS_ORIGINS: list[str] = ["*"]
@@ -0,0 +1,66 @@
+import asyncio
+import logging
+from typing import Optional
+
+import aiohttp
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class HTTPClient:
+    """
+    应用级共享的HTTP客户端
+
+    在应用生命周期内复用同一个 ``aiohttp.ClientSession``，
+    通过连接池保持与上游API的长连接，避免每次请求重复DNS解析和TCP/TLS握手。
+    """
+
+    _session: Optional[aiohttp.ClientSession] = None
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @staticmethod
+    def _create_session() -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=settings.HTTP_POOL_LIMIT,
+            limit_per_host=settings.HTTP_POOL_LIMIT_PER_HOST,
+            keepalive_timeout=settings.HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=300,
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=settings.HTTP_TIMEOUT,
+            connect=settings.HTTP_CONNECT_TIMEOUT,
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=timeout,
+            headers={"User-Agent": f"{settings.APP_NAME}/{settings.APP_VERSION}"},
+        )
+
+    @staticmethod
+    async def start() -> None:
+        """应用启动时创建共享会话"""
+        HTTPClient.get_session()
+
+    @staticmethod
+    def get_session() -> aiohttp.ClientSession:
+        """
+        获取共享会话
+
+        未启动或事件循环已变化时（如命令行脚本）按需创建。
+        """
+        loop = asyncio.get_running_loop()
+        if HTTPClient._session is None or HTTPClient._session.closed or HTTPClient._loop is not loop:
+            HTTPClient._session = HTTPClient._create_session()
+            HTTPClient._loop = loop
+        return HTTPClient._session
+
+    @staticmethod
+    async def close() -> None:
+        """应用关闭时释放连接池"""
+        if HTTPClient._session is not None and not HTTPClient._session.closed:
+            await HTTPClient._session.close()
+        HTTPClient._session = None
+        HTTPClient._loop = None
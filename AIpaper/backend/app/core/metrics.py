@@ -0,0 +1,88 @@
+import threading
+from typing import Dict, Tuple, List
+
+# 延迟直方图默认分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Metrics:
+    """
+    进程内指标注册表
+
+    提供计数器和直方图，并以Prometheus文本格式导出（见 ``/metrics``）。
+    """
+
+    _lock = threading.Lock()
+    _counters: Dict[str, Dict[LabelKey, float]] = {}
+    _histograms: Dict[str, Dict[LabelKey, List[float]]] = {}
+    _help: Dict[str, str] = {}
+
+    @staticmethod
+    def _label_key(labels: Dict[str, str]) -> LabelKey:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    @staticmethod
+    def describe(name: str, help_text: str) -> None:
+        """登记指标说明"""
+        Metrics._help[name] = help_text
+
+    @staticmethod
+    def inc(name: str, value: float = 1, **labels: str) -> None:
+        """计数器累加"""
+        key = Metrics._label_key(labels)
+        with Metrics._lock:
+            series = Metrics._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    @staticmethod
+    def observe(name: str, value: float, **labels: str) -> None:
+        """记录一次直方图观测值"""
+        key = Metrics._label_key(labels)
+        with Metrics._lock:
+            series = Metrics._histograms.setdefault(name, {})
+            # [各分桶计数..., 总次数, 总和]
+            state = series.setdefault(key, [0] * (len(DEFAULT_BUCKETS) + 2))
+            for i, bound in enumerate(DEFAULT_BUCKETS):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += 1
+            state[-1] += value
+
+    @staticmethod
+    def get(name: str, **labels: str) -> float:
+        """读取计数器当前值"""
+        with Metrics._lock:
+            return Metrics._counters.get(name, {}).get(Metrics._label_key(labels), 0)
+
+    @staticmethod
+    def _format_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs = list(key) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+    @staticmethod
+    def render() -> str:
+        """以Prometheus文本格式导出所有指标"""
+        lines = []
+        with Metrics._lock:
+            for name, series in sorted(Metrics._counters.items()):
+                if name in Metrics._help:
+                    lines.append(f"# HELP {name} {Metrics._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{Metrics._format_labels(key)} {value}")
+
+            for name, series in sorted(Metrics._histograms.items()):
+                if name in Metrics._help:
+                    lines.append(f"# HELP {name} {Metrics._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, state in series.items():
+                    for i, bound in enumerate(DEFAULT_BUCKETS):
+                        lines.append(f"{name}_bucket{Metrics._format_labels(key, (('le', str(bound)),))} {state[i]}")
+                    lines.append(f"{name}_bucket{Metrics._format_labels(key, (('le', '+Inf'),))} {state[-2]}")
+                    lines.append(f"{name}_count{Metrics._format_labels(key)} {state[-2]}")
+                    lines.append(f"{name}_sum{Metrics._format_labels(key)} {state[-1]}")
+        return "\n".join(lines) + "\n"
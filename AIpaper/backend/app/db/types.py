@@ -0,0 +1,266 @@
+import os
+import glob
+import zlib
+import logging
+import threading
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# 压缩值以NUL字节开头，后跟编码方式。UTF-8文本不会以NUL开头（PostgreSQL的text也不能包含NUL），
+# 因此未压缩的值直接保存UTF-8原文，旧的TEXT数据转换为二进制后无需改写即可读取
+_MARKER = b"\x00"
+_RAW = b"\x00"        # 以NUL开头的原文
+_ZLIB = b"\x01"
+_ZLIB_DICT = b"\x02"  # 后跟4字节字典校验和
+_ZSTD = b"\x03"
+_ZSTD_DICT = b"\x04"  # 后跟4字节字典校验和
+
+CODECS = ("zlib", "zstd", "none")
+DEFAULT_LEVELS = {"zlib": 6, "zstd": 3}
+
+# zlib的预置字典最多使用32KB
+ZLIB_MAX_DICTIONARY_SIZE = 32 * 1024
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise RuntimeError("使用zstd压缩需要安装zstandard") from e
+    return zstandard
+
+
+def dictionary_id(dictionary: bytes) -> bytes:
+    """字典校验和，写入压缩值中用于解压时选择字典"""
+    return zlib.adler32(dictionary).to_bytes(4, "big")
+
+
+class TextCompressor:
+    """
+    文本压缩编解码
+
+    小于min_size字节的文本或压缩后没有变小的文本保存原文。指定字典时用字典压缩，
+    解压时按压缩值中的字典校验和从dictionary和decode_dictionaries中选择字典。
+    """
+
+    # 记住最近压缩结果的数量
+    RECENT_SIZE = 4
+
+    def __init__(self, codec: str = "zlib", level: Optional[int] = None, min_size: int = 1024,
+                 dictionary: Optional[bytes] = None, decode_dictionaries: Iterable[bytes] = ()):
+        if codec not in CODECS:
+            raise ValueError(f"不支持的压缩方式: {codec}，可选: {', '.join(CODECS)}")
+        self.codec = codec
+        self.level = DEFAULT_LEVELS.get(codec) if level is None else level
+        self.min_size = min_size
+        if codec == "zlib" and dictionary is not None:
+            dictionary = dictionary[-ZLIB_MAX_DICTIONARY_SIZE:]
+        self.dictionary = dictionary
+        self.dictionary_id = dictionary_id(dictionary) if dictionary else None
+
+        # zlib只使用字典末尾32KB，两种字典都登记，压缩方式变更后旧数据仍可解压
+        self._dictionaries: Dict[bytes, bytes] = {}
+        for d in decode_dictionaries:
+            for candidate in (d, d[-ZLIB_MAX_DICTIONARY_SIZE:]):
+                self._dictionaries[dictionary_id(candidate)] = candidate
+        if dictionary:
+            self._dictionaries[self.dictionary_id] = dictionary
+        # 最近压缩过的文本：保存文档时同一内容会同时写入文档和版本快照，只需压缩一次
+        self._recent: "OrderedDict[str, bytes]" = OrderedDict()
+        self._recent_lock = threading.Lock()
+        # zstd的压缩/解压对象不是线程安全的，每个线程各建一份
+        self._zstd_dicts: Dict[bytes, object] = {}
+        self._local = threading.local()
+        if codec == "zstd":
+            _zstd()
+
+    def compress(self, text: str) -> bytes:
+        """
+        压缩文本
+
+        Args:
+            text: 原文
+
+        Returns:
+            bytes: 压缩值（或UTF-8原文）
+        """
+        data = text.encode("utf-8")
+        raw = _RAW + data if data.startswith(_MARKER) else data
+        if self.codec == "none" or len(data) < self.min_size:
+            return raw
+
+        with self._recent_lock:
+            packed = self._recent.get(text)
+            if packed is not None:
+                self._recent.move_to_end(text)
+                return packed
+
+        if self.codec == "zlib":
+            if self.dictionary:
+                compressor = zlib.compressobj(self.level, zdict=self.dictionary)
+                packed = _MARKER + _ZLIB_DICT + self.dictionary_id + compressor.compress(data) + compressor.flush()
+            else:
+                packed = _MARKER + _ZLIB + zlib.compress(data, self.level)
+        else:
+            header = _MARKER + (_ZSTD_DICT + self.dictionary_id if self.dictionary else _ZSTD)
+            packed = header + self._zstd_compressor().compress(data)
+
+        packed = packed if len(packed) < len(raw) else raw
+        with self._recent_lock:
+            self._recent[text] = packed
+            while len(self._recent) > self.RECENT_SIZE:
+                self._recent.popitem(last=False)
+        return packed
+
+    def decompress(self, value: bytes) -> str:
+        """
+        解压文本
+
+        Args:
+            value: compress的结果，或未压缩的UTF-8原文
+
+        Returns:
+            str: 原文
+        """
+        if not value.startswith(_MARKER):
+            return value.decode("utf-8")
+
+        kind = value[1:2]
+        if kind == _RAW:
+            return value[1:].decode("utf-8")
+        if kind == _ZLIB:
+            return zlib.decompress(value[2:]).decode("utf-8")
+        if kind == _ZSTD:
+            return self._zstd_decompressor(None).decompress(value[2:]).decode("utf-8")
+        if kind in (_ZLIB_DICT, _ZSTD_DICT):
+            dict_key, payload = value[2:6], value[6:]
+            dictionary = self._dictionaries.get(dict_key)
+            if dictionary is None:
+                raise ValueError(f"缺少压缩字典（校验和 {dict_key.hex()}），请将字典文件放回字典目录")
+            if kind == _ZLIB_DICT:
+                decompressor = zlib.decompressobj(zdict=dictionary)
+                return (decompressor.decompress(payload) + decompressor.flush()).decode("utf-8")
+            return self._zstd_decompressor(dict_key).decompress(payload).decode("utf-8")
+        raise ValueError(f"无法识别的压缩格式: {kind.hex()}")
+
+    def _zstd_dict(self, dict_key: bytes):
+        if dict_key not in self._zstd_dicts:
+            self._zstd_dicts[dict_key] = _zstd().ZstdCompressionDict(self._dictionaries[dict_key])
+        return self._zstd_dicts[dict_key]
+
+    def _zstd_compressor(self):
+        compressor = getattr(self._local, "compressor", None)
+        if compressor is None:
+            dict_data = self._zstd_dict(self.dictionary_id) if self.dictionary else None
+            compressor = _zstd().ZstdCompressor(level=self.level, dict_data=dict_data)
+            self._local.compressor = compressor
+        return compressor
+
+    def _zstd_decompressor(self, dict_key: Optional[bytes]):
+        decompressors = getattr(self._local, "decompressors", None)
+        if decompressors is None:
+            decompressors = self._local.decompressors = {}
+        if dict_key not in decompressors:
+            dict_data = self._zstd_dict(dict_key) if dict_key else None
+            decompressors[dict_key] = _zstd().ZstdDecompressor(dict_data=dict_data)
+        return decompressors[dict_key]
+
+
+def train_dictionary(samples: List[str], size: int = ZLIB_MAX_DICTIONARY_SIZE, codec: str = "zlib") -> bytes:
+    """
+    根据样本文本生成预置字典
+
+    zstd使用zstandard的字典训练；zlib没有训练接口，取样本中出现次数最多的词组拼接，
+    出现越多的词组越靠近字典末尾（zlib回溯距离越短，编码越省）
+
+    Args:
+        samples: 样本文本
+        size: 字典大小（字节）
+        codec: 压缩方式
+
+    Returns:
+        bytes: 字典内容
+    """
+    if codec == "zstd":
+        return _zstd().train_dictionary(size, [sample.encode("utf-8") for sample in samples]).as_bytes()
+
+    size = min(size, ZLIB_MAX_DICTIONARY_SIZE)
+    counts: Counter = Counter()
+    for sample in samples:
+        for line in sample.splitlines():
+            words = line.split()
+            for n in (3, 6):
+                for i in range(0, max(0, len(words) - n + 1)):
+                    counts[" ".join(words[i:i + n])] += 1
+
+    chosen: List[bytes] = []
+    total = 0
+    # 按节省的字节数（次数×长度）挑选，只出现一次的词组没有意义
+    for phrase, count in sorted(counts.items(), key=lambda item: item[1] * len(item[0]), reverse=True):
+        if count < 2:
+            break
+        encoded = phrase.encode("utf-8") + b" "
+        if total + len(encoded) > size:
+            continue
+        chosen.append(encoded)
+        total += len(encoded)
+    return b"".join(reversed(chosen))
+
+
+@lru_cache()
+def get_text_compressor() -> TextCompressor:
+    """按配置创建文本压缩编解码（字典目录下的所有*.dict都可用于解压）"""
+    dictionary = None
+    decode_dictionaries: List[bytes] = []
+    if settings.COMPRESSED_TEXT_DICTIONARY:
+        with open(settings.COMPRESSED_TEXT_DICTIONARY, "rb") as f:
+            dictionary = f.read()
+        directory = os.path.dirname(os.path.abspath(settings.COMPRESSED_TEXT_DICTIONARY))
+        for path in glob.glob(os.path.join(directory, "*.dict")):
+            with open(path, "rb") as f:
+                decode_dictionaries.append(f.read())
+        logger.info(f"文本压缩字典: {settings.COMPRESSED_TEXT_DICTIONARY}（{len(decode_dictionaries)} 个可用于解压）")
+
+    return TextCompressor(
+        codec=settings.COMPRESSED_TEXT_CODEC,
+        level=settings.COMPRESSED_TEXT_LEVEL,
+        min_size=settings.COMPRESSED_TEXT_MIN_SIZE,
+        dictionary=dictionary,
+        decode_dictionaries=decode_dictionaries,
+    )
+
+
+class CompressedText(TypeDecorator):
+    """
+    透明压缩的文本列
+
+    数据库中保存为二进制，读写时在ORM层压缩和解压，Python侧仍是str。
+    未转换的旧TEXT列读出为str时原样返回。
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    @property
+    def python_type(self):
+        return str
+
+    def process_bind_param(self, value: Optional[str], dialect) -> Optional[bytes]:
+        if value is None:
+            return None
+        return get_text_compressor().compress(value)
+
+    def process_result_value(self, value, dialect) -> Optional[str]:
+        if value is None:
+            return None
+        if isinstance(value, str):
+            return value
+        return get_text_compressor().decompress(bytes(value))
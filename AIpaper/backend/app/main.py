@@ -1,13 +1,46 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from app.api import documents, ai, references, pdf
+from app.core.http_client import HTTPClient
+from app.core.metrics import Metrics
+from app.services.autosave_service import AutosaveService
+from app.services.metadata_store_service import MetadataStoreService
+from app.services.version_store_service import VersionStoreService
+
+# 导入所有模型，确保模型间的关系映射可以解析
+from app.models.user import User
+from app.models.document import Document
+from app.models.reference import Reference
+from app.models.pdf_source import PDFSource
+from app.models.document_version import DocumentVersion
+from app.models.comment import Comment
+from app.models.chunk_fingerprint import ChunkFingerprint
+from app.models.paper_metadata import PaperMetadata
+from app.models.reference_fingerprint import ReferenceFingerprint
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时创建共享的上游HTTP连接池并重新排队未完成的版本转换；关闭时写入自动保存缓冲和文献命中次数，等待后台的版本转换完成并释放连接池"""
+    await HTTPClient.start()
+    await VersionStoreService.resume_pending()
+    yield
+    await AutosaveService.flush_all()
+    await VersionStoreService.wait_finalized()
+    await asyncio.to_thread(MetadataStoreService.flush_hits)
+    await HTTPClient.close()
+
 
 app = FastAPI(
     title="Jenni.ai Demo API",
     description="Jenni.ai Demo 复刻版 API 服务",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # 配置CORS
@@ -24,6 +57,11 @@ app.add_middleware(
 async def health_check():
     return {"status": "healthy", "version": "0.1.0"}
 
+# Prometheus指标端点
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return Metrics.render()
+
 # 注册路由
 app.include_router(documents.router, prefix="/api/documents", tags=["documents"])
 app.include_router(ai.router, prefix="/api/ai", tags=["ai"])
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, String, DateTime, Boolean
+import datetime
+
+from app.db.database import Base
+
+
+class ChunkFingerprint(Base):
+    """PDF分块指纹模型 - 用于跨PDF的近似重复分块去重"""
+
+    __tablename__ = "chunk_fingerprints"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # 分块信息
+    pdf_id = Column(String(255), index=True)  # 分块所属PDF（向量库中的pdf_id）
+    chunk_index = Column(Integer)
+
+    # SimHash指纹及其分段，分段用于查找候选近似重复项
+    simhash = Column(String(16))
+    band0 = Column(Integer, index=True)
+    band1 = Column(Integer, index=True)
+    band2 = Column(Integer, index=True)
+    band3 = Column(Integer, index=True)
+
+    # 实际存储向量的分块ID；为本分块自身时表示这是规范分块，否则为重复分块的别名
+    canonical_chunk_id = Column(String(300), index=True)
+    is_canonical = Column(Boolean, default=True, index=True)
+
+    # 时间戳
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
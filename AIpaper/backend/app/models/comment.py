@@ -1,5 +1,5 @@
 from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, backref
 import datetime
 
 from app.db.database import Base
@@ -31,4 +31,4 @@ class Comment(Base):
     
     # 回复关系（自引用）
     parent_id = Column(Integer, ForeignKey("comments.id"), nullable=True)
-    replies = relationship("Comment", backref="parent", remote_side=[id], cascade="all, delete-orphan") 
\ No newline at end of file
+    replies = relationship("Comment", backref=backref("parent", remote_side=[id]), cascade="all, delete-orphan") 
\ No newline at end of file
@@ -3,6 +3,7 @@ from sqlalchemy.orm import relationship
 import datetime
 
 from app.db.database import Base
+from app.db.types import CompressedText
 
 
 class Document(Base):
@@ -12,7 +13,7 @@ class Document(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), index=True)
-    content = Column(Text)
+    content = Column(CompressedText)  # 透明压缩
     outline = Column(Text, nullable=True)
     
     # 文档元数据
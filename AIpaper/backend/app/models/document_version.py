@@ -1,8 +1,9 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Boolean, LargeBinary, Index
+from sqlalchemy.orm import relationship, deferred
 import datetime
 
 from app.db.database import Base
+from app.db.types import CompressedText
 
 
 class DocumentVersion(Base):
@@ -14,10 +15,16 @@ class DocumentVersion(Base):
     
     # 版本信息
     version_number = Column(Integer)  # 版本号，从1开始递增
-    content = Column(Text)            # 文档内容快照
-    outline = Column(Text, nullable=True)  # 大纲快照
+    # 快照和增量列延迟加载（同组，访问任一列时一起加载），版本列表只读取元数据
+    content = deferred(Column(CompressedText), group="snapshot")  # 文档内容快照（仅关键帧保存，增量版本为空）
+    outline = deferred(Column(CompressedText, nullable=True), group="snapshot")  # 大纲快照（仅关键帧保存）
     title = Column(String(255))       # 标题快照
     
+    # 增量存储：每隔若干版本保存一个完整快照（关键帧），其余版本只保存相对上一版本的压缩增量
+    is_keyframe = Column(Boolean, nullable=True, default=True)  # 为空的旧记录视为关键帧
+    base_version = Column(Integer, nullable=True)  # 增量所基于的版本号
+    delta = deferred(Column(LargeBinary, nullable=True), group="snapshot")  # zlib压缩的JSON增量操作
+    
     # 版本元数据
     commit_message = Column(String(255), nullable=True)  # 提交信息
     word_count = Column(Integer, default=0)  # 当前版本字数统计
@@ -31,4 +38,9 @@ class DocumentVersion(Base):
     document = relationship("Document", back_populates="versions")
     
     # 评论关系
-    comments = relationship("Comment", back_populates="document_version", cascade="all, delete-orphan") 
\ No newline at end of file
+    comments = relationship("Comment", back_populates="document_version", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # 唯一约束：并发保存（多标签页、多进程、自动保存与检查点同时提交）不会产生重复版本号
+        Index("ix_document_versions_document_id_version_number", "document_id", "version_number", unique=True),
+    )
@@ -0,0 +1,58 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, Index, func, literal_column
+from sqlalchemy.dialects import postgresql  # noqa: F401 注册to_tsvector等全文检索函数
+import datetime
+
+from app.db.database import Base
+
+
+def fulltext_document(title, abstract):
+    """全文检索文档表达式，建索引和查询必须使用同一表达式才能命中索引"""
+    return func.to_tsvector(
+        literal_column("'simple'::regconfig"),
+        func.coalesce(title, "") + " " + func.coalesce(abstract, "")
+    )
+
+
+class PaperMetadata(Base):
+    """论文元数据模型 - 本地缓存所有上游返回过的文献元数据，供离线和重复查询使用"""
+
+    __tablename__ = "paper_metadata"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # 查找键：规范化DOI（小写、去除doi.org前缀）和规范化标题
+    doi = Column(String(255), unique=True, nullable=True, index=True)
+    normalized_title = Column(String(1024), index=True)
+
+    # 文献元数据
+    title = Column(String(1024))
+    authors = Column(JSON, nullable=True)  # 作者列表，格式为 "姓, 名"
+    journal = Column(String(512), nullable=True)
+    publisher = Column(String(512), nullable=True)
+    published_date = Column(String(20), nullable=True)
+    year = Column(Integer, nullable=True, index=True)
+    volume = Column(String(50), nullable=True)
+    issue = Column(String(50), nullable=True)
+    pages = Column(String(50), nullable=True)
+    url = Column(String(1024), nullable=True)
+    abstract = Column(Text, nullable=True)
+    citation_count = Column(Integer, nullable=True)
+
+    # 数据来源，如 "crossref,semantic_scholar"
+    sources = Column(String(255), default="")
+
+    # 被本地命中的次数，用于排序热门论文
+    hit_count = Column(Integer, default=0)
+
+    # 时间戳
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        # PostgreSQL全文索引，其他数据库退化为标题模糊匹配
+        Index(
+            "ix_paper_metadata_fulltext",
+            fulltext_document(title, abstract),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+    )
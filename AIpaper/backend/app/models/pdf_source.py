@@ -22,12 +22,15 @@ class PDFSource(Base):
     index_status = Column(String(50), default="pending")  # pending, processing, completed, failed
     
     # 向量索引信息
-    vector_db_id = Column(String(255), nullable=True)  # 在向量数据库中的ID或集合名称
+    vector_db_id = Column(String(255), nullable=True, index=True)  # 在向量数据库中的ID或集合名称
     chunk_count = Column(Integer, default=0)  # 分块数量
     
     # 元数据
     title = Column(String(512), nullable=True)
     authors = Column(String(512), nullable=True)
+    year = Column(Integer, nullable=True, index=True)
+    journal = Column(String(512), nullable=True)
+    keywords = Column(String(1024), nullable=True)
     
     # 时间戳
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
@@ -35,7 +38,7 @@ class PDFSource(Base):
     indexed_at = Column(DateTime, nullable=True)  # 索引完成时间
     
     # 关联关系
-    document_id = Column(Integer, ForeignKey("documents.id"))
+    document_id = Column(Integer, ForeignKey("documents.id"), index=True)
     document = relationship("Document", back_populates="pdf_sources")
     
     # 从PDF提取的引用
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, event, inspect
 from sqlalchemy.orm import relationship
 import datetime
 
@@ -28,15 +28,37 @@ class Reference(Base):
     apa_citation = Column(Text, nullable=True)
     mla_citation = Column(Text, nullable=True)
     chicago_citation = Column(Text, nullable=True)
+    citations_version = Column(Integer, nullable=True)  # 生成格式化引用时的格式化规则版本
     
     # 时间戳
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
     
     # 关联关系
-    document_id = Column(Integer, ForeignKey("documents.id"))
+    document_id = Column(Integer, ForeignKey("documents.id"), index=True)
     document = relationship("Document", back_populates="references")
     
     # PDF来源关系（如果引用来自上传的PDF）
     pdf_source_id = Column(Integer, ForeignKey("pdf_sources.id"), nullable=True)
-    pdf_source = relationship("PDFSource", back_populates="extracted_references") 
\ No newline at end of file
+    pdf_source = relationship("PDFSource", back_populates="extracted_references")
+    
+    def refresh_citations(self):
+        """根据当前元数据重新生成格式化引用"""
+        from app.services.reference_service import ReferenceService  # 避免循环导入
+        ReferenceService.materialize_citations(self)
+
+
+# 修改后需要重新生成格式化引用的字段
+CITATION_SOURCE_FIELDS = ("title", "authors", "journal", "year", "doi", "url", "raw_data")
+
+
+@event.listens_for(Reference, "before_insert")
+def _materialize_citations_on_insert(mapper, connection, target):
+    target.refresh_citations()
+
+
+@event.listens_for(Reference, "before_update")
+def _materialize_citations_on_update(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in CITATION_SOURCE_FIELDS):
+        target.refresh_citations()
@@ -0,0 +1,35 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, BigInteger
+import datetime
+
+from app.db.database import Base
+
+
+class ReferenceFingerprint(Base):
+    """文献引用指纹模型 - 用于在用户文献库中查找重复引用"""
+
+    __tablename__ = "reference_fingerprints"
+
+    id = Column(Integer, primary_key=True, index=True)
+    reference_id = Column(Integer, ForeignKey("references.id", ondelete="CASCADE"), unique=True, index=True)
+
+    # 精确匹配键
+    doi = Column(String(255), nullable=True, index=True)
+    title_key = Column(String(1024), index=True)  # 规范化标题
+
+    # 校验候选项时使用的字段
+    first_author = Column(String(255), nullable=True)
+    year = Column(Integer, nullable=True)
+
+    # MinHash LSH分段，任一分段相同即为近似重复候选
+    band0 = Column(BigInteger, index=True)
+    band1 = Column(BigInteger, index=True)
+    band2 = Column(BigInteger, index=True)
+    band3 = Column(BigInteger, index=True)
+    band4 = Column(BigInteger, index=True)
+    band5 = Column(BigInteger, index=True)
+    band6 = Column(BigInteger, index=True)
+    band7 = Column(BigInteger, index=True)
+
+    # 时间戳，早于引用的updated_at时需要重新计算
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
@@ -0,0 +1,228 @@
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.metrics import Metrics
+from app.db.database import SessionLocal
+from app.models.document import Document
+from app.services.document_service import DocumentService
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+Metrics.describe("autosave_edits_total", "收到的自动保存次数（写入内存缓冲）")
+Metrics.describe("autosave_flushes_total", "自动保存缓冲写入数据库的次数，按触发原因统计")
+
+# 自动保存可以修改的字段
+EDITABLE_FIELDS = ("title", "content", "outline")
+
+
+class AutosaveService:
+    """
+    自动保存的写后缓冲
+
+    编辑器的自动保存只更新内存中每个文档的最新状态，编辑停止AUTOSAVE_IDLE_SECONDS后，
+    或持续编辑满AUTOSAVE_MAX_INTERVAL时，才将最新状态写入数据库并生成一个版本。
+    显式保存（检查点）合并缓冲内容后立即写入。读取文档时叠加未写入的缓冲内容。
+
+    缓冲只存在于当前进程，多进程部署时同一文档的自动保存需要路由到同一进程；
+    应用关闭时写入全部缓冲。
+    """
+
+    # document_id -> {"fields", "first_at", "last_at", "edits", "timer"}
+    _pending: Dict[int, Dict[str, Any]] = {}
+
+    # 正在执行的写入任务
+    _tasks: Set[asyncio.Future] = set()
+
+    # 同一文档的写入和检查点互斥，避免较早的缓冲内容覆盖检查点
+    # document_id -> {"lock", "users"}，没有等待者时删除
+    _locks: Dict[int, Dict[str, Any]] = {}
+
+    @staticmethod
+    @asynccontextmanager
+    async def _document_lock(document_id: int) -> AsyncIterator[None]:
+        """持有文档的写入锁，不同文档的写入互不等待"""
+        entry = AutosaveService._locks.get(document_id)
+        if entry is None:
+            entry = {"lock": asyncio.Lock(), "users": 0}
+            AutosaveService._locks[document_id] = entry
+        entry["users"] += 1
+        try:
+            async with entry["lock"]:
+                yield
+        finally:
+            entry["users"] -= 1
+            if entry["users"] == 0:
+                del AutosaveService._locks[document_id]
+
+    @staticmethod
+    def buffer(document_id: int, **fields: Optional[str]) -> Dict[str, Any]:
+        """
+        缓冲一次自动保存（须在事件循环中调用）
+
+        Args:
+            document_id: 文档ID
+            **fields: title、content、outline，为None的字段不修改
+
+        Returns:
+            Dict[str, Any]: 缓冲状态，包括合并的编辑次数和距首次未写入编辑的秒数
+        """
+        now = time.monotonic()
+        entry = AutosaveService._pending.get(document_id)
+        if entry is None:
+            if len(AutosaveService._pending) >= settings.AUTOSAVE_MAX_PENDING:
+                # 缓冲的文档过多时立即写入最早开始缓冲的文档
+                oldest = min(AutosaveService._pending, key=lambda key: AutosaveService._pending[key]["first_at"])
+                AutosaveService._schedule_flush(oldest, "overflow")
+            entry = {"fields": {}, "first_at": now, "edits": 0, "timer": None}
+            AutosaveService._pending[document_id] = entry
+
+        entry["fields"].update({key: value for key, value in fields.items()
+                                if key in EDITABLE_FIELDS and value is not None})
+        entry["edits"] += 1
+        entry["last_at"] = now
+        Metrics.inc("autosave_edits_total")
+
+        # 空闲计时从最后一次编辑开始，但不超过首次编辑后的最长间隔
+        if entry["timer"] is not None:
+            entry["timer"].cancel()
+        delay = min(settings.AUTOSAVE_IDLE_SECONDS,
+                    max(0.0, entry["first_at"] + settings.AUTOSAVE_MAX_INTERVAL - now))
+        entry["timer"] = asyncio.get_running_loop().call_later(delay, AutosaveService._on_timer, document_id)
+
+        return {"edits": entry["edits"], "pending_seconds": round(now - entry["first_at"], 3)}
+
+    @staticmethod
+    def _on_timer(document_id: int) -> None:
+        entry = AutosaveService._pending.get(document_id)
+        if entry is None:
+            return
+        entry["timer"] = None
+        idle = time.monotonic() - entry["last_at"] >= settings.AUTOSAVE_IDLE_SECONDS
+        AutosaveService._schedule_flush(document_id, "idle" if idle else "max_interval")
+
+    @staticmethod
+    def _schedule_flush(document_id: int, reason: str) -> None:
+        task = asyncio.ensure_future(AutosaveService.flush(document_id, reason))
+        AutosaveService._tasks.add(task)
+        task.add_done_callback(AutosaveService._tasks.discard)
+
+    @staticmethod
+    def overlay(document_id: int) -> Dict[str, str]:
+        """
+        获取文档尚未写入数据库的字段（用于读取时叠加，保证读到自己的写入）
+
+        Args:
+            document_id: 文档ID
+
+        Returns:
+            Dict[str, str]: 未写入的字段
+        """
+        entry = AutosaveService._pending.get(document_id)
+        return dict(entry["fields"]) if entry else {}
+
+    @staticmethod
+    def _take(document_id: int) -> Dict[str, str]:
+        """取出文档的缓冲内容并取消计时"""
+        entry = AutosaveService._pending.pop(document_id, None)
+        if entry is None:
+            return {}
+        if entry["timer"] is not None:
+            entry["timer"].cancel()
+        return entry["fields"]
+
+    @staticmethod
+    def _restore(document_id: int, fields: Dict[str, str]) -> None:
+        """写入失败时放回缓冲，已有的更新编辑优先"""
+        entry = AutosaveService._pending.get(document_id)
+        if entry is None:
+            AutosaveService.buffer(document_id, **fields)
+        else:
+            entry["fields"] = {**fields, **entry["fields"]}
+
+    @staticmethod
+    async def flush(document_id: int, reason: str = "manual") -> bool:
+        """
+        将文档的缓冲内容写入数据库并生成一个版本
+
+        Args:
+            document_id: 文档ID
+            reason: 触发原因（idle、max_interval、overflow、shutdown等，用于统计）
+
+        Returns:
+            bool: 是否有内容写入
+        """
+        async with AutosaveService._document_lock(document_id):
+            fields = AutosaveService._take(document_id)
+            if not fields:
+                return False
+
+            db = SessionLocal()
+            try:
+                await DocumentService.update_document(db, document_id, commit_message="自动保存", **fields)
+            except Exception as e:
+                db.rollback()
+                logger.error(f"文档 {document_id} 自动保存写入失败: {str(e)}")
+                if reason != "shutdown":
+                    AutosaveService._restore(document_id, fields)
+                return False
+            finally:
+                db.close()
+
+        Metrics.inc("autosave_flushes_total", reason=reason)
+        return True
+
+    @staticmethod
+    async def checkpoint(db: Session, document_id: int, commit_message: Optional[str] = None,
+                         **fields: Optional[str]) -> Optional[Document]:
+        """
+        显式保存：合并缓冲内容和本次修改，立即写入并生成版本
+
+        Args:
+            db: 数据库会话
+            document_id: 文档ID
+            commit_message: 提交信息
+            **fields: title、content、outline，为None的字段不修改
+
+        Returns:
+            Optional[Document]: 更新后的文档对象，文档不存在时返回None
+        """
+        async with AutosaveService._document_lock(document_id):
+            buffered = AutosaveService._take(document_id)
+            merged = {**buffered, **{key: value for key, value in fields.items() if value is not None}}
+            try:
+                document = await DocumentService.update_document(
+                    db, document_id, commit_message=commit_message, **merged
+                )
+            except Exception:
+                # 写入失败时放回取出的缓冲内容，由自动保存稍后重试
+                if buffered:
+                    AutosaveService._restore(document_id, buffered)
+                raise
+            if buffered:
+                Metrics.inc("autosave_flushes_total", reason="checkpoint")
+            return document
+
+    @staticmethod
+    async def flush_all(reason: str = "shutdown") -> int:
+        """
+        写入全部缓冲（应用关闭时调用）
+
+        Args:
+            reason: 触发原因
+
+        Returns:
+            int: 写入的文档数
+        """
+        flushed = 0
+        for document_id in list(AutosaveService._pending):
+            flushed += await AutosaveService.flush(document_id, reason)
+        if AutosaveService._tasks:
+            await asyncio.wait(set(AutosaveService._tasks))
+        return flushed
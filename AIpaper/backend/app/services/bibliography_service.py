@@ -0,0 +1,371 @@
+import re
+import json
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.db.database import SessionLocal
+from app.models.pdf_source import PDFSource
+from app.models.reference import Reference
+from app.services.dedup_service import DedupService
+from app.services.metadata_store_service import MetadataStoreService
+from app.services.reference_service import ReferenceService
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class BibliographyService:
+    """
+    PDF参考文献提取服务
+
+    从PDF全文中定位参考文献部分并切分、解析条目，再批量解析为引用记录：
+    含DOI的条目一次性查询本地元数据库后按组发送Crossref请求，其余条目经有限并发、
+    批量优先级的引用字符串解析（带缓存），最后一次性写入Reference表。
+
+    提取的引用只关联PDF源文件记录（pdf_source_id），不设置document_id，
+    不会进入文档自身的参考文献列表、导出和输入提示
+    """
+
+    # 参考文献部分的标题
+    _SECTION_HEADING = re.compile(
+        r"^[ \t]*(?:\d+\.?[ \t]*)?(references|bibliography|works cited|literature cited|reference list|参考文献)[ \t]*:?[ \t]*$",
+        re.IGNORECASE | re.MULTILINE
+    )
+
+    # 参考文献之后的部分
+    _END_HEADING = re.compile(
+        r"^[ \t]*(?:[A-Z]\.?[ \t]+|\d+\.?[ \t]*)?(appendix|appendices|supplementary (?:material|information)|附录)\b",
+        re.IGNORECASE | re.MULTILINE
+    )
+
+    # 编号条目，如 "[12] " 或 "12. "
+    _NUMBERED = re.compile(r"^[ \t]*(?:\[(\d{1,3})\]|(\d{1,3})\.)[ \t]+", re.MULTILINE)
+
+    # 作者-年份格式条目的开头，如 "Smith, J." 或 "van der Berg, A."
+    _AUTHOR_START = re.compile(r"^(?:[a-z]+ ){0,2}[A-Z][\w'’\-]+,[ \t]+(?:[A-Z]\.|[A-Z][a-z]+)")
+
+    _YEAR = re.compile(r"\b((?:19|20)\d{2})[a-z]?\b")
+    _QUOTED = re.compile(r"[“\"]([^”\"]{10,})[”\"]")
+
+    # 解析结果的标题词中至少有该比例出现在原始条目中，才认为解析正确
+    MATCH_THRESHOLD = 0.8
+
+    # 标题未精确命中时，从本地元数据库检索的候选数
+    LOCAL_CANDIDATES = 3
+
+    MIN_ENTRY_LENGTH = 20
+    MAX_ENTRY_LENGTH = 1000
+
+    @staticmethod
+    def find_section(text: str) -> Optional[str]:
+        """
+        定位参考文献部分
+
+        取最后一个参考文献标题之后的文本（目录中也可能出现该标题），到附录等标题为止
+
+        Args:
+            text: PDF全文
+
+        Returns:
+            Optional[str]: 参考文献部分，未找到时返回None
+        """
+        matches = list(BibliographyService._SECTION_HEADING.finditer(text or ""))
+        if not matches:
+            return None
+        section = text[matches[-1].end():]
+        end = BibliographyService._END_HEADING.search(section)
+        return section[:end.start()] if end else section
+
+    @staticmethod
+    def split_entries(section: str) -> List[str]:
+        """
+        将参考文献部分切分为条目
+
+        有连续编号时按编号切分，否则按作者-年份格式的条目开头切分
+
+        Args:
+            section: 参考文献部分的文本
+
+        Returns:
+            List[str]: 条目文本（已合并换行）
+        """
+        # 合并行尾连字符断开的单词
+        section = re.sub(r"(\w)-\n(\w)", r"\1\2", section)
+
+        numbered = list(BibliographyService._NUMBERED.finditer(section))
+        numbers = [int(m.group(1) or m.group(2)) for m in numbered]
+        if len(numbered) >= 3 and numbers[0] <= 1 and \
+                sum(b == a + 1 for a, b in zip(numbers, numbers[1:])) >= (len(numbers) - 1) * 0.8:
+            ends = [m.start() for m in numbered[1:]] + [len(section)]
+            entries = [section[m.end():end] for m, end in zip(numbered, ends)]
+        else:
+            entries, current = [], []
+            for line in section.splitlines():
+                line = line.strip()
+                if not line:
+                    continue
+                previous = " ".join(current)
+                if current and BibliographyService._AUTHOR_START.match(line) and \
+                        previous.rstrip().endswith((".", ")")) and BibliographyService._YEAR.search(previous):
+                    entries.append(previous)
+                    current = []
+                current.append(line)
+            if current:
+                entries.append(" ".join(current))
+
+        entries = [" ".join(entry.split()) for entry in entries]
+        return [
+            entry for entry in entries
+            if BibliographyService.MIN_ENTRY_LENGTH <= len(entry) <= BibliographyService.MAX_ENTRY_LENGTH
+        ][:settings.PDF_MAX_REFERENCES]
+
+    @staticmethod
+    def _parse_authors(text: str) -> List[str]:
+        """从条目开头部分解析作者列表"""
+        text = text.strip().rstrip(",;( ")
+        # "Smith, J. A." 形式（以首字母缩写开头的为 "J. A. Smith" 形式）
+        if not re.match(r"(?:[A-Z]\.\s*)+[A-Z]", text):
+            authors = re.findall(r"((?:[a-z]+ ){0,2}[A-Z][\w'’\-]+,\s*(?:[A-Z]\.\s*(?:-?[A-Z]\.\s*)*))", text)
+            if authors:
+                return [" ".join(author.split()).rstrip(",") for author in authors]
+        # "J. A. Smith" 或 "John Smith" 形式
+        parts = re.split(r",\s*(?:and\s+|&\s*)?|\s+(?:and|&)\s+|;\s*", text)
+        return [part.strip() for part in parts if part.strip() and len(part.split()) <= 5][:20]
+
+    @staticmethod
+    def parse_entry(raw: str) -> Dict[str, Any]:
+        """
+        解析一条参考文献
+
+        Args:
+            raw: 条目文本
+
+        Returns:
+            Dict[str, Any]: {"raw", "doi", "title", "authors", "year"}，无法识别的字段为空
+        """
+        doi = MetadataStoreService.normalize_doi(ReferenceService.extract_doi(raw))
+
+        year_match = BibliographyService._YEAR.search(raw)
+        year = year_match.group(1) if year_match else None
+
+        title = None
+        quoted = BibliographyService._QUOTED.search(raw)
+        if quoted:
+            title = quoted.group(1).strip().rstrip(",.")
+            authors_text = raw[:quoted.start()]
+        elif year_match and year_match.start() < len(raw) // 2:
+            # 作者-年份格式：年份之后的第一句为标题
+            authors_text = raw[:year_match.start()]
+            rest = raw[year_match.end():].lstrip(").,:; ")
+            title = re.split(r"(?<=[a-z0-9?!])\.\s+", rest, maxsplit=1)[0].strip().rstrip(".")
+        else:
+            # 作者后第一句为标题
+            segments = re.split(r"(?<=[a-z0-9?!])\.\s+", raw)
+            authors_text = segments[0]
+            title = segments[1].strip().rstrip(".") if len(segments) > 1 else None
+
+        return {
+            "raw": raw,
+            "doi": doi,
+            "title": title or None,
+            "authors": BibliographyService._parse_authors(authors_text),
+            "year": year,
+        }
+
+    @staticmethod
+    def extract_entries(text: str) -> List[Dict[str, Any]]:
+        """
+        从PDF全文中提取并解析参考文献条目
+
+        Args:
+            text: PDF全文
+
+        Returns:
+            List[Dict[str, Any]]: 解析后的条目
+        """
+        section = BibliographyService.find_section(text)
+        if not section:
+            return []
+        return [BibliographyService.parse_entry(entry) for entry in BibliographyService.split_entries(section)]
+
+    @staticmethod
+    def _matches(entry: Dict[str, Any], reference: Dict[str, Any]) -> bool:
+        """检查引用字符串查询到的结果是否就是该条目（上游总会返回一个最佳匹配）"""
+        title_tokens = set(DedupService.normalize_title(reference.get("title")).split())
+        if not title_tokens:
+            return False
+        raw_tokens = set(DedupService.normalize_title(entry["raw"]).split())
+        if len(title_tokens & raw_tokens) < len(title_tokens) * BibliographyService.MATCH_THRESHOLD:
+            return False
+        year = str(reference.get("published_date") or "")[:4]
+        if entry.get("year") and year.isdigit():
+            return abs(int(year) - int(entry["year"])) <= 1
+        return True
+
+    @staticmethod
+    async def resolve_entries(entries: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        批量解析参考文献条目
+
+        Args:
+            entries: parse_entry的结果列表
+
+        Returns:
+            List[Optional[Dict[str, Any]]]: 与输入一一对应的引用信息，未解析到时为None
+        """
+        resolved: List[Optional[Dict[str, Any]]] = [None] * len(entries)
+
+        by_doi = await ReferenceService.resolve_dois([entry["doi"] for entry in entries if entry["doi"]])
+        pending = []
+        for i, entry in enumerate(entries):
+            if entry["doi"] and entry["doi"] in by_doi:
+                resolved[i] = by_doi[entry["doi"]]
+            else:
+                pending.append(i)
+
+        # 其余条目先按解析出的标题查本地元数据库：一次查询精确匹配，未命中的再逐条检索本地候选
+        def lookup_titles() -> Dict[int, Dict[str, Any]]:
+            titled = [i for i in pending if entries[i]["title"]]
+            exact = MetadataStoreService.get_by_titles([entries[i]["title"] for i in titled])
+            found = {}
+            for i in titled:
+                reference = exact.get(MetadataStoreService.normalize_title(entries[i]["title"]))
+                candidates = [reference] if reference else MetadataStoreService.search(
+                    entries[i]["title"], limit=BibliographyService.LOCAL_CANDIDATES
+                )
+                for candidate in candidates:
+                    if BibliographyService._matches(entries[i], candidate):
+                        found[i] = candidate
+                        break
+            return found
+
+        for i, reference in (await asyncio.to_thread(lookup_titles)).items():
+            resolved[i] = reference
+        pending = [i for i in pending if resolved[i] is None]
+
+        if pending:
+            # DOI已按批查询过，剩余条目去掉DOI后按引用字符串解析
+            citations = [ReferenceService.DOI_PATTERN.sub("", entries[i]["raw"]) for i in pending]
+            async for result in ReferenceService.resolve_many(citations):
+                i = pending[result["index"]]
+                reference = result["reference"]
+                if reference and BibliographyService._matches(entries[i], reference):
+                    resolved[i] = reference
+        return resolved
+
+    @staticmethod
+    def _build_reference(entry: Dict[str, Any], reference: Optional[Dict[str, Any]],
+                         source: PDFSource) -> Reference:
+        """由条目和解析结果构造Reference记录，未解析的条目原文只保存在raw_data中"""
+        data = dict(reference) if reference else {
+            "title": entry["title"],
+            "authors": entry["authors"],
+            "doi": entry["doi"],
+            "published_date": f"{entry['year']}-01-01" if entry["year"] else None,
+        }
+        year = str(data.get("published_date") or "")[:4] or entry["year"]
+        return Reference(
+            title=(data.get("title") or "")[:512] or None,
+            authors=json.dumps(data.get("authors") or [], ensure_ascii=False),
+            journal=(data.get("journal") or "")[:512] or None,
+            year=year,
+            doi=(data.get("doi") or "")[:255] or None,
+            url=(data.get("url") or "")[:1024] or None,
+            raw_data={**data, "raw": entry["raw"], "resolved": reference is not None},
+            pdf_source_id=source.id
+        )
+
+    @staticmethod
+    def save_references(pdf_id: str, entries: List[Dict[str, Any]],
+                        resolved: List[Optional[Dict[str, Any]]]) -> int:
+        """
+        将参考文献写入引用该PDF的每条源文件记录
+
+        已提取过参考文献的源文件记录跳过，避免重复处理时重复写入
+
+        Args:
+            pdf_id: PDF唯一ID
+            entries: 解析后的条目
+            resolved: 对应的引用信息
+
+        Returns:
+            int: 写入的记录数
+        """
+        db = SessionLocal()
+        try:
+            sources = db.query(PDFSource).filter(PDFSource.vector_db_id == pdf_id).all()
+            extracted = {
+                row.pdf_source_id for row in db.query(Reference.pdf_source_id).filter(
+                    Reference.pdf_source_id.in_([source.id for source in sources])
+                ).distinct()
+            }
+            rows = [
+                BibliographyService._build_reference(entry, reference, source)
+                for source in sources if source.id not in extracted
+                for entry, reference in zip(entries, resolved)
+            ]
+            db.add_all(rows)
+            db.commit()
+            return len(rows)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"保存PDF {pdf_id} 的参考文献时出错: {e}")
+            return 0
+        finally:
+            db.close()
+
+    @staticmethod
+    def copy_references(db: Session, from_source_id: int, to_source: PDFSource) -> int:
+        """
+        复用已处理的同一PDF的参考文献（同一PDF关联到新文档时）
+
+        Args:
+            db: 数据库会话
+            from_source_id: 已提取参考文献的源文件记录ID
+            to_source: 新的源文件记录
+
+        Returns:
+            int: 复制的记录数
+        """
+        references = db.query(Reference).filter(Reference.pdf_source_id == from_source_id).all()
+        db.add_all([
+            Reference(
+                title=reference.title,
+                authors=reference.authors,
+                journal=reference.journal,
+                year=reference.year,
+                doi=reference.doi,
+                url=reference.url,
+                raw_data=reference.raw_data,
+                pdf_source_id=to_source.id
+            )
+            for reference in references
+        ])
+        db.commit()
+        return len(references)
+
+    @staticmethod
+    async def ingest(pdf_id: str, entries: List[Dict[str, Any]]) -> int:
+        """
+        解析并保存PDF的参考文献
+
+        Args:
+            pdf_id: PDF唯一ID
+            entries: extract_entries的结果
+
+        Returns:
+            int: 写入的记录数
+        """
+        if not entries:
+            return 0
+        resolved = await BibliographyService.resolve_entries(entries)
+        count = await asyncio.to_thread(BibliographyService.save_references, pdf_id, entries, resolved)
+        logger.info(
+            f"PDF {pdf_id} 提取参考文献 {len(entries)} 条，解析成功 {sum(r is not None for r in resolved)} 条，"
+            f"写入 {count} 条引用记录"
+        )
+        return count
@@ -0,0 +1,279 @@
+import os
+import copy
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Tuple
+from functools import lru_cache
+
+from app.core.config import get_settings
+from app.core.metrics import Metrics
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+Metrics.describe("cache_requests_total", "缓存查询次数，按缓存名称和命中层级统计")
+Metrics.describe("cache_upstream_calls_saved_total", "因缓存命中或并发合并而省去的上游调用次数")
+Metrics.describe("cache_upstream_calls_total", "缓存未命中后实际发起的上游调用次数")
+
+
+class TTLCache:
+    """
+    进程内带过期时间的LRU缓存
+
+    默认写入和读取时都深拷贝值，调用方修改取到的结果不会影响缓存；
+    值本身不可变（字符串、元组等）时可传入copy=False省去拷贝。
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300, copy: bool = True):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.copy = copy
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """读取缓存，过期或不存在时返回None"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+        return copy.deepcopy(value) if self.copy else value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        if self.copy:
+            value = copy.deepcopy(value)
+        with self._lock:
+            self._data[key] = (time.monotonic() + (ttl if ttl is not None else self.ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SharedCacheBackend(ABC):
+    """跨进程共享缓存后端基类，值以JSON存储"""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        """读取缓存，过期或不存在时返回None"""
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        """写入缓存"""
+
+
+class SQLiteCacheBackend(SharedCacheBackend):
+    """基于本地SQLite文件的共享缓存，供同一主机上的多个uvicorn worker共用"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """打开连接并在事务中执行，结束后关闭连接"""
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _get(self, key: str) -> Optional[Any]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return json.loads(row[0])
+
+    def _set(self, key: str, value: Any, ttl: float) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), time.time() + ttl),
+            )
+            # 顺带清理少量过期条目，避免文件无限增长
+            conn.execute(
+                "DELETE FROM cache WHERE rowid IN "
+                "(SELECT rowid FROM cache WHERE expires_at < ? LIMIT 100)",
+                (time.time(),),
+            )
+
+    async def get(self, key: str) -> Optional[Any]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        await asyncio.to_thread(self._set, key, value, ttl)
+
+
+class RedisCacheBackend(SharedCacheBackend):
+    """基于Redis协议的共享缓存（可指向任意兼容Redis协议的本地服务）"""
+
+    def __init__(self, url: str):
+        try:
+            from redis import asyncio as redis_asyncio
+        except ImportError as e:
+            raise RuntimeError("使用Redis共享缓存需要安装redis") from e
+        self.client = redis_asyncio.from_url(url)
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = await self.client.get(key)
+        return json.loads(value) if value is not None else None
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        await self.client.set(key, json.dumps(value, ensure_ascii=False), ex=max(1, int(ttl)))
+
+
+class SingleFlight:
+    """
+    并发请求合并
+
+    同一键的并发调用只执行一次加载函数，其余调用等待并共享结果。
+    加载在独立任务中运行，某个调用方被取消不会影响其他等待者。
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        执行或加入一次加载
+
+        Returns:
+            Tuple[Any, bool]: (结果, 是否复用了其他调用发起的加载)
+        """
+        task = self._calls.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(loader())
+            self._calls[key] = task
+
+            def forget(done: asyncio.Task, key=key):
+                if self._calls.get(key) is done:
+                    del self._calls[key]
+                # 标记异常已被读取，避免无人等待时输出警告
+                if not done.cancelled():
+                    done.exception()
+
+            task.add_done_callback(forget)
+
+        return await asyncio.shield(task), shared
+
+
+class TieredCache:
+    """
+    两级缓存：进程内LRU + 可选的共享缓存，未命中时通过SingleFlight合并上游请求
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float,
+                 shared: Optional[SharedCacheBackend] = None):
+        self.name = name
+        self.ttl = ttl
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.shared = shared
+        self.flight = SingleFlight()
+
+    async def get(self, key: str) -> Optional[Any]:
+        """依次查询本地和共享缓存"""
+        value = self.local.get(key)
+        if value is not None:
+            Metrics.inc("cache_requests_total", cache=self.name, result="hit_local")
+            return value
+
+        if self.shared is not None:
+            try:
+                value = await self.shared.get(f"{self.name}:{key}")
+            except Exception as e:
+                logger.error(f"读取共享缓存 {self.name} 时出错: {e}")
+                value = None
+            if value is not None:
+                Metrics.inc("cache_requests_total", cache=self.name, result="hit_shared")
+                self.local.set(key, value)
+                return value
+
+        Metrics.inc("cache_requests_total", cache=self.name, result="miss")
+        return None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """写入本地和共享缓存"""
+        ttl = ttl if ttl is not None else self.ttl
+        self.local.set(key, value, ttl)
+        if self.shared is not None:
+            try:
+                await self.shared.set(f"{self.name}:{key}", value, ttl)
+            except Exception as e:
+                logger.error(f"写入共享缓存 {self.name} 时出错: {e}")
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]],
+                          should_cache: Callable[[Any], bool] = lambda value: True) -> Any:
+        """
+        读取缓存，未命中时加载并回填
+
+        Args:
+            key: 缓存键
+            loader: 加载函数（发起上游请求）
+            should_cache: 判断加载结果是否可以缓存
+
+        Returns:
+            Any: 缓存或加载的结果
+        """
+        value = await self.get(key)
+        if value is not None:
+            Metrics.inc("cache_upstream_calls_saved_total", cache=self.name)
+            return value
+
+        async def load_and_store():
+            Metrics.inc("cache_upstream_calls_total", cache=self.name)
+            result = await loader()
+            if result is not None and should_cache(result):
+                await self.set(key, result)
+            return result
+
+        value, shared = await self.flight.do(key, load_and_store)
+        if shared:
+            Metrics.inc("cache_upstream_calls_saved_total", cache=self.name)
+            # 合并的调用共享同一个结果对象，各自返回拷贝
+            value = copy.deepcopy(value)
+        return value
+
+
+@lru_cache()
+def get_shared_cache_backend() -> Optional[SharedCacheBackend]:
+    """根据配置获取共享缓存后端，未配置时返回None"""
+    if settings.CACHE_SHARED_BACKEND == "sqlite":
+        path = settings.CACHE_SQLITE_PATH or os.path.join(settings.UPLOAD_DIR, "cache", "cache.sqlite3")
+        return SQLiteCacheBackend(path)
+    if settings.CACHE_SHARED_BACKEND == "redis":
+        return RedisCacheBackend(settings.CACHE_REDIS_URL)
+    return None
@@ -0,0 +1,177 @@
+import os
+import re
+import logging
+import threading
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class CitationStyleService:
+    """
+    基于CSL（Citation Style Language）的引用格式化服务
+
+    样式文件解析开销较大，每个进程每种样式只解析一次并缓存解析后的样式对象；
+    批量格式化时所有条目共用一次样式准备。
+    """
+
+    # 样式名只允许字母、数字、连字符和下划线，避免路径穿越
+    _STYLE_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+    @staticmethod
+    def _bundled_styles_dir() -> Optional[str]:
+        try:
+            from citeproc.frontend import STYLES_PATH
+        except ImportError:
+            return None
+        return STYLES_PATH
+
+    @staticmethod
+    def _style_path(name: str) -> Optional[str]:
+        """查找样式文件，优先使用CSL_STYLES_DIR中的样式，其次为citeproc-py自带样式"""
+        for directory in (settings.CSL_STYLES_DIR, CitationStyleService._bundled_styles_dir()):
+            if directory:
+                path = os.path.join(directory, f"{name}.csl")
+                if os.path.isfile(path):
+                    return path
+        return None
+
+    @staticmethod
+    def list_styles() -> List[str]:
+        """列出可用的CSL样式名称"""
+        names = set()
+        for directory in (settings.CSL_STYLES_DIR, CitationStyleService._bundled_styles_dir()):
+            if directory and os.path.isdir(directory):
+                names.update(
+                    filename[:-4] for filename in os.listdir(directory)
+                    if filename.endswith(".csl") and CitationStyleService._STYLE_NAME_PATTERN.match(filename[:-4])
+                )
+        return sorted(names)
+
+    @staticmethod
+    def has_style(name: str) -> bool:
+        """样式是否可用"""
+        return bool(CitationStyleService._STYLE_NAME_PATTERN.match(name or "")) and \
+            CitationStyleService._style_path(name) is not None
+
+    @staticmethod
+    @lru_cache(maxsize=settings.CSL_STYLE_CACHE_SIZE)
+    def get_style(name: str, locale: Optional[str] = None) -> Tuple[Any, threading.Lock]:
+        """
+        加载并缓存解析后的CSL样式
+
+        citeproc渲染时会修改样式对象上的状态，因此每个样式附带一把锁，渲染期间独占使用
+
+        Args:
+            name: 样式名称（不含 .csl 扩展名）
+            locale: 区域设置，默认使用样式声明的default-locale
+
+        Returns:
+            Tuple[Any, threading.Lock]: (CitationStylesStyle对象, 渲染锁)
+
+        Raises:
+            ValueError: 样式不存在
+        """
+        from citeproc import CitationStylesStyle
+
+        path = CitationStyleService._style_path(name) \
+            if CitationStyleService._STYLE_NAME_PATTERN.match(name or "") else None
+        if path is None:
+            raise ValueError(f"未知的引用样式: {name}")
+        logger.info(f"加载CSL样式: {path}")
+        return CitationStylesStyle(path, locale=locale, validate=False), threading.Lock()
+
+    @staticmethod
+    def _split_name(author: Any) -> Dict[str, str]:
+        """将 "姓, 名" 或 "名 姓" 形式的作者转换为CSL姓名"""
+        if isinstance(author, dict):
+            return {k: v for k, v in author.items() if k in ("family", "given", "literal") and v}
+        author = str(author).strip()
+        if "," in author:
+            family, given = author.split(",", 1)
+            return {"family": family.strip(), "given": given.strip()}
+        parts = author.split()
+        if len(parts) > 1:
+            return {"family": parts[-1], "given": " ".join(parts[:-1])}
+        return {"literal": author}
+
+    @staticmethod
+    def to_csl_json(reference: Dict[str, Any], item_id: str) -> Dict[str, Any]:
+        """
+        将引用信息转换为CSL-JSON条目
+
+        Args:
+            reference: 引用信息（与搜索结果格式一致）
+            item_id: 条目ID
+
+        Returns:
+            Dict[str, Any]: CSL-JSON条目
+        """
+        authors = reference.get("authors") or []
+        if isinstance(authors, str):
+            authors = [a for a in authors.split(";") if a.strip()]
+
+        item = {
+            "id": item_id,
+            "type": "article-journal" if reference.get("journal") else "article",
+            "title": reference.get("title") or "",
+            "author": [CitationStyleService._split_name(author) for author in authors],
+        }
+
+        date = str(reference.get("published_date") or reference.get("year") or "")
+        date_parts = [int(part) for part in re.findall(r"\d+", date)[:3]]
+        if date_parts:
+            # 上游缺少月日时默认填充为1，这里只保留年份避免输出虚假的日期
+            if len(date_parts) == 3 and date_parts[1:] == [1, 1]:
+                date_parts = date_parts[:1]
+            item["issued"] = {"date-parts": [date_parts]}
+
+        for field, csl_field in (("journal", "container-title"), ("volume", "volume"), ("issue", "issue"),
+                                 ("pages", "page"), ("doi", "DOI"), ("url", "URL"), ("publisher", "publisher")):
+            if reference.get(field):
+                item[csl_field] = str(reference[field])
+        return item
+
+    @staticmethod
+    def render(references: List[Dict[str, Any]], style: str,
+               output: str = "text", sort: bool = False) -> List[str]:
+        """
+        使用CSL样式批量格式化引用
+
+        所有条目共用一个已缓存的样式对象和一次bibliography构建
+
+        Args:
+            references: 引用信息列表
+            style: CSL样式名称
+            output: 输出格式，"text" 或 "html"
+            sort: 是否按样式规则排序（生成参考文献列表时使用），否则保持输入顺序
+
+        Returns:
+            List[str]: 格式化后的条目
+
+        Raises:
+            ValueError: 样式不存在
+        """
+        if not references:
+            return []
+
+        from citeproc import CitationStylesBibliography, Citation, CitationItem, formatter
+        from citeproc.source.json import CiteProcJSON
+
+        style_obj, lock = CitationStyleService.get_style(style)
+        items = [CitationStyleService.to_csl_json(reference, f"ref{i}") for i, reference in enumerate(references)]
+        source = CiteProcJSON(items)
+
+        with lock:
+            bibliography = CitationStylesBibliography(
+                style_obj, source, formatter.html if output == "html" else formatter.plain
+            )
+            for item in items:
+                bibliography.register(Citation([CitationItem(item["id"])]))
+            if sort:
+                bibliography.sort()
+            return [str(entry) for entry in bibliography.bibliography()]
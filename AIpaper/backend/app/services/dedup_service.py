@@ -0,0 +1,394 @@
+import re
+import json
+import datetime
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.models.document import Document
+from app.models.reference import Reference
+from app.models.reference_fingerprint import ReferenceFingerprint
+from app.services.fingerprint_service import FingerprintService
+from app.services.metadata_store_service import MetadataStoreService
+
+
+class DedupIndex:
+    """
+    增量去重索引
+
+    按DOI、规范化标题和MinHash LSH分段建立哈希桶，新条目只与同桶的少量条目比较，
+    插入和查找都是常数时间，整体对结果数量线性。
+    """
+
+    # 每个桶最多比较的条目数，避免常见标题（如 "Introduction"）退化为平方复杂度
+    MAX_CANDIDATES_PER_BUCKET = 8
+
+    def __init__(self):
+        self._fingerprints: Dict[Any, List[Dict[str, Any]]] = {}
+        self._buckets: Dict[Tuple, List[Any]] = {}
+
+    @staticmethod
+    def _bucket_keys(fingerprint: Dict[str, Any]) -> List[Tuple]:
+        keys = []
+        if fingerprint["doi"]:
+            keys.append(("doi", fingerprint["doi"]))
+        if fingerprint["title_key"]:
+            keys.append(("title", fingerprint["title_key"]))
+        keys.extend(("band", i, band) for i, band in enumerate(fingerprint["bands"]))
+        return keys
+
+    def find(self, fingerprint: Dict[str, Any]) -> Optional[Any]:
+        """查找与指纹重复的已有条目，返回其ID，没有时返回None"""
+        checked = set()
+        for key in self._bucket_keys(fingerprint):
+            for item_id in self._buckets.get(key, ())[:self.MAX_CANDIDATES_PER_BUCKET]:
+                if item_id in checked:
+                    continue
+                checked.add(item_id)
+                if any(DedupService.is_duplicate(fingerprint, other) for other in self._fingerprints[item_id]):
+                    return item_id
+        return None
+
+    def add(self, item_id: Any, fingerprint: Dict[str, Any]) -> None:
+        """将指纹加入条目（同一条目可有多个变体指纹，后续变体可经任一指纹匹配）"""
+        self._fingerprints.setdefault(item_id, []).append(fingerprint)
+        for key in self._bucket_keys(fingerprint):
+            bucket = self._buckets.setdefault(key, [])
+            if item_id not in bucket:
+                bucket.append(item_id)
+
+
+class DedupService:
+    """文献去重服务：规范化键精确匹配 + MinHash/LSH近似匹配"""
+
+    # 标题词集合的Jaccard相似度达到该值即视为重复（MinHash/LSH只用于生成候选项）
+    SIMILARITY_THRESHOLD = 0.8
+
+    # 一个标题是另一个去掉副标题后的形式时，前者至少需要的词数
+    MIN_PREFIX_WORDS = 4
+
+    # 参与比较的作者数
+    MAX_AUTHORS = 3
+
+    # 合并重复项时从其他条目补充的字段
+    MERGE_FIELDS = ("doi", "abstract", "url", "journal", "publisher", "volume", "issue", "pages",
+                    "published_date")
+
+    @staticmethod
+    def normalize_title(title: Optional[str]) -> str:
+        """规范化标题：去除重音、标点和大小写差异"""
+        text = unicodedata.normalize("NFKD", title or "")
+        text = "".join(ch for ch in text if not unicodedata.combining(ch))
+        return " ".join(FingerprintService.tokenize(text))
+
+    @staticmethod
+    def _author_surnames(authors: Any) -> List[str]:
+        """提取作者姓氏，兼容列表、JSON字符串和分号分隔的字符串"""
+        if isinstance(authors, str):
+            try:
+                authors = json.loads(authors)
+            except ValueError:
+                authors = authors.split(";")
+        if not isinstance(authors, list):
+            return []
+
+        surnames = []
+        for author in authors[:DedupService.MAX_AUTHORS]:
+            if isinstance(author, dict):
+                author = author.get("family") or author.get("name") or ""
+            author = str(author).strip()
+            if not author:
+                continue
+            # "姓, 名" 取逗号前部分，否则取最后一个词
+            surname = author.split(",")[0] if "," in author else author.split()[-1]
+            surname = DedupService.normalize_title(surname)
+            if surname:
+                surnames.append(surname)
+        return surnames
+
+    @staticmethod
+    def _year(reference: Dict[str, Any]) -> Optional[int]:
+        match = re.match(r"(\d{4})", str(reference.get("published_date") or reference.get("year") or ""))
+        return int(match.group(1)) if match else None
+
+    @staticmethod
+    def fingerprint(reference: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        计算引用的去重指纹
+
+        MinHash特征为标题词、相邻词对、前几位作者姓氏和年份
+
+        Args:
+            reference: 引用信息（title、authors、published_date或year、doi）
+
+        Returns:
+            Dict[str, Any]: doi、title_key、first_author、year、bands（LSH分段）
+        """
+        title_key = DedupService.normalize_title(reference.get("title"))
+        words = title_key.split()
+        surnames = DedupService._author_surnames(reference.get("authors"))
+        year = DedupService._year(reference)
+
+        features = set(words)
+        features.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+        features.update(f"author:{surname}" for surname in surnames)
+        if year:
+            features.add(f"year:{year}")
+
+        signature = FingerprintService.minhash(features)
+        return {
+            "doi": MetadataStoreService.normalize_doi(reference.get("doi")),
+            "title_key": title_key,
+            "first_author": surnames[0] if surnames else None,
+            "year": year,
+            "bands": FingerprintService.lsh_bands(signature),
+        }
+
+    @staticmethod
+    def is_duplicate(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+        """
+        判断两个指纹是否指向同一文献
+
+        DOI相同即为重复，DOI不同则一定不是；否则要求年份相差不超过1年、第一作者一致，
+        且标题相同、标题词集合足够相似，或一个标题是另一个省略副标题后的形式
+        """
+        if a["doi"] and b["doi"]:
+            return a["doi"] == b["doi"]
+        if a["year"] and b["year"] and abs(a["year"] - b["year"]) > 1:
+            return False
+        if a["first_author"] and b["first_author"] and a["first_author"] != b["first_author"]:
+            return False
+        if not a["title_key"] or not b["title_key"]:
+            return False
+        if a["title_key"] == b["title_key"]:
+            return True
+
+        shorter, longer = sorted((a["title_key"], b["title_key"]), key=len)
+        if (a["first_author"] and b["first_author"]
+                and len(shorter.split()) >= DedupService.MIN_PREFIX_WORDS
+                and longer.startswith(shorter + " ")):
+            return True
+
+        words_a, words_b = set(a["title_key"].split()), set(b["title_key"].split())
+        return len(words_a & words_b) / len(words_a | words_b) >= DedupService.SIMILARITY_THRESHOLD
+
+    @staticmethod
+    def cluster(references: List[Dict[str, Any]]) -> List[List[int]]:
+        """
+        将引用列表按重复关系分组
+
+        Args:
+            references: 引用信息列表
+
+        Returns:
+            List[List[int]]: 各组的下标，按首次出现顺序排列
+        """
+        index = DedupIndex()
+        groups: List[List[int]] = []
+        for i, reference in enumerate(references):
+            fingerprint = DedupService.fingerprint(reference)
+            group_id = index.find(fingerprint)
+            if group_id is None:
+                group_id = len(groups)
+                groups.append([])
+            groups[group_id].append(i)
+            index.add(group_id, fingerprint)
+        return groups
+
+    @staticmethod
+    def _preference(reference: Dict[str, Any]) -> Tuple:
+        """选取代表条目的优先级：Crossref来源、有DOI、字段更完整"""
+        return (
+            reference.get("source") == "crossref",
+            bool(reference.get("doi")),
+            sum(1 for value in reference.values() if value),
+        )
+
+    @staticmethod
+    def merge(references: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """合并一组重复引用：取优先级最高的条目，缺失字段由其他条目补充"""
+        best = dict(max(references, key=DedupService._preference))
+        for reference in references:
+            for field in DedupService.MERGE_FIELDS:
+                if not best.get(field) and reference.get(field):
+                    best[field] = reference[field]
+            if reference.get("citation_count"):
+                best["citation_count"] = max(best.get("citation_count") or 0, reference["citation_count"])
+        return best
+
+    @staticmethod
+    def dedup(references: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        对搜索结果去重，时间复杂度对结果数量线性
+
+        Args:
+            references: 引用信息列表（可来自多个数据源）
+
+        Returns:
+            List[Dict[str, Any]]: 去重合并后的列表，保持首次出现的顺序
+        """
+        return [
+            DedupService.merge([references[i] for i in group])
+            for group in DedupService.cluster(references)
+        ]
+
+    @staticmethod
+    def _reference_row_dict(reference: Reference) -> Dict[str, Any]:
+        return {
+            "title": reference.title,
+            "authors": reference.authors,
+            "year": reference.year,
+            "doi": reference.doi,
+        }
+
+    @staticmethod
+    def _scoped_references(db: Session, user_id: Optional[int], document_id: Optional[int]):
+        # 从PDF中提取的引用不属于文献库
+        query = db.query(Reference).filter(Reference.pdf_source_id.is_(None))
+        if document_id is not None:
+            query = query.filter(Reference.document_id == document_id)
+        if user_id is not None:
+            query = query.join(Document, Reference.document_id == Document.id).filter(Document.user_id == user_id)
+        return query
+
+    @staticmethod
+    def sync_fingerprints(db: Session, user_id: Optional[int] = None,
+                          document_id: Optional[int] = None, batch_size: int = 1000) -> int:
+        """
+        增量更新文献库的去重指纹，只计算新增或修改过的引用
+
+        Args:
+            db: 数据库会话
+            user_id: 用户ID
+            document_id: 文档ID
+
+        Returns:
+            int: 重新计算的引用数量
+        """
+        stale = (
+            DedupService._scoped_references(db, user_id, document_id)
+            .outerjoin(ReferenceFingerprint, ReferenceFingerprint.reference_id == Reference.id)
+            .filter(or_(
+                ReferenceFingerprint.id.is_(None),
+                ReferenceFingerprint.updated_at < Reference.updated_at
+            ))
+            .with_entities(Reference, ReferenceFingerprint)
+            .yield_per(batch_size)
+        )
+
+        count = 0
+        now = datetime.datetime.utcnow()
+        for reference, row in stale:
+            fingerprint = DedupService.fingerprint(DedupService._reference_row_dict(reference))
+            if row is None:
+                row = ReferenceFingerprint(reference_id=reference.id)
+                db.add(row)
+            row.doi = fingerprint["doi"]
+            row.title_key = fingerprint["title_key"][:1024]
+            row.first_author = (fingerprint["first_author"] or "")[:255] or None
+            row.year = fingerprint["year"]
+            for i in range(FingerprintService.MINHASH_BANDS):
+                setattr(row, f"band{i}", fingerprint["bands"][i] if fingerprint["bands"] else None)
+            row.updated_at = now
+            count += 1
+
+        if count:
+            db.commit()
+        return count
+
+    @staticmethod
+    def _row_fingerprint(row: ReferenceFingerprint) -> Dict[str, Any]:
+        bands = tuple(getattr(row, f"band{i}") for i in range(FingerprintService.MINHASH_BANDS))
+        return {
+            "doi": row.doi,
+            "title_key": row.title_key,
+            "first_author": row.first_author,
+            "year": row.year,
+            "bands": bands if all(band is not None for band in bands) else (),
+        }
+
+    @staticmethod
+    def find_library_duplicates(db: Session, user_id: Optional[int] = None,
+                                document_id: Optional[int] = None) -> List[List[Reference]]:
+        """
+        查找文献库中的重复引用
+
+        先增量同步指纹，再只读取指纹列在内存中分组，最后加载有重复的引用
+
+        Args:
+            db: 数据库会话
+            user_id: 用户ID
+            document_id: 文档ID
+
+        Returns:
+            List[List[Reference]]: 重复引用分组（每组至少两条，按ID排序）
+        """
+        DedupService.sync_fingerprints(db, user_id, document_id)
+
+        rows = (
+            DedupService._scoped_references(db, user_id, document_id)
+            .join(ReferenceFingerprint, ReferenceFingerprint.reference_id == Reference.id)
+            .with_entities(ReferenceFingerprint)
+            .order_by(Reference.id)
+            .yield_per(1000)
+        )
+
+        index = DedupIndex()
+        groups: Dict[int, List[int]] = {}
+        for row in rows:
+            fingerprint = DedupService._row_fingerprint(row)
+            group_id = index.find(fingerprint)
+            if group_id is None:
+                group_id = row.reference_id
+            groups.setdefault(group_id, []).append(row.reference_id)
+            index.add(group_id, fingerprint)
+
+        duplicate_ids = [ids for ids in groups.values() if len(ids) > 1]
+        if not duplicate_ids:
+            return []
+
+        references = {
+            reference.id: reference
+            for reference in db.query(Reference).filter(
+                Reference.id.in_([reference_id for ids in duplicate_ids for reference_id in ids])
+            )
+        }
+        return [[references[reference_id] for reference_id in ids] for ids in duplicate_ids]
+
+    @staticmethod
+    def find_in_library(db: Session, reference: Dict[str, Any],
+                        user_id: Optional[int] = None, document_id: Optional[int] = None) -> Optional[int]:
+        """
+        检查一条引用是否已在文献库中，通过指纹索引查询候选项
+
+        Args:
+            db: 数据库会话
+            reference: 引用信息
+            user_id: 用户ID
+            document_id: 文档ID
+
+        Returns:
+            Optional[int]: 重复引用的ID，不存在时返回None
+        """
+        DedupService.sync_fingerprints(db, user_id, document_id)
+
+        fingerprint = DedupService.fingerprint(reference)
+        conditions = [ReferenceFingerprint.title_key == fingerprint["title_key"]]
+        if fingerprint["doi"]:
+            conditions.append(ReferenceFingerprint.doi == fingerprint["doi"])
+        for i, band in enumerate(fingerprint["bands"]):
+            conditions.append(getattr(ReferenceFingerprint, f"band{i}") == band)
+
+        candidates = (
+            DedupService._scoped_references(db, user_id, document_id)
+            .join(ReferenceFingerprint, ReferenceFingerprint.reference_id == Reference.id)
+            .with_entities(ReferenceFingerprint)
+            .filter(or_(*conditions))
+            .limit(50)
+        )
+        for row in candidates:
+            if DedupService.is_duplicate(fingerprint, DedupService._row_fingerprint(row)):
+                return row.reference_id
+        return None
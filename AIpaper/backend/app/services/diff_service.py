@@ -0,0 +1,425 @@
+import re
+import html
+import logging
+from typing import Dict, Hashable, Iterator, List, Optional, Sequence, Tuple
+
+from app.core.config import get_settings
+from app.services.cache_service import TTLCache
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# 与difflib.SequenceMatcher.get_opcodes相同的格式：(tag, i1, i2, j1, j2)
+Opcode = Tuple[str, int, int, int, int]
+
+# 词级差异的切分：连续的拉丁字母/数字为一个词，连续空白为一个词，其他字符（含中文）逐字
+_WORD_PATTERN = re.compile(r"[A-Za-z0-9_À-ɏ]+|\s+|.", re.S)
+
+
+def _intern(a: Sequence[Hashable], b: Sequence[Hashable]) -> Tuple[List[int], List[int]]:
+    """将元素映射为整数，后续比较只比较整数"""
+    ids: Dict[Hashable, int] = {}
+    return [ids.setdefault(x, len(ids)) for x in a], [ids.setdefault(x, len(ids)) for x in b]
+
+
+def _common_prefix(a: List[int], b: List[int], a_lo: int, a_hi: int, b_lo: int, b_hi: int) -> int:
+    n = 0
+    while a_lo + n < a_hi and b_lo + n < b_hi and a[a_lo + n] == b[b_lo + n]:
+        n += 1
+    return n
+
+
+def _common_suffix(a: List[int], b: List[int], a_lo: int, a_hi: int, b_lo: int, b_hi: int) -> int:
+    n = 0
+    while a_hi - n > a_lo and b_hi - n > b_lo and a[a_hi - n - 1] == b[b_hi - n - 1]:
+        n += 1
+    return n
+
+
+class _Differ:
+    """
+    线性空间的Myers差异算法（双向搜索中间蛇形，分治递归），可选patience锚点
+
+    输出未合并的 (tag, i1, i2, j1, j2) 片段，tag为equal、delete或insert
+    """
+
+    def __init__(self, a: List[int], b: List[int], max_edit_search: int):
+        self.a = a
+        self.b = b
+        self.max_edit_search = max_edit_search
+        self.out: List[Opcode] = []
+
+    def equal(self, a_lo: int, a_hi: int, b_lo: int, b_hi: int) -> None:
+        if a_hi > a_lo:
+            self.out.append(("equal", a_lo, a_hi, b_lo, b_hi))
+
+    def change(self, a_lo: int, a_hi: int, b_lo: int, b_hi: int) -> None:
+        if a_hi > a_lo:
+            self.out.append(("delete", a_lo, a_hi, b_lo, b_lo))
+        if b_hi > b_lo:
+            self.out.append(("insert", a_hi, a_hi, b_lo, b_hi))
+
+    def myers(self, a_lo: int, a_hi: int, b_lo: int, b_hi: int) -> None:
+        a, b = self.a, self.b
+        prefix = _common_prefix(a, b, a_lo, a_hi, b_lo, b_hi)
+        self.equal(a_lo, a_lo + prefix, b_lo, b_lo + prefix)
+        a_lo += prefix
+        b_lo += prefix
+        suffix = _common_suffix(a, b, a_lo, a_hi, b_lo, b_hi)
+        a_hi -= suffix
+        b_hi -= suffix
+
+        if a_lo == a_hi or b_lo == b_hi:
+            self.change(a_lo, a_hi, b_lo, b_hi)
+        elif a_hi - a_lo + b_hi - b_lo > 2 * self.max_edit_search and \
+                set(a[a_lo:a_hi]).isdisjoint(b[b_lo:b_hi]):
+            # 大段完全不同的内容直接作为替换，不做必然超过搜索上限的搜索
+            self.change(a_lo, a_hi, b_lo, b_hi)
+        else:
+            split = self.bisect(a_lo, a_hi, b_lo, b_hi)
+            if split is None:
+                self.change(a_lo, a_hi, b_lo, b_hi)
+            else:
+                x, y = split
+                self.myers(a_lo, x, b_lo, y)
+                self.myers(x, a_hi, y, b_hi)
+
+        self.equal(a_hi, a_hi + suffix, b_hi, b_hi + suffix)
+
+    def bisect(self, a_lo: int, a_hi: int, b_lo: int, b_hi: int) -> Optional[Tuple[int, int]]:
+        """
+        正反两个方向同时搜索，返回最短编辑路径中间蛇形的起点
+
+        编辑距离超过搜索上限时不再求最短路径，改为在正向走得最远的点分割（结果不一定最短，但耗时有界），
+        两段完全不同时返回None
+        """
+        a, b = self.a, self.b
+        n = a_hi - a_lo
+        m = b_hi - b_lo
+        max_d = (n + m + 1) // 2
+        offset = max_d
+        length = 2 * max_d + 2
+        forward = [-1] * length
+        backward = [-1] * length
+        forward[offset + 1] = 0
+        backward[offset + 1] = 0
+        delta = n - m
+        front = delta % 2 != 0
+        k1_start = k1_end = k2_start = k2_end = 0
+        furthest = (0, 0)
+
+        for d in range(min(max_d, self.max_edit_search)):
+            for k1 in range(-d + k1_start, d + 1 - k1_end, 2):
+                k1_offset = offset + k1
+                if k1 == -d or (k1 != d and forward[k1_offset - 1] < forward[k1_offset + 1]):
+                    x1 = forward[k1_offset + 1]
+                else:
+                    x1 = forward[k1_offset - 1] + 1
+                y1 = x1 - k1
+                while x1 < n and y1 < m and a[a_lo + x1] == b[b_lo + y1]:
+                    x1 += 1
+                    y1 += 1
+                forward[k1_offset] = x1
+                if x1 <= n and y1 <= m and x1 + y1 > furthest[0] + furthest[1]:
+                    furthest = (x1, y1)
+                if x1 > n:
+                    k1_end += 2
+                elif y1 > m:
+                    k1_start += 2
+                elif front:
+                    k2_offset = offset + delta - k1
+                    if 0 <= k2_offset < length and backward[k2_offset] != -1:
+                        if x1 >= n - backward[k2_offset]:
+                            return a_lo + x1, b_lo + y1
+
+            for k2 in range(-d + k2_start, d + 1 - k2_end, 2):
+                k2_offset = offset + k2
+                if k2 == -d or (k2 != d and backward[k2_offset - 1] < backward[k2_offset + 1]):
+                    x2 = backward[k2_offset + 1]
+                else:
+                    x2 = backward[k2_offset - 1] + 1
+                y2 = x2 - k2
+                while x2 < n and y2 < m and a[a_hi - x2 - 1] == b[b_hi - y2 - 1]:
+                    x2 += 1
+                    y2 += 1
+                backward[k2_offset] = x2
+                if x2 > n:
+                    k2_end += 2
+                elif y2 > m:
+                    k2_start += 2
+                elif not front:
+                    k1_offset = offset + delta - k2
+                    if 0 <= k1_offset < length and forward[k1_offset] != -1:
+                        x1 = forward[k1_offset]
+                        y1 = x1 - (k1_offset - offset)
+                        if x1 >= n - x2:
+                            return a_lo + x1, b_lo + y1
+
+        x, y = furthest
+        if 0 < x + y < n + m and (x, y) not in ((n, 0), (0, m)):
+            return a_lo + x, b_lo + y
+        return None
+
+    def patience(self, a_lo: int, a_hi: int, b_lo: int, b_hi: int) -> None:
+        """以两侧都只出现一次的行为锚点分段（取最长递增子序列），锚点之间递归，没有锚点时用Myers"""
+        a, b = self.a, self.b
+        prefix = _common_prefix(a, b, a_lo, a_hi, b_lo, b_hi)
+        self.equal(a_lo, a_lo + prefix, b_lo, b_lo + prefix)
+        a_lo += prefix
+        b_lo += prefix
+        suffix = _common_suffix(a, b, a_lo, a_hi, b_lo, b_hi)
+        a_hi -= suffix
+        b_hi -= suffix
+
+        anchors = self.unique_anchors(a_lo, a_hi, b_lo, b_hi)
+        if not anchors:
+            self.myers(a_lo, a_hi, b_lo, b_hi)
+        else:
+            i, j = a_lo, b_lo
+            for ai, bj in anchors:
+                self.patience(i, ai, j, bj)
+                self.equal(ai, ai + 1, bj, bj + 1)
+                i, j = ai + 1, bj + 1
+            self.patience(i, a_hi, j, b_hi)
+
+        self.equal(a_hi, a_hi + suffix, b_hi, b_hi + suffix)
+
+    def unique_anchors(self, a_lo: int, a_hi: int, b_lo: int, b_hi: int) -> List[Tuple[int, int]]:
+        if a_lo == a_hi or b_lo == b_hi:
+            return []
+        a, b = self.a, self.b
+        positions: Dict[int, List[int]] = {}
+        for i in range(a_lo, a_hi):
+            entry = positions.get(a[i])
+            if entry is None:
+                positions[a[i]] = [i, -1, 1]
+            else:
+                entry[2] += 1
+        for j in range(b_lo, b_hi):
+            entry = positions.get(b[j])
+            if entry is not None and entry[2] == 1:
+                # 第二次出现在b中时标记为不唯一
+                entry[1] = j if entry[1] == -1 else -2
+        pairs = sorted((i, j) for i, j, count in positions.values() if count == 1 and j >= 0)
+        if not pairs:
+            return []
+
+        # 按b中位置求最长递增子序列（patience排序）
+        tails: List[int] = []
+        tail_index: List[int] = []
+        previous = [-1] * len(pairs)
+        for index, (_, j) in enumerate(pairs):
+            lo, hi = 0, len(tails)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if tails[mid] < j:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            if lo > 0:
+                previous[index] = tail_index[lo - 1]
+            if lo == len(tails):
+                tails.append(j)
+                tail_index.append(index)
+            else:
+                tails[lo] = j
+                tail_index[lo] = index
+        result = []
+        index = tail_index[-1]
+        while index != -1:
+            result.append(pairs[index])
+            index = previous[index]
+        result.reverse()
+        return result
+
+
+class DiffService:
+    """文本差异：行级和词级的Myers/patience差异、统一差异格式输出及差异缓存"""
+
+    # 单次中间蛇形搜索的最大编辑距离，超过时改为近似分割，避免差异很大的长文本耗时过长
+    MAX_EDIT_SEARCH = 256
+
+    # 替换块中逐行做词级对比的最大行数
+    MAX_WORD_DIFF_LINES = 200
+
+    # 版本内容不可变，差异结果按 (文档, 版本1, 版本2) 缓存
+    _opcode_cache = TTLCache(maxsize=settings.DIFF_CACHE_SIZE, ttl=settings.DIFF_CACHE_TTL, copy=False)
+
+    @staticmethod
+    def opcodes(a: Sequence[Hashable], b: Sequence[Hashable], algorithm: str = "patience") -> List[Opcode]:
+        """
+        计算两个序列的差异操作
+
+        Args:
+            a: 旧序列（如行列表）
+            b: 新序列
+            algorithm: patience或myers
+
+        Returns:
+            List[Opcode]: 与difflib.SequenceMatcher.get_opcodes格式相同的操作列表
+        """
+        a_ids, b_ids = _intern(a, b)
+        differ = _Differ(a_ids, b_ids, DiffService.MAX_EDIT_SEARCH)
+        if algorithm == "myers":
+            differ.myers(0, len(a_ids), 0, len(b_ids))
+        else:
+            differ.patience(0, len(a_ids), 0, len(b_ids))
+
+        # 合并相邻片段，相邻的删除和插入合并为替换
+        merged: List[List] = []
+        for tag, i1, i2, j1, j2 in differ.out:
+            if merged:
+                last = merged[-1]
+                if last[0] == tag or (last[0] != "equal" and tag != "equal"):
+                    if last[0] != tag:
+                        last[0] = "replace"
+                    last[2], last[4] = i2, j2
+                    continue
+            merged.append([tag, i1, i2, j1, j2])
+        return [tuple(op) for op in merged]
+
+    @staticmethod
+    def grouped_opcodes(opcodes: List[Opcode], context: int = 3) -> Iterator[List[Opcode]]:
+        """按上下文行数将差异分组为块（同difflib.SequenceMatcher.get_grouped_opcodes）"""
+        codes = list(opcodes) or [("equal", 0, 1, 0, 1)]
+        if codes[0][0] == "equal":
+            tag, i1, i2, j1, j2 = codes[0]
+            codes[0] = tag, max(i1, i2 - context), i2, max(j1, j2 - context), j2
+        if codes[-1][0] == "equal":
+            tag, i1, i2, j1, j2 = codes[-1]
+            codes[-1] = tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)
+
+        group: List[Opcode] = []
+        for tag, i1, i2, j1, j2 in codes:
+            if tag == "equal" and i2 - i1 > context * 2:
+                group.append((tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)))
+                yield group
+                group = []
+                i1, j1 = max(i1, i2 - context), max(j1, j2 - context)
+            group.append((tag, i1, i2, j1, j2))
+        if group and not (len(group) == 1 and group[0][0] == "equal"):
+            yield group
+
+    @staticmethod
+    def _format_range(start: int, stop: int) -> str:
+        beginning = start + 1
+        length = stop - start
+        if length == 1:
+            return f"{beginning}"
+        if not length:
+            beginning -= 1
+        return f"{beginning},{length}"
+
+    @staticmethod
+    def iter_lines(a: Sequence[str], b: Sequence[str], opcodes: List[Opcode], fromfile: str = "",
+                   tofile: str = "", context: int = 3) -> Iterator[Tuple[str, str, Optional[str]]]:
+        """
+        按统一差异格式逐行生成 (类型, 行, 对应行)
+
+        类型为from、to、hunk、context、remove、add；替换块中按位置配对的删除/新增行带有对应行，用于词级对比
+
+        Args:
+            a: 旧版本行列表
+            b: 新版本行列表
+            opcodes: opcodes的结果
+            fromfile: 旧版本标题
+            tofile: 新版本标题
+            context: 上下文行数
+
+        Yields:
+            Tuple[str, str, Optional[str]]: (类型, 带前缀的行, 对应行)
+        """
+        started = False
+        for group in DiffService.grouped_opcodes(opcodes, context):
+            if not started:
+                started = True
+                yield "from", f"--- {fromfile}", None
+                yield "to", f"+++ {tofile}", None
+            first, last = group[0], group[-1]
+            file1 = DiffService._format_range(first[1], last[2])
+            file2 = DiffService._format_range(first[3], last[4])
+            yield "hunk", f"@@ -{file1} +{file2} @@", None
+
+            for tag, i1, i2, j1, j2 in group:
+                if tag == "equal":
+                    for line in a[i1:i2]:
+                        yield "context", " " + line, None
+                    continue
+                paired = tag == "replace" and i2 - i1 == j2 - j1 and i2 - i1 <= DiffService.MAX_WORD_DIFF_LINES
+                for offset, line in enumerate(a[i1:i2]):
+                    yield "remove", "-" + line, b[j1 + offset] if paired else None
+                for offset, line in enumerate(b[j1:j2]):
+                    yield "add", "+" + line, a[i1 + offset] if paired else None
+
+    @staticmethod
+    def unified_diff(a: Sequence[str], b: Sequence[str], opcodes: Optional[List[Opcode]] = None,
+                     fromfile: str = "", tofile: str = "", context: int = 3) -> Iterator[str]:
+        """生成统一差异格式的行（不带换行符，与difflib.unified_diff(lineterm="")一致）"""
+        if opcodes is None:
+            opcodes = DiffService.opcodes(a, b)
+        for _, line, _ in DiffService.iter_lines(a, b, opcodes, fromfile, tofile, context):
+            yield line
+
+    @staticmethod
+    def word_opcodes(old: str, new: str) -> Tuple[List[str], List[str], List[Opcode]]:
+        """
+        词级差异
+
+        Args:
+            old: 旧文本
+            new: 新文本
+
+        Returns:
+            Tuple[List[str], List[str], List[Opcode]]: 旧文本的词、新文本的词、差异操作
+        """
+        old_words = _WORD_PATTERN.findall(old)
+        new_words = _WORD_PATTERN.findall(new)
+        return old_words, new_words, DiffService.opcodes(old_words, new_words, algorithm="myers")
+
+    @staticmethod
+    def _highlight(line: str, counterpart: str, removed: bool) -> str:
+        """对配对的删除/新增行做词级对比，用<del>/<ins>标出变化的词"""
+        prefix, text = line[0], line[1:]
+        old, new = (text, counterpart) if removed else (counterpart, text)
+        old_words, new_words, opcodes = DiffService.word_opcodes(old, new)
+        words, side, tag_name = (old_words, 1, "del") if removed else (new_words, 3, "ins")
+        parts = [html.escape(prefix)]
+        for op in opcodes:
+            segment = html.escape("".join(words[op[side]:op[side + 1]]))
+            if not segment:
+                continue
+            parts.append(segment if op[0] == "equal" else f"<{tag_name}>{segment}</{tag_name}>")
+        return "".join(parts)
+
+    @staticmethod
+    def html_lines(a: Sequence[str], b: Sequence[str], opcodes: List[Opcode], fromfile: str = "",
+                   tofile: str = "", context: int = 3) -> Iterator[str]:
+        """生成HTML格式的差异行，替换的行带词级高亮"""
+        css = {"from": "diff-remove", "to": "diff-add", "hunk": "diff-info",
+               "context": "diff-context", "remove": "diff-remove", "add": "diff-add"}
+        for kind, line, counterpart in DiffService.iter_lines(a, b, opcodes, fromfile, tofile, context):
+            if counterpart is not None:
+                body = DiffService._highlight(line, counterpart, removed=kind == "remove")
+            else:
+                body = html.escape(line)
+            yield f'<div class="{css[kind]}">{body}</div>'
+
+    @staticmethod
+    def cached_opcodes(key: str, a: Sequence[str], b: Sequence[str]) -> List[Opcode]:
+        """
+        获取缓存的行级差异操作，未命中时计算并缓存
+
+        Args:
+            key: 缓存键（版本内容不可变，使用文档ID和两个版本记录ID）
+            a: 旧版本行列表
+            b: 新版本行列表
+
+        Returns:
+            List[Opcode]: 差异操作
+        """
+        # 以元组缓存，缓存不拷贝，返回新列表
+        opcodes = DiffService._opcode_cache.get(key)
+        if opcodes is None:
+            opcodes = tuple(DiffService.opcodes(a, b))
+            DiffService._opcode_cache.set(key, opcodes)
+        return list(opcodes)
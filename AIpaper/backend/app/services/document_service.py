@@ -2,12 +2,13 @@ import logging
 from typing import List, Dict, Any, Optional
 from sqlalchemy.orm import Session
 from datetime import datetime
-import difflib
 import json
 
 from app.models.document import Document
 from app.models.document_version import DocumentVersion
 from app.models.comment import Comment
+from app.services.version_store_service import VersionStoreService
+from app.services.diff_service import DiffService
 
 logger = logging.getLogger(__name__)
 
@@ -46,18 +47,17 @@ class DocumentService:
         db.commit()
         db.refresh(document)
         
-        # 创建初始版本
-        initial_version = DocumentVersion(
-            document_id=document.id,
-            version_number=1,
-            title=title,
+        # 创建初始版本（关键帧）
+        VersionStoreService.build_version(
+            db,
+            document.id,
+            1,
             content=content,
             outline=outline,
+            title=title,
             word_count=word_count,
             commit_message="初始版本"
         )
-        
-        db.add(initial_version)
         db.commit()
         
         return document
@@ -108,34 +108,21 @@ class DocumentService:
             new_version_number = current_version + 1
             update_data["current_version"] = new_version_number
             
-            # 计算变更摘要
-            changes_summary = {}
-            if content is not None and document.content:
-                # 获取内容差异
-                old_lines = document.content.splitlines()
-                new_lines = content.splitlines()
-                diff = list(difflib.unified_diff(old_lines, new_lines, n=0))
-                
-                # 统计添加和删除的行数
-                added = sum(1 for line in diff if line.startswith('+') and not line.startswith('+++'))
-                removed = sum(1 for line in diff if line.startswith('-') and not line.startswith('---'))
-                
-                changes_summary["added_lines"] = added
-                changes_summary["removed_lines"] = removed
-            
-            # 创建新版本
-            new_version = DocumentVersion(
-                document_id=document_id,
-                version_number=new_version_number,
-                title=title if title is not None else document.title,
+            # 先保存完整快照，变更摘要和增量在提交后于后台计算，保存耗时与文档长度无关
+            new_version = VersionStoreService.build_version(
+                db,
+                document_id,
+                new_version_number,
                 content=content if content is not None else document.content,
                 outline=outline if outline is not None else document.outline,
+                defer_delta=True,
+                title=title if title is not None else document.title,
                 word_count=update_data.get("word_count", document.word_count),
-                commit_message=commit_message or "更新文档",
-                changes_summary=changes_summary
+                commit_message=commit_message or "更新文档"
             )
-            
-            db.add(new_version)
+            new_version_id = new_version.id
+            # 并发保存时版本号可能已顺延
+            update_data["current_version"] = new_version.version_number
         
         # 更新文档
         for key, value in update_data.items():
@@ -144,23 +131,41 @@ class DocumentService:
         db.commit()
         db.refresh(document)
         
+        if create_version:
+            VersionStoreService.schedule_finalize(document_id, new_version_id)
+        
         return document
     
     @staticmethod
-    async def get_document_versions(db: Session, document_id: int) -> List[Dict[str, Any]]:
+    async def get_document_versions(db: Session, document_id: int, before: Optional[int] = None,
+                                    limit: Optional[int] = None) -> List[Dict[str, Any]]:
         """
-        获取文档版本历史
+        获取文档版本历史（按版本号倒序）
+        
+        只读取元数据列，不加载内容快照。按版本号做键集分页：下一页传入本页最后一个版本号作为before
         
         Args:
             db: 数据库会话
             document_id: 文档ID
+            before: 只返回版本号小于该值的版本
+            limit: 返回数量，为空时返回全部
             
         Returns:
             List[Dict[str, Any]]: 版本列表
         """
-        versions = db.query(DocumentVersion).filter(
+        query = db.query(
+            DocumentVersion.id, DocumentVersion.version_number, DocumentVersion.title,
+            DocumentVersion.commit_message, DocumentVersion.word_count,
+            DocumentVersion.changes_summary, DocumentVersion.created_at
+        ).filter(
             DocumentVersion.document_id == document_id
-        ).order_by(DocumentVersion.version_number.desc()).all()
+        )
+        if before is not None:
+            query = query.filter(DocumentVersion.version_number < before)
+        query = query.order_by(DocumentVersion.version_number.desc())
+        if limit is not None:
+            query = query.limit(limit)
+        versions = query.all()
         
         return [
             {
@@ -190,9 +195,10 @@ class DocumentService:
         return db.query(DocumentVersion).filter(DocumentVersion.id == version_id).first()
     
     @staticmethod
-    async def get_version_diff(db: Session, document_id: int, version1_number: int, version2_number: int) -> Dict[str, Any]:
+    async def load_version_diff(db: Session, document_id: int, version1_number: int,
+                                version2_number: int) -> Optional[Dict[str, Any]]:
         """
-        获取两个版本之间的差异
+        读取两个版本的内容并计算行级差异操作（按版本缓存）
         
         Args:
             db: 数据库会话
@@ -201,7 +207,7 @@ class DocumentService:
             version2_number: 版本2的版本号
             
         Returns:
-            Dict[str, Any]: 差异信息
+            Optional[Dict[str, Any]]: version1、version2、lines1、lines2、opcodes、fromfile、tofile，版本不存在时返回None
         """
         # 获取两个版本
         version1 = db.query(DocumentVersion).filter(
@@ -215,30 +221,51 @@ class DocumentService:
         ).first()
         
         if not version1 or not version2:
+            return None
+        
+        # 增量存储的版本需先还原内容
+        lines1 = (VersionStoreService.get_version_content(db, version1)["content"] or "").splitlines()
+        lines2 = (VersionStoreService.get_version_content(db, version2)["content"] or "").splitlines()
+        
+        # 版本内容不可变，差异按文档和两个版本记录缓存
+        opcodes = DiffService.cached_opcodes(f"{document_id}:{version1.id}:{version2.id}", lines1, lines2)
+        
+        return {
+            "version1": version1,
+            "version2": version2,
+            "lines1": lines1,
+            "lines2": lines2,
+            "opcodes": opcodes,
+            "fromfile": f"版本 {version1_number}",
+            "tofile": f"版本 {version2_number}",
+        }
+    
+    @staticmethod
+    async def get_version_diff(db: Session, document_id: int, version1_number: int, version2_number: int) -> Dict[str, Any]:
+        """
+        获取两个版本之间的差异
+        
+        Args:
+            db: 数据库会话
+            document_id: 文档ID
+            version1_number: 版本1的版本号
+            version2_number: 版本2的版本号
+            
+        Returns:
+            Dict[str, Any]: 差异信息
+        """
+        loaded = await DocumentService.load_version_diff(db, document_id, version1_number, version2_number)
+        if loaded is None:
             return {
                 "error": "指定的版本不存在"
             }
         
-        # 计算内容差异
-        diff = list(difflib.unified_diff(
-            version1.content.splitlines(),
-            version2.content.splitlines(),
-            fromfile=f"版本 {version1_number}",
-            tofile=f"版本 {version2_number}",
-            lineterm=""
-        ))
-        
-        # 格式化差异
-        html_diff = []
-        for line in diff:
-            if line.startswith('+'):
-                html_diff.append(f'<div class="diff-add">{line}</div>')
-            elif line.startswith('-'):
-                html_diff.append(f'<div class="diff-remove">{line}</div>')
-            elif line.startswith('@@'):
-                html_diff.append(f'<div class="diff-info">{line}</div>')
-            else:
-                html_diff.append(f'<div class="diff-context">{line}</div>')
+        version1, version2 = loaded["version1"], loaded["version2"]
+        args = (loaded["lines1"], loaded["lines2"], loaded["opcodes"], loaded["fromfile"], loaded["tofile"])
+        diff = list(DiffService.unified_diff(*args))
+        
+        # 格式化差异（替换的行带词级高亮）
+        html_diff = list(DiffService.html_lines(*args))
         
         return {
             "version1": {
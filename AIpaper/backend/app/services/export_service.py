@@ -0,0 +1,223 @@
+import re
+import json
+import logging
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from sqlalchemy import select
+
+from app.core.config import get_settings
+from app.db.database import SessionLocal
+from app.models.reference import Reference
+from app.services.citation_style_service import CitationStyleService
+from app.services.reference_service import ReferenceService
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class ReferenceExportService:
+    """
+    参考文献导出服务（BibTeX、RIS、CSL-JSON）
+
+    记录通过数据库游标分批读取（PostgreSQL下为服务端游标），逐批格式化后输出，
+    导出大型文献库时内存占用与记录总数无关
+    """
+
+    # 导出格式 -> (Content-Type, 文件扩展名)
+    FORMATS = {
+        "bibtex": ("application/x-bibtex", "bib"),
+        "ris": ("application/x-research-info-systems", "ris"),
+        "csl-json": ("application/vnd.citationstyles.csl+json", "json"),
+    }
+
+    # 导出时读取的列，不加载格式化引用等大字段
+    EXPORT_COLUMNS = (
+        Reference.id, Reference.title, Reference.authors, Reference.journal, Reference.year,
+        Reference.doi, Reference.url, Reference.raw_data, Reference.citation_key,
+    )
+
+    _BIBTEX_SPECIAL = re.compile(r"([&%$#_{}])")
+
+    @staticmethod
+    def iter_references(document_id: int, batch_size: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        按批读取文档的引用
+
+        使用独立的数据库会话，保证在流式响应期间会话一直有效
+
+        Args:
+            document_id: 文档ID
+            batch_size: 每批记录数
+
+        Returns:
+            Iterator[List[Dict[str, Any]]]: 每批引用数据（含citation_key）
+        """
+        batch_size = batch_size or settings.REFERENCE_EXPORT_BATCH_SIZE
+        stmt = (
+            select(*ReferenceExportService.EXPORT_COLUMNS)
+            .where(Reference.document_id == document_id, Reference.pdf_source_id.is_(None))
+            .order_by(Reference.id)
+            .execution_options(yield_per=batch_size)
+        )
+
+        db = SessionLocal()
+        try:
+            for rows in db.execute(stmt).partitions():
+                batch = []
+                for row in rows:
+                    reference = ReferenceService.reference_to_dict(row)
+                    reference["citation_key"] = row.citation_key
+                    batch.append(reference)
+                yield batch
+        finally:
+            db.close()
+
+    @staticmethod
+    def stream(document_id: int, export_format: str, batch_size: Optional[int] = None) -> Iterator[str]:
+        """
+        流式导出文档的参考文献
+
+        Args:
+            document_id: 文档ID
+            export_format: 导出格式，"bibtex"、"ris" 或 "csl-json"
+            batch_size: 每批记录数
+
+        Returns:
+            Iterator[str]: 导出内容片段，每批记录输出一个片段
+        """
+        if export_format not in ReferenceExportService.FORMATS:
+            raise ValueError(f"不支持的导出格式: {export_format}")
+
+        used_keys: Set[str] = set()
+        first = True
+        if export_format == "csl-json":
+            yield "["
+
+        for batch in ReferenceExportService.iter_references(document_id, batch_size):
+            parts = []
+            for reference in batch:
+                if export_format == "bibtex":
+                    key = ReferenceExportService._unique_key(reference, used_keys)
+                    parts.append(ReferenceExportService.to_bibtex(reference, key))
+                elif export_format == "ris":
+                    parts.append(ReferenceExportService.to_ris(reference))
+                else:
+                    item = CitationStyleService.to_csl_json(reference, ReferenceExportService._unique_key(reference, used_keys))
+                    parts.append(("\n" if first else ",\n") + json.dumps(item, ensure_ascii=False))
+                first = False
+            yield "".join(parts)
+
+        if export_format == "csl-json":
+            yield "\n]\n"
+
+    @staticmethod
+    def _unique_key(reference: Dict[str, Any], used_keys: Set[str]) -> str:
+        """生成引用键（如 smith2020deep），重复时追加 a、b、c..."""
+        key = reference.get("citation_key")
+        if not key:
+            surname = ""
+            authors = reference.get("authors") or []
+            if authors:
+                first_author = str(authors[0])
+                surname = first_author.split(",")[0] if "," in first_author else (first_author.split() or [""])[-1]
+            year = str(reference.get("year") or reference.get("published_date") or "")[:4]
+            words = [w for w in re.findall(r"[A-Za-z]+", reference.get("title") or "") if len(w) > 3]
+            key = f"{surname}{year}{words[0] if words else ''}"
+        key = re.sub(r"[^A-Za-z0-9_:-]", "", key).lower() or "ref"
+
+        candidate, suffix = key, 0
+        while candidate in used_keys:
+            suffix += 1
+            candidate = f"{key}{ReferenceExportService._suffix(suffix)}"
+        used_keys.add(candidate)
+        return candidate
+
+    @staticmethod
+    def _suffix(n: int) -> str:
+        """1 -> a, 26 -> z, 27 -> aa"""
+        letters = ""
+        while n > 0:
+            n, r = divmod(n - 1, 26)
+            letters = chr(ord("a") + r) + letters
+        return letters
+
+    @staticmethod
+    def _bibtex_escape(value: Any) -> str:
+        return ReferenceExportService._BIBTEX_SPECIAL.sub(r"\\\1", str(value))
+
+    @staticmethod
+    def to_bibtex(reference: Dict[str, Any], key: str) -> str:
+        """
+        将引用转换为BibTeX条目
+
+        Args:
+            reference: 引用数据
+            key: 引用键
+
+        Returns:
+            str: BibTeX条目
+        """
+        escape = ReferenceExportService._bibtex_escape
+        fields = []
+        if reference.get("title"):
+            fields.append(("title", "{" + escape(reference["title"]) + "}"))
+        if reference.get("authors"):
+            fields.append(("author", " and ".join(escape(author) for author in reference["authors"])))
+        if reference.get("journal"):
+            fields.append(("journal", escape(reference["journal"])))
+        year = str(reference.get("year") or reference.get("published_date") or "")[:4]
+        if year:
+            fields.append(("year", year))
+        for field in ("volume", "number", "pages", "publisher"):
+            value = reference.get("issue" if field == "number" else field)
+            if value:
+                fields.append((field, escape(value)))
+        if reference.get("doi"):
+            fields.append(("doi", reference["doi"]))
+        if reference.get("url"):
+            fields.append(("url", reference["url"]))
+
+        entry_type = "article" if reference.get("journal") else "misc"
+        body = ",\n".join(f"  {name} = {{{value}}}" for name, value in fields)
+        return f"@{entry_type}{{{key},\n{body}\n}}\n\n"
+
+    @staticmethod
+    def to_ris(reference: Dict[str, Any]) -> str:
+        """
+        将引用转换为RIS条目
+
+        Args:
+            reference: 引用数据
+
+        Returns:
+            str: RIS条目
+        """
+        lines = [("TY", "JOUR" if reference.get("journal") else "GEN")]
+        for author in reference.get("authors") or []:
+            lines.append(("AU", author))
+        if reference.get("title"):
+            lines.append(("TI", reference["title"]))
+        if reference.get("journal"):
+            lines.append(("JO", reference["journal"]))
+        year = str(reference.get("year") or reference.get("published_date") or "")[:4]
+        if year:
+            lines.append(("PY", year))
+        if reference.get("volume"):
+            lines.append(("VL", reference["volume"]))
+        if reference.get("issue"):
+            lines.append(("IS", reference["issue"]))
+        if reference.get("pages"):
+            pages = str(reference["pages"]).replace("–", "-").split("-", 1)
+            lines.append(("SP", pages[0].strip()))
+            if len(pages) > 1 and pages[1].strip():
+                lines.append(("EP", pages[1].strip()))
+        if reference.get("publisher"):
+            lines.append(("PB", reference["publisher"]))
+        if reference.get("doi"):
+            lines.append(("DO", reference["doi"]))
+        if reference.get("url"):
+            lines.append(("UR", reference["url"]))
+        lines.append(("ER", ""))
+
+        # RIS字段值不能跨行
+        return "".join(f"{tag}  - {' '.join(str(value).split())}\n" for tag, value in lines) + "\n"
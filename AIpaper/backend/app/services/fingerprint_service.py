@@ -0,0 +1,146 @@
+import re
+import random
+import hashlib
+from typing import Iterable, List, Tuple
+
+
+def _permutation_params(count: int, prime: int, seed: int) -> Tuple[Tuple[int, int], ...]:
+    """生成MinHash通用哈希的 (a, b) 参数"""
+    rng = random.Random(seed)
+    return tuple((rng.randrange(1, prime), rng.randrange(0, prime)) for _ in range(count))
+
+
+class FingerprintService:
+    """文本指纹服务，用于近似重复内容检测"""
+
+    # SimHash位数
+    SIMHASH_BITS = 64
+
+    # SimHash分段数量，汉明距离不超过 BANDS-1 的两个指纹至少有一段完全相同
+    SIMHASH_BANDS = 4
+
+    # 构造shingle时的词数
+    SHINGLE_SIZE = 3
+
+    # MinHash签名长度及LSH分段（每段 MINHASH_PERMUTATIONS / MINHASH_BANDS 行）
+    MINHASH_PERMUTATIONS = 32
+    MINHASH_BANDS = 8
+
+    # 63位掩码，分段哈希存入有符号BIGINT列
+    _MASK63 = (1 << 63) - 1
+
+    # MinHash置换使用的梅森素数模 (a * x + b) mod p
+    _MINHASH_PRIME = (1 << 61) - 1
+
+    # 固定种子生成的置换参数，保证签名在进程间和版本间稳定
+    _MINHASH_PARAMS = _permutation_params(MINHASH_PERMUTATIONS, _MINHASH_PRIME, seed=20240601)
+
+    _TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        """将文本切分为小写词元，忽略标点和空白差异"""
+        return FingerprintService._TOKEN_PATTERN.findall(text.lower())
+
+    @staticmethod
+    def shingles(text: str, size: int = SHINGLE_SIZE) -> List[str]:
+        """生成连续词组shingle，文本过短时退化为单词"""
+        tokens = FingerprintService.tokenize(text)
+        if len(tokens) < size:
+            return tokens
+        return [" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)]
+
+    @staticmethod
+    def hash64(value: str) -> int:
+        """稳定的64位哈希（不受PYTHONHASHSEED影响）"""
+        return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+    @staticmethod
+    def simhash(text: str) -> int:
+        """
+        计算文本的64位SimHash指纹
+
+        Args:
+            text: 文本
+
+        Returns:
+            int: 无符号64位指纹
+        """
+        weights = [0] * FingerprintService.SIMHASH_BITS
+        for shingle in FingerprintService.shingles(text):
+            value = FingerprintService.hash64(shingle)
+            for bit in range(FingerprintService.SIMHASH_BITS):
+                if value >> bit & 1:
+                    weights[bit] += 1
+                else:
+                    weights[bit] -= 1
+
+        fingerprint = 0
+        for bit, weight in enumerate(weights):
+            if weight > 0:
+                fingerprint |= 1 << bit
+        return fingerprint
+
+    @staticmethod
+    def hamming_distance(a: int, b: int) -> int:
+        """两个指纹之间的汉明距离"""
+        return bin(a ^ b).count("1")
+
+    @staticmethod
+    def bands(fingerprint: int) -> Tuple[int, ...]:
+        """将指纹切分为若干段，用于分桶查找候选近似重复项"""
+        width = FingerprintService.SIMHASH_BITS // FingerprintService.SIMHASH_BANDS
+        mask = (1 << width) - 1
+        return tuple(
+            fingerprint >> (i * width) & mask
+            for i in range(FingerprintService.SIMHASH_BANDS)
+        )
+
+    @staticmethod
+    def to_hex(fingerprint: int) -> str:
+        """指纹的定长十六进制表示"""
+        return f"{fingerprint:016x}"
+
+    @staticmethod
+    def from_hex(value: str) -> int:
+        """由十六进制表示还原指纹"""
+        return int(value, 16)
+
+    @staticmethod
+    def minhash(features: Iterable[str]) -> Tuple[int, ...]:
+        """
+        计算特征集合的MinHash签名
+
+        每个特征只哈希一次，再经 (a * x + b) mod p 形式的通用哈希得到各个置换下的取值
+
+        Args:
+            features: 特征集合（如标题词、作者姓氏、年份）
+
+        Returns:
+            Tuple[int, ...]: 长度为 MINHASH_PERMUTATIONS 的签名，特征为空时返回空元组
+        """
+        hashes = [FingerprintService.hash64(feature) for feature in set(features)]
+        if not hashes:
+            return ()
+        prime = FingerprintService._MINHASH_PRIME
+        return tuple(min((a * value + b) % prime for value in hashes) for a, b in FingerprintService._MINHASH_PARAMS)
+
+    @staticmethod
+    def lsh_bands(signature: Tuple[int, ...]) -> Tuple[int, ...]:
+        """
+        将MinHash签名切分为LSH分段并各自哈希
+
+        两个签名只要有一段完全相同即成为候选近似重复项
+
+        Returns:
+            Tuple[int, ...]: 各分段的63位哈希
+        """
+        if not signature:
+            return ()
+        rows = len(signature) // FingerprintService.MINHASH_BANDS
+        return tuple(
+            FingerprintService.hash64(
+                f"{band}:" + ",".join(str(value) for value in signature[band * rows:(band + 1) * rows])
+            ) & FingerprintService._MASK63
+            for band in range(FingerprintService.MINHASH_BANDS)
+        )
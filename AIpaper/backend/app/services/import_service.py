@@ -0,0 +1,331 @@
+import os
+import uuid
+import hashlib
+import logging
+import zipfile
+import tempfile
+import time
+import asyncio
+from typing import Dict, Any, Optional, Iterator, Tuple, Callable, IO
+from datetime import datetime, timedelta
+
+from app.core.config import get_settings
+from app.db.database import SessionLocal
+from app.services.cache_service import get_shared_cache_backend
+from app.services.pdf_service import PDFService
+from app.services.storage_service import get_storage
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class ImportService:
+    """PDF批量导入服务"""
+
+    # 单个PDF大小上限，与单文件上传保持一致
+    MAX_FILE_SIZE = 50 * 1024 * 1024
+
+    # 流式读取的块大小
+    CHUNK_SIZE = 1024 * 1024
+
+    # 进程内的导入任务进度，任务结束IMPORT_JOB_TTL后淘汰
+    _jobs: Dict[str, Dict[str, Any]] = {}
+
+    # 任务进度最近一次写入共享缓存的时间
+    _published_at: Dict[str, float] = {}
+
+    # 运行中的任务写入共享缓存的最小间隔（秒）
+    PUBLISH_INTERVAL = 1.0
+
+    @staticmethod
+    def create_job(source: str) -> Dict[str, Any]:
+        """
+        创建导入任务并登记进度
+
+        Args:
+            source: 导入来源（ZIP文件名或目录）
+
+        Returns:
+            Dict[str, Any]: 任务进度信息
+        """
+        job = {
+            "job_id": str(uuid.uuid4()),
+            "source": source,
+            "status": "pending",
+            "total": 0,
+            "imported": 0,
+            "processed": 0,
+            "skipped_duplicates": 0,
+            "failed": 0,
+            "errors": [],
+            "started_at": datetime.now().isoformat(),
+            "finished_at": None
+        }
+        ImportService._prune_jobs()
+        ImportService._jobs[job["job_id"]] = job
+        return job
+
+    @staticmethod
+    def _prune_jobs() -> None:
+        """淘汰结束超过IMPORT_JOB_TTL的任务"""
+        deadline = (datetime.now() - timedelta(seconds=settings.IMPORT_JOB_TTL)).isoformat()
+        for job_id, job in list(ImportService._jobs.items()):
+            if job["finished_at"] is not None and job["finished_at"] < deadline:
+                del ImportService._jobs[job_id]
+                ImportService._published_at.pop(job_id, None)
+
+    @staticmethod
+    async def _publish(job: Dict[str, Any], force: bool = False) -> None:
+        """
+        将任务进度写入共享缓存，供其他worker进程查询（未配置共享缓存时跳过）
+
+        Args:
+            job: 任务进度信息
+            force: 是否忽略写入间隔（任务状态变化时）
+        """
+        backend = get_shared_cache_backend()
+        if backend is None:
+            return
+        now = time.monotonic()
+        if not force and now - ImportService._published_at.get(job["job_id"], 0.0) < ImportService.PUBLISH_INTERVAL:
+            return
+        ImportService._published_at[job["job_id"]] = now
+        try:
+            await backend.set(f"import_job:{job['job_id']}", job, settings.IMPORT_JOB_TTL)
+        except Exception as e:
+            logger.error(f"写入导入任务 {job['job_id']} 的进度时出错: {e}")
+
+    @staticmethod
+    async def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取导入任务进度，本进程没有该任务时查询共享缓存
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            Optional[Dict[str, Any]]: 任务进度信息，不存在或已过期时返回None
+        """
+        ImportService._prune_jobs()
+        job = ImportService._jobs.get(job_id)
+        if job is not None:
+            return job
+        backend = get_shared_cache_backend()
+        if backend is None:
+            return None
+        try:
+            return await backend.get(f"import_job:{job_id}")
+        except Exception as e:
+            logger.error(f"读取导入任务 {job_id} 的进度时出错: {e}")
+            return None
+
+    @staticmethod
+    def iter_zip_members(zip_path: str) -> Iterator[Tuple[str, int, Callable[[], IO[bytes]]]]:
+        """
+        遍历ZIP中的PDF成员，每个成员按需以流的方式打开
+
+        Args:
+            zip_path: ZIP文件路径
+
+        Yields:
+            Tuple[str, int, Callable]: (文件名, 解压后大小, 打开成员流的函数)
+        """
+        with zipfile.ZipFile(zip_path) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not info.filename.lower().endswith(".pdf"):
+                    continue
+                # 跳过macOS打包时生成的资源文件
+                if "__MACOSX/" in info.filename:
+                    continue
+                yield os.path.basename(info.filename), info.file_size, lambda info=info: archive.open(info)
+
+    @staticmethod
+    def iter_directory_members(dir_path: str) -> Iterator[Tuple[str, int, Callable[[], IO[bytes]]]]:
+        """
+        递归遍历目录中的PDF文件
+
+        Args:
+            dir_path: 目录路径
+
+        Yields:
+            Tuple[str, int, Callable]: (文件名, 文件大小, 打开文件流的函数)
+        """
+        for root, _, files in os.walk(dir_path):
+            for name in files:
+                if not name.lower().endswith(".pdf"):
+                    continue
+                path = os.path.join(root, name)
+                yield name, os.path.getsize(path), lambda path=path: open(path, "rb")
+
+    @staticmethod
+    def count_members(path: str) -> int:
+        """统计待导入的PDF数量"""
+        if os.path.isdir(path):
+            return sum(1 for _ in ImportService.iter_directory_members(path))
+        with zipfile.ZipFile(path) as archive:
+            return sum(
+                1 for info in archive.infolist()
+                if not info.is_dir() and info.filename.lower().endswith(".pdf")
+                and "__MACOSX/" not in info.filename
+            )
+
+    @staticmethod
+    def _stage_member(filename: str, open_stream: Callable[[], IO[bytes]],
+                      document_id: Optional[int] = None) -> Tuple[str, bool]:
+        """
+        将成员流式写入临时文件并同时计算哈希，再存入存储后端，并登记PDF源文件记录
+
+        Returns:
+            Tuple[str, bool]: (PDF ID, 是否为已完成索引的重复文件)
+        """
+        storage = get_storage()
+        digest = hashlib.sha256()
+        size = 0
+
+        fd, tmp_path = tempfile.mkstemp(suffix=".pdf")
+        try:
+            with os.fdopen(fd, "wb") as tmp, open_stream() as stream:
+                while True:
+                    block = stream.read(ImportService.CHUNK_SIZE)
+                    if not block:
+                        break
+                    size += len(block)
+                    if size > ImportService.MAX_FILE_SIZE:
+                        raise ValueError("PDF文件不能超过50MB")
+                    digest.update(block)
+                    tmp.write(block)
+
+            pdf_id = digest.hexdigest()
+            file_info = storage.get_metadata(pdf_id)
+
+            if file_info is None:
+                file_info = {
+                    "id": pdf_id,
+                    "filename": filename,
+                    "size": size,
+                    "upload_time": datetime.now().isoformat(),
+                    "user_id": None,
+                    "status": "uploaded"
+                }
+                storage.save_file(pdf_id, tmp_path, file_info)
+        finally:
+            os.remove(tmp_path)
+
+        db = SessionLocal()
+        try:
+            PDFService.register_pdf_source(db, file_info, document_id)
+            # 已完成索引或正在处理的重复文件跳过，此前处理失败或处理中断的重新处理
+            duplicate = not PDFService.claim_processing(db, pdf_id)
+        finally:
+            db.close()
+
+        return pdf_id, duplicate
+
+    @staticmethod
+    async def run_import(job: Dict[str, Any], path: str, concurrency: Optional[int] = None,
+                         document_id: Optional[int] = None, cleanup: bool = False) -> Dict[str, Any]:
+        """
+        执行导入任务：逐个流式读取成员，按哈希跳过已完成索引的重复文件，
+        并将新文件并行送入PDF处理流水线
+
+        Args:
+            job: 导入任务进度信息
+            path: ZIP文件或目录路径
+            concurrency: 并行处理的PDF数量
+            document_id: 导入的PDF关联的文档ID
+            cleanup: 完成后是否删除源文件（如上传的临时ZIP）
+
+        Returns:
+            Dict[str, Any]: 任务进度信息
+        """
+        concurrency = concurrency or settings.IMPORT_CONCURRENCY
+        is_dir = os.path.isdir(path)
+        job["status"] = "running"
+
+        # 有界队列提供背压，避免读取速度远超处理速度时堆积
+        queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+        seen = set()
+
+        async def worker():
+            while True:
+                pdf_id = await queue.get()
+                try:
+                    if pdf_id is None:
+                        return
+                    try:
+                        result = await PDFService.process_stored_pdf(pdf_id)
+                    except Exception as e:
+                        logger.error(f"处理PDF {pdf_id} 时出错: {e}")
+                        result = {"success": False, "message": str(e)}
+                    if result["success"]:
+                        job["processed"] += 1
+                    else:
+                        job["failed"] += 1
+                        job["errors"].append({"pdf_id": pdf_id, "error": result["message"]})
+                    await ImportService._publish(job)
+                finally:
+                    queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        members = None
+
+        try:
+            job["total"] = await asyncio.to_thread(ImportService.count_members, path)
+            await ImportService._publish(job, force=True)
+            members = (ImportService.iter_directory_members(path) if is_dir
+                       else ImportService.iter_zip_members(path))
+
+            def next_member():
+                return next(members, None)
+
+            while True:
+                member = await asyncio.to_thread(next_member)
+                if member is None:
+                    break
+                filename, size, open_stream = member
+
+                if size > ImportService.MAX_FILE_SIZE:
+                    job["failed"] += 1
+                    job["errors"].append({"filename": filename, "error": "PDF文件不能超过50MB"})
+                    continue
+
+                try:
+                    pdf_id, duplicate = await asyncio.to_thread(
+                        ImportService._stage_member, filename, open_stream, document_id
+                    )
+                except Exception as e:
+                    logger.error(f"导入PDF {filename} 时出错: {e}")
+                    job["failed"] += 1
+                    job["errors"].append({"filename": filename, "error": str(e)})
+                    continue
+
+                if duplicate or pdf_id in seen:
+                    job["skipped_duplicates"] += 1
+                    continue
+
+                seen.add(pdf_id)
+                job["imported"] += 1
+                await ImportService._publish(job)
+                await queue.put(pdf_id)
+
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+            job["status"] = "completed"
+
+        except Exception as e:
+            logger.error(f"批量导入 {job['source']} 失败: {e}")
+            for task in workers:
+                task.cancel()
+            job["status"] = "failed"
+            job["errors"].append({"error": str(e)})
+
+        finally:
+            if members is not None:
+                members.close()
+            job["finished_at"] = datetime.now().isoformat()
+            if cleanup and not is_dir:
+                os.remove(path)
+            await ImportService._publish(job, force=True)
+
+        return job
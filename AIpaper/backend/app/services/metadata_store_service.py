@@ -0,0 +1,398 @@
+import re
+import time
+import logging
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, func, literal_column
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db.database import SessionLocal
+from app.models.paper_metadata import PaperMetadata, fulltext_document
+from app.services.fingerprint_service import FingerprintService
+
+logger = logging.getLogger(__name__)
+
+
+class MetadataStoreService:
+    """
+    本地文献元数据库
+
+    保存所有上游（Crossref、Semantic Scholar）返回过的文献，按DOI和规范化标题去重合并。
+    搜索和DOI解析先查本地，热门论文无需网络请求，上游不可用时仍可返回结果。
+    """
+
+    # 书目字段以Crossref为准，其他来源只补充空缺字段
+    AUTHORITATIVE_SOURCE = "crossref"
+
+    BIBLIOGRAPHIC_FIELDS = ("title", "authors", "journal", "publisher", "published_date",
+                            "volume", "issue", "pages", "url")
+
+    _DOI_PATTERN = re.compile(r"^10\.\d{4,9}/\S+$")
+
+    # 命中次数先在进程内累加，后台按该间隔（秒）批量写入，读取路径上不写数据库
+    HIT_FLUSH_INTERVAL = 10.0
+
+    _pending_hits: Counter = Counter()
+    _hits_lock = threading.Lock()
+    _hits_flushed_at = time.monotonic()
+    _hits_flushing = False
+
+    @staticmethod
+    def normalize_doi(doi: Optional[str]) -> Optional[str]:
+        """规范化DOI：去除doi.org前缀和"doi:"前缀并转为小写，非法时返回None"""
+        if not doi:
+            return None
+        doi = doi.strip().lower()
+        doi = re.sub(r"^(https?://)?(dx\.)?doi\.org/", "", doi)
+        doi = re.sub(r"^doi:\s*", "", doi)
+        return doi if MetadataStoreService._DOI_PATTERN.match(doi) else None
+
+    @staticmethod
+    def normalize_title(title: Optional[str]) -> str:
+        """规范化标题：小写、去除标点、合并空白"""
+        return " ".join(FingerprintService.tokenize(title or ""))
+
+    @staticmethod
+    def _parse_year(reference: Dict[str, Any]) -> Optional[int]:
+        match = re.match(r"(\d{4})", str(reference.get("published_date") or reference.get("year") or ""))
+        return int(match.group(1)) if match else None
+
+    @staticmethod
+    def to_reference(row: PaperMetadata) -> Dict[str, Any]:
+        """转换为与上游搜索结果一致的引用信息格式"""
+        return {
+            "doi": row.doi or "",
+            "title": row.title or "",
+            "authors": row.authors or [],
+            "publisher": row.publisher or "",
+            "published_date": row.published_date,
+            "journal": row.journal or "",
+            "volume": row.volume or "",
+            "issue": row.issue or "",
+            "pages": row.pages or "",
+            "url": row.url or "",
+            "abstract": row.abstract or "",
+            "citation_count": row.citation_count or 0,
+            "source": (row.sources or "local").split(",")[0]
+        }
+
+    @staticmethod
+    def _fit(field: str, value: Any) -> Any:
+        """将字符串截断到列长度，上游返回的超长标题、期刊名不会使写入失败"""
+        length = getattr(PaperMetadata.__table__.c[field].type, "length", None)
+        if isinstance(value, str) and length and len(value) > length:
+            return value[:length]
+        return value
+
+    @staticmethod
+    def _merge(row: PaperMetadata, reference: Dict[str, Any]) -> None:
+        """将一条上游结果合并进已有记录"""
+        source = reference.get("source") or ""
+        authoritative = source == MetadataStoreService.AUTHORITATIVE_SOURCE
+        for field in MetadataStoreService.BIBLIOGRAPHIC_FIELDS:
+            value = reference.get(field)
+            if value and (authoritative or not getattr(row, field)):
+                setattr(row, field, MetadataStoreService._fit(field, value))
+
+        doi = MetadataStoreService.normalize_doi(reference.get("doi"))
+        if doi and not row.doi:
+            row.doi = doi
+        if reference.get("abstract") and not row.abstract:
+            row.abstract = reference["abstract"]
+        if reference.get("citation_count") is not None:
+            row.citation_count = max(row.citation_count or 0, reference["citation_count"])
+
+        year = MetadataStoreService._parse_year(reference)
+        if year and (authoritative or not row.year):
+            row.year = year
+        row.normalized_title = MetadataStoreService._fit(
+            "normalized_title", MetadataStoreService.normalize_title(row.title)
+        )
+
+        sources = [s for s in (row.sources or "").split(",") if s]
+        if source and source not in sources:
+            # Crossref排在首位，作为展示的来源
+            sources = [source] + sources if authoritative else sources + [source]
+        row.sources = MetadataStoreService._fit("sources", ",".join(sources))
+
+    @staticmethod
+    def upsert(references: List[Dict[str, Any]]) -> int:
+        """
+        保存一批上游结果，已存在的记录（按DOI或规范化标题匹配）合并更新
+
+        Args:
+            references: 格式化的引用信息列表
+
+        Returns:
+            int: 新增或更新的记录数
+        """
+        references = [ref for ref in references if MetadataStoreService.normalize_title(ref.get("title"))]
+        if not references:
+            return 0
+
+        db = SessionLocal()
+        try:
+            dois = {MetadataStoreService.normalize_doi(ref.get("doi")) for ref in references} - {None}
+            titles = {MetadataStoreService.normalize_title(ref.get("title")) for ref in references}
+            by_doi = {
+                row.doi: row for row in db.query(PaperMetadata).filter(PaperMetadata.doi.in_(dois))
+            } if dois else {}
+            by_title: Dict[str, PaperMetadata] = {}
+            for row in db.query(PaperMetadata).filter(PaperMetadata.normalized_title.in_(titles)):
+                by_title.setdefault(row.normalized_title, row)
+
+            saved = 0
+            for ref in references:
+                doi = MetadataStoreService.normalize_doi(ref.get("doi"))
+                normalized_title = MetadataStoreService.normalize_title(ref.get("title"))
+                row = by_doi.get(doi) if doi else None
+                if row is None:
+                    candidate = by_title.get(normalized_title)
+                    # 同名但DOI不同的是不同文献（如多篇 "Introduction"）
+                    if candidate is not None and not (doi and candidate.doi and candidate.doi != doi):
+                        row = candidate
+
+                # 每条记录一个保存点：并发写入相同DOI时只重试该条，单条数据不合法（如超长DOI）时只跳过该条
+                try:
+                    row = MetadataStoreService._save_row(db, row, ref, doi)
+                except DBAPIError as e:
+                    logger.warning(f"保存文献元数据时出错，已跳过: {ref.get('title')}: {e}")
+                    continue
+                if row is None:
+                    logger.warning(f"保存文献元数据时发生冲突，已跳过: {ref.get('title')}")
+                    continue
+
+                saved += 1
+                if row.doi:
+                    by_doi[row.doi] = row
+                by_title.setdefault(row.normalized_title, row)
+
+            db.commit()
+            return saved
+        except Exception as e:
+            db.rollback()
+            logger.error(f"保存文献元数据时出错: {e}")
+            return 0
+        finally:
+            db.close()
+
+    @staticmethod
+    def _save_row(db: Session, row: Optional[PaperMetadata], reference: Dict[str, Any],
+                  doi: Optional[str]) -> Optional[PaperMetadata]:
+        """在保存点中新增或合并一条记录，相同DOI已被其他请求提交时合并进该记录，找不到时返回None"""
+        try:
+            with db.begin_nested():
+                if row is None:
+                    row = PaperMetadata(sources="", hit_count=0)
+                    db.add(row)
+                MetadataStoreService._merge(row, reference)
+                db.flush()
+            return row
+        except IntegrityError:
+            row = db.query(PaperMetadata).filter(PaperMetadata.doi == doi).first() if doi else None
+            if row is None:
+                return None
+            with db.begin_nested():
+                MetadataStoreService._merge(row, reference)
+                db.flush()
+            return row
+
+    @staticmethod
+    def search(query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        在本地元数据库中搜索
+
+        PostgreSQL使用标题和摘要的全文索引按相关度排序，其他数据库按标题词匹配；
+        结果的热门程度（命中次数）作为次要排序依据
+
+        Args:
+            query: 搜索关键词或DOI
+            limit: 返回结果数量限制
+
+        Returns:
+            List[Dict[str, Any]]: 格式化的引用信息列表
+        """
+        doi = MetadataStoreService.normalize_doi(query)
+        if doi:
+            reference = MetadataStoreService.get_by_doi(doi)
+            return [reference] if reference else []
+
+        tokens = MetadataStoreService.normalize_title(query).split()
+        if not tokens:
+            return []
+
+        db = SessionLocal()
+        try:
+            if db.bind.dialect.name == "postgresql":
+                # 表达式需与模型中的全文索引一致才能走索引
+                document = fulltext_document(PaperMetadata.title, PaperMetadata.abstract)
+                ts_query = func.plainto_tsquery(literal_column("'simple'::regconfig"), query)
+                rows = (
+                    db.query(PaperMetadata)
+                    .filter(document.op("@@")(ts_query))
+                    .order_by(func.ts_rank(document, ts_query).desc(), PaperMetadata.hit_count.desc())
+                    .limit(limit)
+                    .all()
+                )
+            else:
+                rows = (
+                    db.query(PaperMetadata)
+                    .filter(and_(*[PaperMetadata.normalized_title.like(f"%{token}%") for token in tokens]))
+                    .order_by(PaperMetadata.hit_count.desc())
+                    .limit(limit)
+                    .all()
+                )
+
+            results = [MetadataStoreService.to_reference(row) for row in rows]
+            if rows:
+                MetadataStoreService._record_hits([row.id for row in rows])
+            return results
+        except Exception as e:
+            logger.error(f"搜索本地文献元数据时出错: {e}")
+            return []
+        finally:
+            db.close()
+
+    @staticmethod
+    def get_by_doi(doi: str) -> Optional[Dict[str, Any]]:
+        """按DOI读取本地记录，不存在时返回None"""
+        doi = MetadataStoreService.normalize_doi(doi)
+        if not doi:
+            return None
+
+        db = SessionLocal()
+        try:
+            row = db.query(PaperMetadata).filter(PaperMetadata.doi == doi).first()
+            if row is None:
+                return None
+            reference = MetadataStoreService.to_reference(row)
+            MetadataStoreService._record_hits([row.id])
+            return reference
+        except Exception as e:
+            logger.error(f"读取本地文献元数据时出错: {e}")
+            return None
+        finally:
+            db.close()
+
+    @staticmethod
+    def get_by_dois(dois: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        批量按DOI读取本地记录
+
+        Args:
+            dois: DOI列表
+
+        Returns:
+            Dict[str, Dict[str, Any]]: 规范化DOI -> 引用信息，只包含本地存在的DOI
+        """
+        normalized = list({doi for doi in (MetadataStoreService.normalize_doi(d) for d in dois) if doi})
+        if not normalized:
+            return {}
+
+        db = SessionLocal()
+        try:
+            rows = db.query(PaperMetadata).filter(PaperMetadata.doi.in_(normalized)).all()
+            references = {row.doi: MetadataStoreService.to_reference(row) for row in rows}
+            if rows:
+                MetadataStoreService._record_hits([row.id for row in rows])
+            return references
+        except Exception as e:
+            logger.error(f"读取本地文献元数据时出错: {e}")
+            return {}
+        finally:
+            db.close()
+
+    @staticmethod
+    def get_by_title(title: str) -> Optional[Dict[str, Any]]:
+        """按规范化标题精确匹配本地记录，不存在时返回None"""
+        return MetadataStoreService.get_by_titles([title]).get(MetadataStoreService.normalize_title(title))
+
+    @staticmethod
+    def get_by_titles(titles: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        按规范化标题批量精确匹配本地记录（一次查询），同名记录取命中次数最多的
+
+        Args:
+            titles: 标题列表
+
+        Returns:
+            Dict[str, Dict[str, Any]]: 规范化标题 -> 引用信息，未命中的标题不在结果中
+        """
+        normalized_titles = {MetadataStoreService.normalize_title(title) for title in titles} - {""}
+        if not normalized_titles:
+            return {}
+
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(PaperMetadata)
+                .filter(PaperMetadata.normalized_title.in_(normalized_titles))
+                .order_by(PaperMetadata.hit_count.desc())
+                .all()
+            )
+            matched: Dict[str, PaperMetadata] = {}
+            for row in rows:
+                matched.setdefault(row.normalized_title, row)
+            if matched:
+                MetadataStoreService._record_hits([row.id for row in matched.values()])
+            return {key: MetadataStoreService.to_reference(row) for key, row in matched.items()}
+        except Exception as e:
+            logger.error(f"读取本地文献元数据时出错: {e}")
+            return {}
+        finally:
+            db.close()
+
+    @staticmethod
+    def _record_hits(ids: List[int]) -> None:
+        """累加命中次数，距上次写入超过HIT_FLUSH_INTERVAL时在后台线程中批量写入"""
+        with MetadataStoreService._hits_lock:
+            MetadataStoreService._pending_hits.update(ids)
+            due = (not MetadataStoreService._hits_flushing
+                   and time.monotonic() - MetadataStoreService._hits_flushed_at >= MetadataStoreService.HIT_FLUSH_INTERVAL)
+            if due:
+                MetadataStoreService._hits_flushing = True
+        if due:
+            threading.Thread(target=MetadataStoreService.flush_hits, daemon=True).start()
+
+    @staticmethod
+    def flush_hits() -> int:
+        """
+        将累加的命中次数批量写入数据库（应用关闭时也会调用）
+
+        Returns:
+            int: 更新的记录数
+        """
+        with MetadataStoreService._hits_lock:
+            pending = MetadataStoreService._pending_hits
+            MetadataStoreService._pending_hits = Counter()
+
+        db = SessionLocal()
+        try:
+            if not pending:
+                return 0
+            # 相同增量的记录合并为一条UPDATE
+            by_count: Dict[int, List[int]] = {}
+            for paper_id, count in pending.items():
+                by_count.setdefault(count, []).append(paper_id)
+            for count, ids in by_count.items():
+                db.query(PaperMetadata).filter(PaperMetadata.id.in_(ids)).update(
+                    {PaperMetadata.hit_count: func.coalesce(PaperMetadata.hit_count, 0) + count},
+                    synchronize_session=False
+                )
+            db.commit()
+            return len(pending)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"写入文献命中次数时出错: {e}")
+            # 放回下次重试
+            with MetadataStoreService._hits_lock:
+                MetadataStoreService._pending_hits.update(pending)
+            return 0
+        finally:
+            db.close()
+            with MetadataStoreService._hits_lock:
+                MetadataStoreService._hits_flushed_at = time.monotonic()
+                MetadataStoreService._hits_flushing = False
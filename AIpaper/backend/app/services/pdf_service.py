@@ -2,10 +2,12 @@ import os
 import uuid
 import logging
 import re
+import threading
 from typing import List, Dict, Any, Optional, Tuple
-from datetime import datetime
+from datetime import datetime, timedelta
 import asyncio
 from pathlib import Path
+from functools import lru_cache
 
 from pypdf import PdfReader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
@@ -13,29 +15,81 @@ from langchain.schema import Document
 from langchain.vectorstores import Chroma
 from langchain.embeddings.openai import OpenAIEmbeddings
 
+from sqlalchemy import and_, exists, or_, text
+from sqlalchemy.orm import Session, aliased
+from pydantic import BaseModel, Field
+
 from app.core.config import get_settings
+from app.db.database import SessionLocal
+from app.models.pdf_source import PDFSource
+from app.models.chunk_fingerprint import ChunkFingerprint
+from app.services.bibliography_service import BibliographyService
+from app.services.fingerprint_service import FingerprintService
+from app.services.storage_service import StorageBackend, get_storage
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+
+class PDFSearchFilters(BaseModel):
+    """PDF检索元数据过滤条件"""
+    year_from: Optional[int] = Field(None, description="起始年份（含）")
+    year_to: Optional[int] = Field(None, description="截止年份（含）")
+    author: Optional[str] = Field(None, description="作者（模糊匹配）")
+    journal: Optional[str] = Field(None, description="期刊/会议（模糊匹配）")
+    keyword: Optional[str] = Field(None, description="关键词（模糊匹配）")
+    
+    def has_catalog_filters(self) -> bool:
+        """是否包含需要通过PDF目录解析的文本条件"""
+        return bool(self.author or self.journal or self.keyword)
+
+
 class PDFService:
     """PDF处理服务"""
     
-    # 保存PDF文件的目录
-    PDF_DIR = os.path.join(settings.UPLOAD_DIR, "pdfs")
-    
     # 向量存储目录
     VECTOR_DIR = os.path.join(settings.UPLOAD_DIR, "vectors")
     
     # 确保目录存在
-    os.makedirs(PDF_DIR, exist_ok=True)
     os.makedirs(VECTOR_DIR, exist_ok=True)
     
+    # 所有PDF分块共享的向量集合
+    SHARED_COLLECTION = "pdf_chunks"
+    SHARED_VECTOR_DIR = os.path.join(VECTOR_DIR, "shared")
+    
+    # 旧版独立向量库迁移到共享集合后写入的标记文件（目录保留，用于旧布局文件的状态判断）
+    LEGACY_MIGRATED_MARKER = "migrated"
+    
+    # 检索时相对返回数量的候选放大倍数
+    SEARCH_OVERSAMPLE = 3
+    
+    # 分块去重的判定和指纹登记须串行，否则并发导入的近似重复PDF互相看不到对方的指纹
+    _dedup_lock = threading.Lock()
+    DEDUP_LOCK_KEY = 0x6368756e6b  # PostgreSQL咨询锁的键（跨worker进程）
+    
+    @staticmethod
+    @lru_cache()
+    def get_embeddings() -> OpenAIEmbeddings:
+        """获取进程内共享的嵌入模型客户端，复用其连接池"""
+        return OpenAIEmbeddings(api_key=settings.OPENAI_API_KEY)
+    
+    @staticmethod
+    @lru_cache()
+    def get_vectordb() -> Chroma:
+        """获取进程内共享的向量集合，避免每次检索重新加载"""
+        return Chroma(
+            collection_name=PDFService.SHARED_COLLECTION,
+            persist_directory=PDFService.SHARED_VECTOR_DIR,
+            embedding_function=PDFService.get_embeddings()
+        )
+    
     @staticmethod
     async def save_uploaded_pdf(filename: str, file_content: bytes, user_id: Optional[int] = None) -> Dict[str, Any]:
         """
         保存上传的PDF文件
         
+        文件以内容哈希作为ID存入分片目录，相同内容的文件只保存一份
+        
         Args:
             filename: 文件名
             file_content: 文件内容
@@ -44,29 +98,27 @@ class PDFService:
         Returns:
             Dict[str, Any]: 文件信息
         """
-        # 生成唯一文件名
-        unique_id = str(uuid.uuid4())
-        safe_filename = filename.replace(" ", "_")
-        file_path = os.path.join(PDFService.PDF_DIR, f"{unique_id}_{safe_filename}")
-        
-        # 异步写入文件
-        async def write_file():
-            with open(file_path, "wb") as f:
-                f.write(file_content)
+        storage = get_storage()
+        pdf_id = StorageBackend.compute_id(file_content)
         
-        # 运行异步任务
-        await asyncio.to_thread(lambda: write_file())
+        # 相同内容已存在时直接复用
+        existing = await asyncio.to_thread(storage.get_metadata, pdf_id)
+        if existing:
+            return {**existing, "duplicate": True}
         
-        # 获取文件信息
         file_info = {
-            "id": unique_id,
+            "id": pdf_id,
             "filename": filename,
-            "path": file_path,
             "size": len(file_content),
             "upload_time": datetime.now().isoformat(),
-            "user_id": user_id
+            "user_id": user_id,
+            "status": "uploaded"
         }
         
+        # 异步写入文件
+        file_info["path"] = await asyncio.to_thread(storage.save, pdf_id, file_content, file_info)
+        file_info["duplicate"] = False
+        
         return file_info
     
     @staticmethod
@@ -97,12 +149,13 @@ class PDFService:
             return ""
     
     @staticmethod
-    async def extract_metadata_from_pdf(file_path: str) -> Dict[str, Any]:
+    async def extract_metadata_from_pdf(file_path: str, text: Optional[str] = None) -> Dict[str, Any]:
         """
         从PDF提取元数据
         
         Args:
             file_path: PDF文件路径
+            text: 已提取的全文，传入时不再重复解析PDF
             
         Returns:
             Dict[str, Any]: 元数据
@@ -134,7 +187,8 @@ class PDFService:
             metadata = await asyncio.to_thread(get_metadata)
             
             # 提取全文，尝试解析更多元数据
-            text = await PDFService.extract_text_from_pdf(file_path)
+            if text is None:
+                text = await PDFService.extract_text_from_pdf(file_path)
             
             # 尝试从文本中提取更多元数据
             if text:
@@ -194,13 +248,14 @@ class PDFService:
             return {"pages": 0}
     
     @staticmethod
-    async def process_pdf(pdf_id: str, file_path: str) -> Dict[str, Any]:
+    async def process_pdf(pdf_id: str, file_path: str, source_name: Optional[str] = None) -> Dict[str, Any]:
         """
         处理PDF文件，包括文本提取、分块和向量化
         
         Args:
             pdf_id: PDF唯一ID
             file_path: PDF文件路径
+            source_name: 来源文件名，默认取文件路径的文件名
             
         Returns:
             Dict[str, Any]: 处理结果
@@ -213,8 +268,13 @@ class PDFService:
                 "message": "未能从PDF提取文本"
             }
         
-        # 提取元数据
-        metadata = await PDFService.extract_metadata_from_pdf(file_path)
+        # 提取元数据（复用已提取的全文）
+        metadata = await PDFService.extract_metadata_from_pdf(file_path, text=text)
+        
+        # 解析参考文献列表，向量化完成后再批量解析入库
+        bibliography = []
+        if settings.PDF_EXTRACT_REFERENCES:
+            bibliography = await asyncio.to_thread(BibliographyService.extract_entries, text)
         
         # 文本分块
         text_splitter = RecursiveCharacterTextSplitter(
@@ -226,6 +286,11 @@ class PDFService:
         chunks = await asyncio.to_thread(lambda: text_splitter.split_text(text))
         
         # 创建文档对象，带有元数据
+        chunk_metadata = PDFService._sanitize_metadata(metadata)
+        year_num = PDFService._parse_year(metadata.get("year"))
+        if year_num is not None:
+            # 数值年份用于检索时的范围过滤
+            chunk_metadata["year_num"] = year_num
         documents = []
         for i, chunk in enumerate(chunks):
             doc = Document(
@@ -233,40 +298,24 @@ class PDFService:
                 metadata={
                     "pdf_id": pdf_id,
                     "chunk_id": i,
-                    "source": os.path.basename(file_path),
-                    **metadata
+                    "source": source_name or os.path.basename(file_path),
+                    **chunk_metadata
                 }
             )
             documents.append(doc)
         
-        # 向量化文档
-        collection_name = f"pdf_{pdf_id}"
-        vector_db_path = os.path.join(PDFService.VECTOR_DIR, collection_name)
-        
-        # 确保向量存储目录存在
-        os.makedirs(vector_db_path, exist_ok=True)
-        
-        # 创建向量存储
+        # 向量化文档，写入所有PDF共享的集合
         try:
-            embeddings = OpenAIEmbeddings(api_key=settings.OPENAI_API_KEY)
-            
-            async def create_vector_db():
-                return Chroma.from_documents(
-                    documents,
-                    embeddings,
-                    persist_directory=vector_db_path
-                )
-            
-            vectordb = await asyncio.to_thread(create_vector_db)
-            
-            # 持久化向量存储
-            await asyncio.to_thread(lambda: vectordb.persist())
+            stats = await asyncio.to_thread(PDFService._store_chunks, pdf_id, documents)
             
             return {
                 "success": True,
                 "message": "PDF处理成功",
                 "metadata": metadata,
-                "chunk_count": len(chunks)
+                "chunk_count": len(chunks),
+                "stored_chunk_count": stats["stored"],
+                "duplicate_chunk_count": stats["duplicates"],
+                "bibliography": bibliography
             }
         
         except Exception as e:
@@ -276,6 +325,393 @@ class PDFService:
                 "message": f"向量化PDF时出错: {str(e)}"
             }
     
+    @staticmethod
+    def _store_chunks(pdf_id: str, documents: List[Document],
+                      vectors: Optional[Dict[int, List[float]]] = None) -> Dict[str, int]:
+        """
+        按SimHash指纹对分块去重后写入向量库
+        
+        与已入库分块近似重复（汉明距离不超过CHUNK_DEDUP_MAX_DISTANCE）的分块
+        只登记为规范分块的别名，不再计算和存储向量。
+        
+        嵌入在锁外按初步判定计算；登记指纹前持锁（PostgreSQL上同时持有事务级咨询锁）
+        重新判定，使并发导入的近似重复PDF也能互相识别。
+        
+        Args:
+            pdf_id: PDF唯一ID
+            documents: 分块文档
+            vectors: 已有的嵌入向量（分块下标 -> 向量），如迁移旧版向量库时，这些分块不再重新计算
+            
+        Returns:
+            Dict[str, int]: 实际存储和判定为重复的分块数量
+        """
+        vectordb = PDFService.get_vectordb()
+        fingerprints = [FingerprintService.simhash(doc.page_content) for doc in documents]
+        db = SessionLocal()
+        try:
+            # 初步判定需要存储向量的分块，并在锁外计算嵌入
+            matches = PDFService._match_chunks(db, pdf_id, documents, fingerprints,
+                                               PDFService._stale_chunk_ids(db, pdf_id))
+            embeddings = dict(vectors or {})
+            pending = [i for i, match in enumerate(matches) if match is None and i not in embeddings]
+            embeddings.update(PDFService._embed_chunks(documents, pending))
+            db.rollback()
+            
+            with PDFService._dedup_lock:
+                if db.get_bind().dialect.name == "postgresql":
+                    db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PDFService.DEDUP_LOCK_KEY})
+                
+                # 重新处理时清理该PDF此前的分块，仍被其他PDF引用的规范分块予以保留
+                stale_ids = PDFService._stale_chunk_ids(db, pdf_id, delete=True)
+                
+                # 重新判定：初步判定后其他导入任务可能已提交了近似重复的规范分块
+                matches = PDFService._match_chunks(db, pdf_id, documents, fingerprints, stale_ids)
+                missing = [i for i, match in enumerate(matches) if match is None and i not in embeddings]
+                embeddings.update(PDFService._embed_chunks(documents, missing))
+                
+                canonical_ids = []
+                canonical_docs = []
+                for i, (doc, fingerprint, match) in enumerate(zip(documents, fingerprints, matches)):
+                    chunk_uid = f"{pdf_id}:{doc.metadata['chunk_id']}"
+                    bands = FingerprintService.bands(fingerprint)
+                    if match is None:
+                        doc.metadata["chunk_uid"] = chunk_uid
+                        doc.metadata["simhash"] = FingerprintService.to_hex(fingerprint)
+                        canonical_ids.append(chunk_uid)
+                        canonical_docs.append(i)
+                    
+                    db.add(ChunkFingerprint(
+                        pdf_id=pdf_id,
+                        chunk_index=doc.metadata["chunk_id"],
+                        simhash=FingerprintService.to_hex(fingerprint),
+                        band0=bands[0],
+                        band1=bands[1],
+                        band2=bands[2],
+                        band3=bands[3],
+                        canonical_chunk_id=match or chunk_uid,
+                        is_canonical=match is None
+                    ))
+                
+                # 先写向量库，成功后再提交指纹记录
+                if stale_ids:
+                    vectordb.delete(ids=stale_ids)
+                if canonical_ids:
+                    vectordb._collection.upsert(
+                        ids=canonical_ids,
+                        embeddings=[embeddings[i] for i in canonical_docs],
+                        metadatas=[documents[i].metadata for i in canonical_docs],
+                        documents=[documents[i].page_content for i in canonical_docs]
+                    )
+                vectordb.persist()
+                db.commit()
+            
+            return {
+                "stored": len(canonical_ids),
+                "duplicates": len(documents) - len(canonical_ids)
+            }
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    
+    @staticmethod
+    def _embed_chunks(documents: List[Document], indexes: List[int]) -> Dict[int, List[float]]:
+        """计算指定分块的嵌入向量"""
+        if not indexes:
+            return {}
+        vectors = PDFService.get_embeddings().embed_documents([documents[i].page_content for i in indexes])
+        return dict(zip(indexes, vectors))
+    
+    @staticmethod
+    def _stale_chunk_ids(db: Session, pdf_id: str, delete: bool = False) -> List[str]:
+        """
+        获取该PDF此前入库、重新处理时需要从向量库删除的规范分块
+        
+        Args:
+            db: 数据库会话
+            pdf_id: PDF唯一ID
+            delete: 是否同时删除该PDF此前的指纹记录（仍被其他PDF引用的规范分块予以保留）
+            
+        Returns:
+            List[str]: 需要删除的规范分块ID
+        """
+        old_rows = db.query(ChunkFingerprint).filter(ChunkFingerprint.pdf_id == pdf_id).all()
+        old_canonical_ids = [row.canonical_chunk_id for row in old_rows if row.is_canonical]
+        referenced = set()
+        if old_canonical_ids:
+            referenced = {
+                row.canonical_chunk_id for row in db.query(ChunkFingerprint.canonical_chunk_id).filter(
+                    ChunkFingerprint.canonical_chunk_id.in_(old_canonical_ids),
+                    ChunkFingerprint.pdf_id != pdf_id
+                )
+            }
+        stale_ids = []
+        for row in old_rows:
+            if row.is_canonical and row.canonical_chunk_id in referenced:
+                continue
+            if row.is_canonical:
+                stale_ids.append(row.canonical_chunk_id)
+            if delete:
+                db.delete(row)
+        return stale_ids
+    
+    @staticmethod
+    def _match_chunks(db: Session, pdf_id: str, documents: List[Document], fingerprints: List[int],
+                      stale_ids: List[str]) -> List[Optional[str]]:
+        """
+        为每个分块查找近似重复的规范分块
+        
+        候选按指纹分段一次性取出；同一PDF内较早的分块也作为后续分块的候选。
+        
+        Returns:
+            List[Optional[str]]: 每个分块匹配的规范分块ID，无匹配时为None
+        """
+        max_distance = settings.CHUNK_DEDUP_MAX_DISTANCE
+        band_index: Dict[Tuple[int, int], List[Tuple[int, str]]] = {}
+        
+        def index_fingerprint(fingerprint: int, chunk_uid: str):
+            for band_no, band in enumerate(FingerprintService.bands(fingerprint)):
+                band_index.setdefault((band_no, band), []).append((fingerprint, chunk_uid))
+        
+        if fingerprints:
+            band_columns = [ChunkFingerprint.band0, ChunkFingerprint.band1,
+                            ChunkFingerprint.band2, ChunkFingerprint.band3]
+            band_values = [set() for _ in band_columns]
+            for fingerprint in fingerprints:
+                for band_no, band in enumerate(FingerprintService.bands(fingerprint)):
+                    band_values[band_no].add(band)
+            candidates = db.query(ChunkFingerprint.simhash, ChunkFingerprint.canonical_chunk_id).filter(
+                ChunkFingerprint.is_canonical == True,
+                or_(*[column.in_(values) for column, values in zip(band_columns, band_values)])
+            )
+            if stale_ids:
+                candidates = candidates.filter(ChunkFingerprint.canonical_chunk_id.notin_(stale_ids))
+            for row in candidates.all():
+                index_fingerprint(FingerprintService.from_hex(row.simhash), row.canonical_chunk_id)
+        
+        matches = []
+        for doc, fingerprint in zip(documents, fingerprints):
+            match = None
+            for band_no, band in enumerate(FingerprintService.bands(fingerprint)):
+                for candidate, candidate_uid in band_index.get((band_no, band), ()):
+                    if FingerprintService.hamming_distance(fingerprint, candidate) <= max_distance:
+                        match = candidate_uid
+                        break
+                if match:
+                    break
+            if match is None:
+                index_fingerprint(fingerprint, f"{pdf_id}:{doc.metadata['chunk_id']}")
+            matches.append(match)
+        return matches
+    
+    @staticmethod
+    async def process_stored_pdf(pdf_id: str) -> Dict[str, Any]:
+        """
+        处理存储后端中的PDF文件，并记录处理状态
+        
+        Args:
+            pdf_id: PDF唯一ID
+            
+        Returns:
+            Dict[str, Any]: 处理结果
+        """
+        storage = get_storage()
+        file_info = await asyncio.to_thread(storage.update_metadata, pdf_id, status="processing")
+        if file_info is None:
+            return {
+                "success": False,
+                "message": f"找不到ID为 {pdf_id} 的PDF文件"
+            }
+        await asyncio.to_thread(PDFService.update_pdf_sources, pdf_id, {"index_status": "processing"})
+        
+        file_path, is_temp = await asyncio.to_thread(storage.fetch_local, pdf_id)
+        try:
+            result = await PDFService.process_pdf(pdf_id, file_path, source_name=file_info.get("filename"))
+        finally:
+            if is_temp:
+                await asyncio.to_thread(os.remove, file_path)
+        
+        await asyncio.to_thread(
+            storage.update_metadata,
+            pdf_id,
+            status="processed" if result["success"] else "failed",
+            chunk_count=result.get("chunk_count", 0)
+        )
+        
+        # 同步数据库中引用该PDF的记录
+        if result["success"]:
+            fields = PDFService.indexed_source_fields(result.get("metadata", {}), result["chunk_count"])
+        else:
+            fields = {"index_status": "failed", "is_indexed": False}
+        await asyncio.to_thread(PDFService.update_pdf_sources, pdf_id, fields)
+        
+        # 批量解析参考文献并写入引用记录，失败不影响PDF索引结果
+        bibliography = result.pop("bibliography", [])
+        if bibliography:
+            try:
+                result["reference_count"] = await BibliographyService.ingest(pdf_id, bibliography)
+            except Exception as e:
+                logger.error(f"提取PDF {pdf_id} 的参考文献时出错: {e}")
+        
+        return result
+    
+    @staticmethod
+    def indexed_source_fields(metadata: Dict[str, Any], chunk_count: int) -> Dict[str, Any]:
+        """
+        索引完成后写入PDF源文件记录的字段
+
+        Args:
+            metadata: 提取的PDF元数据（列表字段也可以是已拼接的字符串）
+            chunk_count: 分块数量
+
+        Returns:
+            Dict[str, Any]: PDFSource字段
+        """
+        def joined(value: Any) -> str:
+            if isinstance(value, (list, tuple)):
+                return "; ".join(str(v) for v in value)
+            return str(value or "")
+
+        return {
+            "index_status": "completed",
+            "is_indexed": True,
+            "chunk_count": chunk_count,
+            "title": joined(metadata.get("title"))[:512] or None,
+            "authors": joined(metadata.get("authors") or metadata.get("author"))[:512] or None,
+            "year": PDFService._parse_year(metadata.get("year")),
+            "journal": joined(metadata.get("journal"))[:512] or None,
+            "keywords": joined(metadata.get("keywords"))[:1024] or None,
+            "indexed_at": datetime.utcnow()
+        }
+
+    @staticmethod
+    def register_pdf_source(db: Session, file_info: Dict[str, Any], document_id: Optional[int] = None) -> PDFSource:
+        """
+        登记PDF源文件记录，同一文档重复登记同一PDF时复用已有记录
+        
+        Args:
+            db: 数据库会话
+            file_info: 存储后端中的文件信息
+            document_id: 关联的文档ID
+            
+        Returns:
+            PDFSource: PDF源文件记录
+        """
+        pdf_id = file_info["id"]
+        existing = db.query(PDFSource).filter(
+            PDFSource.vector_db_id == pdf_id,
+            PDFSource.document_id == document_id
+        ).first()
+        if existing:
+            return existing
+        
+        pdf_source = PDFSource(
+            filename=file_info["filename"],
+            file_path=get_storage().object_key(pdf_id),
+            file_size=file_info["size"],
+            vector_db_id=pdf_id,
+            document_id=document_id,
+            index_status="pending"
+        )
+        
+        # 相同内容的PDF已完成索引时，直接复用其索引信息
+        indexed = db.query(PDFSource).filter(
+            PDFSource.vector_db_id == pdf_id,
+            PDFSource.index_status == "completed"
+        ).first()
+        if indexed:
+            pdf_source.index_status = "completed"
+            pdf_source.is_indexed = True
+            pdf_source.chunk_count = indexed.chunk_count
+            pdf_source.title = indexed.title
+            pdf_source.authors = indexed.authors
+            pdf_source.year = indexed.year
+            pdf_source.journal = indexed.journal
+            pdf_source.keywords = indexed.keywords
+            pdf_source.indexed_at = indexed.indexed_at
+        
+        db.add(pdf_source)
+        db.commit()
+        db.refresh(pdf_source)
+        
+        if indexed:
+            BibliographyService.copy_references(db, indexed.id, pdf_source)
+        
+        return pdf_source
+    
+    @staticmethod
+    def claim_processing(db: Session, pdf_id: str) -> bool:
+        """
+        认领PDF的处理任务，避免相同内容的文件被并发处理
+
+        只有处理失败、尚未处理，或处于processing状态超过PDF_PROCESSING_TIMEOUT（处理中断）的PDF
+        可以认领；已完成索引或正在处理时返回False，调用方直接返回已有记录及其状态。
+        认领成功后引用该PDF的源文件记录标记为processing。
+
+        Args:
+            db: 数据库会话
+            pdf_id: PDF唯一ID
+
+        Returns:
+            bool: 是否认领成功（需要处理）
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.PDF_PROCESSING_TIMEOUT)
+        other = aliased(PDFSource)
+        in_progress = exists().where(
+            other.vector_db_id == pdf_id,
+            or_(
+                other.index_status == "completed",
+                and_(other.index_status == "processing", other.updated_at >= cutoff)
+            )
+        )
+        claimed = db.query(PDFSource).filter(
+            PDFSource.vector_db_id == pdf_id,
+            PDFSource.index_status.in_(("pending", "failed", "processing")),
+            ~in_progress
+        ).update({"index_status": "processing", "updated_at": datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+        return claimed > 0
+    
+    @staticmethod
+    def get_document_pdf_ids(db: Session, document_id: int) -> List[str]:
+        """
+        获取文档关联的已完成索引的PDF ID列表
+        
+        Args:
+            db: 数据库会话
+            document_id: 文档ID
+            
+        Returns:
+            List[str]: PDF ID列表
+        """
+        rows = db.query(PDFSource.vector_db_id).filter(
+            PDFSource.document_id == document_id,
+            PDFSource.index_status == "completed"
+        ).distinct().all()
+        return [row.vector_db_id for row in rows]
+    
+    @staticmethod
+    def update_pdf_sources(pdf_id: str, fields: Dict[str, Any]) -> None:
+        """
+        更新引用指定PDF的所有源文件记录
+        
+        Args:
+            pdf_id: PDF唯一ID
+            fields: 要更新的字段
+        """
+        db = SessionLocal()
+        try:
+            db.query(PDFSource).filter(
+                PDFSource.vector_db_id == pdf_id
+            ).update(fields, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"更新PDF {pdf_id} 的源文件记录时出错: {e}")
+        finally:
+            db.close()
+    
     @staticmethod
     async def search_pdf(pdf_id: str, query: str, limit: int = 5) -> List[Dict[str, Any]]:
         """
@@ -289,47 +725,326 @@ class PDFService:
         Returns:
             List[Dict[str, Any]]: 搜索结果
         """
-        collection_name = f"pdf_{pdf_id}"
-        vector_db_path = os.path.join(PDFService.VECTOR_DIR, collection_name)
+        return await PDFService.search_pdfs([pdf_id], query, limit)
+    
+    @staticmethod
+    async def search_pdfs(pdf_ids: Optional[List[str]], query: str, limit: int = 5,
+                          limit_per_pdf: Optional[int] = None,
+                          filters: Optional[PDFSearchFilters] = None) -> List[Dict[str, Any]]:
+        """
+        在多个PDF中执行一次过滤检索，返回按相关性排序并去重的段落
         
-        if not os.path.exists(vector_db_path):
-            logger.error(f"PDF ID {pdf_id} 的向量存储不存在")
+        年份范围作为向量检索的元数据预过滤条件下推；作者、期刊、关键词
+        需先通过 filter_pdf_ids 在PDF目录中解析为PDF ID集合。
+        
+        Args:
+            pdf_ids: PDF ID列表，为None时搜索所有PDF
+            query: 搜索查询
+            limit: 返回结果限制
+            limit_per_pdf: 每个PDF最多返回的结果数量
+            filters: 元数据过滤条件
+            
+        Returns:
+            List[Dict[str, Any]]: 搜索结果，relevance_score越大越相关
+        """
+        if pdf_ids is not None and not pdf_ids:
             return []
         
+        # 多取一些候选，以便去重和按PDF限流后仍有足够结果
+        fetch_k = limit * PDFService.SEARCH_OVERSAMPLE
+        
+        # 重复分块只存储了一份向量，需同时检索这些PDF引用的规范分块
+        aliases: Dict[str, Dict[str, int]] = {}
+        catalog: Dict[str, Dict[str, Any]] = {}
+        if pdf_ids is not None:
+            aliases = await asyncio.to_thread(PDFService._get_chunk_aliases, list(pdf_ids))
+            alias_pdf_ids = {pdf_id for members in aliases.values() for pdf_id in members}
+            if alias_pdf_ids:
+                catalog = await asyncio.to_thread(PDFService._get_catalog_metadata, list(alias_pdf_ids))
+        
+        search_filter = PDFService._build_vector_filter(pdf_ids, filters, list(aliases))
+        
         try:
-            # 使用OpenAI嵌入
-            embeddings = OpenAIEmbeddings(api_key=settings.OPENAI_API_KEY)
-            
-            # 加载已有的向量存储
-            async def load_vectordb():
-                return Chroma(
-                    persist_directory=vector_db_path,
-                    embedding_function=embeddings
-                )
-            
-            vectordb = await asyncio.to_thread(load_vectordb)
+            vectordb = PDFService.get_vectordb()
             
             # 执行相似性搜索
-            async def similarity_search():
-                return vectordb.similarity_search_with_score(query, k=limit)
+            def similarity_search():
+                return vectordb.similarity_search_with_relevance_scores(query, k=fetch_k, filter=search_filter)
             
             results = await asyncio.to_thread(similarity_search)
-            
-            # 格式化结果
-            formatted_results = []
-            for doc, score in results:
-                formatted_results.append({
-                    "content": doc.page_content,
-                    "metadata": doc.metadata,
-                    "relevance_score": float(score)
-                })
-            
-            return formatted_results
         
         except Exception as e:
             logger.error(f"搜索PDF时出错: {e}")
             return []
         
+        results.sort(key=lambda item: item[1], reverse=True)
+        
+        # 折叠近似重复的段落并格式化结果
+        max_distance = settings.CHUNK_DEDUP_MAX_DISTANCE
+        formatted_results = []
+        kept_fingerprints: List[int] = []
+        per_pdf_counts: Dict[str, int] = {}
+        pdf_scope = set(pdf_ids) if pdf_ids is not None else None
+        for doc, score in results:
+            fingerprint_hex = doc.metadata.get("simhash")
+            fingerprint = (FingerprintService.from_hex(fingerprint_hex) if fingerprint_hex
+                           else FingerprintService.simhash(doc.page_content))
+            if any(FingerprintService.hamming_distance(fingerprint, kept) <= max_distance
+                   for kept in kept_fingerprints):
+                continue
+            
+            # 命中的规范分块可能属于检索范围外或年份不符的PDF，归属到范围内包含该段落的PDF
+            attribution = PDFService._attribute_hit(doc.metadata, pdf_scope, aliases, catalog,
+                                                    filters, per_pdf_counts, limit_per_pdf)
+            if attribution is None:
+                continue
+            result_pdf_id, metadata = attribution
+            
+            kept_fingerprints.append(fingerprint)
+            per_pdf_counts[result_pdf_id] = per_pdf_counts.get(result_pdf_id, 0) + 1
+            result = {
+                "content": doc.page_content,
+                "metadata": metadata,
+                "relevance_score": float(score)
+            }
+            # 同一段落也出现在检索范围内的其他PDF中
+            containing = set(aliases.get(doc.metadata.get("chunk_uid"), ()))
+            if pdf_scope is None or doc.metadata.get("pdf_id") in pdf_scope:
+                containing.add(doc.metadata.get("pdf_id"))
+            containing.discard(result_pdf_id)
+            if containing:
+                result["also_in_pdf_ids"] = sorted(containing)
+            formatted_results.append(result)
+            
+            if len(formatted_results) >= limit:
+                break
+        
+        return formatted_results
+    
+    @staticmethod
+    def _attribute_hit(metadata: Dict[str, Any], pdf_scope: Optional[set],
+                       aliases: Dict[str, Dict[str, int]], catalog: Dict[str, Dict[str, Any]],
+                       filters: Optional[PDFSearchFilters], per_pdf_counts: Dict[str, int],
+                       limit_per_pdf: Optional[int]) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        确定检索命中的分块归属的PDF
+        
+        优先归属分块自身所在的PDF；其不在检索范围内、年份不符或已达每个PDF的结果上限时，
+        依次尝试范围内登记了该分块别名的PDF，并按该PDF自身的目录元数据判断年份。
+        
+        Args:
+            metadata: 命中分块的元数据
+            pdf_scope: 检索范围内的PDF ID集合，为None时表示所有PDF
+            aliases: 规范分块ID -> {范围内包含该分块的PDF ID: 分块序号}
+            catalog: 别名PDF的目录元数据
+            filters: 元数据过滤条件
+            per_pdf_counts: 每个PDF已返回的结果数量
+            limit_per_pdf: 每个PDF最多返回的结果数量
+            
+        Returns:
+            Optional[Tuple[str, Dict[str, Any]]]: (归属的PDF ID, 结果元数据)，没有可归属的PDF时返回None
+        """
+        def available(pdf_id: str) -> bool:
+            return not limit_per_pdf or per_pdf_counts.get(pdf_id, 0) < limit_per_pdf
+        
+        own_pdf_id = metadata.get("pdf_id")
+        # 补写前的分块没有year_num，年份条件在此按原始年份后过滤
+        if ((pdf_scope is None or own_pdf_id in pdf_scope)
+                and (not filters or PDFService._year_in_range(PDFService._chunk_year(metadata), filters))
+                and available(own_pdf_id)):
+            return own_pdf_id, metadata
+        
+        for pdf_id, chunk_index in sorted(aliases.get(metadata.get("chunk_uid"), {}).items()):
+            if pdf_id == own_pdf_id or not available(pdf_id):
+                continue
+            own = catalog.get(pdf_id, {})
+            if filters and not PDFService._year_in_range(own.get("year_num"), filters):
+                continue
+            return pdf_id, {**metadata, **own, "pdf_id": pdf_id, "chunk_id": chunk_index}
+        return None
+    
+    @staticmethod
+    def _get_chunk_aliases(pdf_ids: List[str]) -> Dict[str, Dict[str, int]]:
+        """
+        获取指定PDF中作为重复分块登记的别名
+        
+        Returns:
+            Dict[str, Dict[str, int]]: 规范分块ID -> {包含该分块的PDF ID: 该PDF中的分块序号}
+        """
+        db = SessionLocal()
+        try:
+            rows = db.query(ChunkFingerprint.canonical_chunk_id, ChunkFingerprint.pdf_id,
+                            ChunkFingerprint.chunk_index).filter(
+                ChunkFingerprint.pdf_id.in_(pdf_ids),
+                ChunkFingerprint.is_canonical == False
+            ).all()
+        finally:
+            db.close()
+        
+        aliases: Dict[str, Dict[str, int]] = {}
+        for row in rows:
+            aliases.setdefault(row.canonical_chunk_id, {}).setdefault(row.pdf_id, row.chunk_index)
+        return aliases
+    
+    @staticmethod
+    def _get_catalog_metadata(pdf_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        从PDF目录读取PDF自身的元数据，用于归属到别名PDF的检索结果
+        
+        Returns:
+            Dict[str, Dict[str, Any]]: PDF ID -> 与分块元数据同名的字段（仅包含非空值）
+        """
+        db = SessionLocal()
+        try:
+            rows = db.query(PDFSource).filter(
+                PDFSource.vector_db_id.in_(pdf_ids),
+                PDFSource.index_status == "completed"
+            ).all()
+        finally:
+            db.close()
+        
+        catalog: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            if row.vector_db_id in catalog:
+                continue
+            fields = {
+                "source": row.filename,
+                "title": row.title,
+                "authors": row.authors,
+                "journal": row.journal,
+                "year": row.year,
+                "year_num": row.year,
+            }
+            catalog[row.vector_db_id] = {key: value for key, value in fields.items() if value is not None}
+        return catalog
+    
+    @staticmethod
+    def _build_vector_filter(pdf_ids: Optional[List[str]],
+                             filters: Optional[PDFSearchFilters] = None,
+                             alias_chunk_ids: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        构造向量库的元数据预过滤条件
+        
+        别名分块的元数据属于规范分块所在的PDF，年份条件只作用于检索范围内PDF自身的分块，
+        别名命中由调用方按别名PDF的目录年份过滤
+        """
+        year_clauses = []
+        if filters and filters.year_from is not None:
+            year_clauses.append({"year_num": {"$gte": filters.year_from}})
+        if filters and filters.year_to is not None:
+            year_clauses.append({"year_num": {"$lte": filters.year_to}})
+        
+        clauses = list(year_clauses)
+        if pdf_ids is not None:
+            if len(pdf_ids) == 1:
+                pdf_clause = {"pdf_id": pdf_ids[0]}
+            else:
+                pdf_clause = {"pdf_id": {"$in": list(pdf_ids)}}
+            if alias_chunk_ids:
+                own_clause = {"$and": [pdf_clause, *year_clauses]} if year_clauses else pdf_clause
+                return {"$or": [own_clause, {"chunk_uid": {"$in": list(alias_chunk_ids)}}]}
+            clauses.insert(0, pdf_clause)
+        
+        if not clauses:
+            return None
+        if len(clauses) == 1:
+            return clauses[0]
+        return {"$and": clauses}
+    
+    @staticmethod
+    def filter_pdf_ids(db: Session, pdf_ids: Optional[List[str]],
+                       filters: Optional[PDFSearchFilters]) -> Optional[List[str]]:
+        """
+        在PDF目录中按作者、期刊、关键词解析符合条件的PDF ID集合，
+        结果作为向量检索的预过滤条件
+        
+        Args:
+            db: 数据库会话
+            pdf_ids: 候选PDF ID列表，为None时表示所有PDF
+            filters: 元数据过滤条件
+            
+        Returns:
+            Optional[List[str]]: 过滤后的PDF ID列表，无文本条件时原样返回
+        """
+        if not filters or not filters.has_catalog_filters():
+            return pdf_ids
+        if pdf_ids is not None and not pdf_ids:
+            return []
+        
+        query = db.query(PDFSource.vector_db_id).filter(PDFSource.index_status == "completed")
+        if pdf_ids is not None:
+            query = query.filter(PDFSource.vector_db_id.in_(pdf_ids))
+        if filters.author:
+            query = query.filter(PDFSource.authors.ilike(f"%{filters.author}%"))
+        if filters.journal:
+            query = query.filter(PDFSource.journal.ilike(f"%{filters.journal}%"))
+        if filters.keyword:
+            query = query.filter(PDFSource.keywords.ilike(f"%{filters.keyword}%"))
+        if filters.year_from is not None:
+            query = query.filter(PDFSource.year >= filters.year_from)
+        if filters.year_to is not None:
+            query = query.filter(PDFSource.year <= filters.year_to)
+        
+        return [row.vector_db_id for row in query.distinct().all()]
+    
+    @staticmethod
+    def _parse_year(value: Any) -> Optional[int]:
+        """将提取到的年份转换为整数"""
+        try:
+            return int(str(value)[:4])
+        except (TypeError, ValueError):
+            return None
+    
+    @staticmethod
+    def _chunk_year(metadata: Dict[str, Any]) -> Optional[int]:
+        """获取分块的数值年份，没有year_num时解析原始年份"""
+        year_num = metadata.get("year_num")
+        if year_num is not None:
+            return year_num
+        return PDFService._parse_year(metadata.get("year"))
+    
+    @staticmethod
+    def _year_in_range(year: Optional[int], filters: PDFSearchFilters) -> bool:
+        """年份是否满足过滤条件，无年份条件时总是满足"""
+        if filters.year_from is None and filters.year_to is None:
+            return True
+        if year is None:
+            return False
+        if filters.year_from is not None and year < filters.year_from:
+            return False
+        if filters.year_to is not None and year > filters.year_to:
+            return False
+        return True
+    
+    @staticmethod
+    def _sanitize_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """向量库元数据只支持标量值，将列表拼接为字符串"""
+        sanitized = {}
+        for key, value in metadata.items():
+            if isinstance(value, (list, tuple)):
+                sanitized[key] = "; ".join(str(v) for v in value)
+            elif value is None or isinstance(value, (str, int, float, bool)):
+                if value is not None:
+                    sanitized[key] = value
+            else:
+                sanitized[key] = str(value)
+        return sanitized
+    
+    @staticmethod
+    def _legacy_store_ids(pdf_ids: Optional[List[str]]) -> List[str]:
+        """查找尚未迁移到共享集合的旧版独立向量库（供迁移和维护脚本使用，检索只读取共享集合）"""
+        def pending(pdf_id: str) -> bool:
+            path = os.path.join(PDFService.VECTOR_DIR, f"pdf_{pdf_id}")
+            return os.path.isdir(path) and not os.path.exists(os.path.join(path, PDFService.LEGACY_MIGRATED_MARKER))
+        
+        if pdf_ids is None:
+            pdf_ids = [
+                entry.name[len("pdf_"):]
+                for entry in os.scandir(PDFService.VECTOR_DIR)
+                if entry.is_dir() and entry.name.startswith("pdf_")
+            ]
+        return [pdf_id for pdf_id in pdf_ids if pending(pdf_id)]
+    
     @staticmethod
     async def convert_pdf_search_to_citation(search_result: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -344,8 +1059,10 @@ class PDFService:
         metadata = search_result.get("metadata", {})
         content = search_result.get("content", "")
         
-        # 处理作者信息
+        # 处理作者信息（向量库中的作者列表以分号拼接存储）
         authors = metadata.get("authors", [])
+        if isinstance(authors, str):
+            authors = [a.strip() for a in authors.split(";") if a.strip()]
         if not authors and metadata.get("author"):
             # 尝试分割author字段
             author_text = metadata["author"]
@@ -0,0 +1,194 @@
+import time
+import heapq
+import asyncio
+import itertools
+import logging
+from enum import IntEnum
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import List, Optional
+
+from app.core.config import get_settings
+from app.core.metrics import Metrics
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+Metrics.describe("rate_limiter_wait_seconds", "请求在上游限流队列中的等待时间")
+Metrics.describe("rate_limiter_rejected_total", "排队超过最长等待时间而被拒绝的请求数")
+Metrics.describe("rate_limiter_backoff_total", "上游返回Retry-After后暂停发送的次数")
+
+
+class Priority(IntEnum):
+    """请求优先级，数值越小越先获得令牌"""
+    INTERACTIVE = 0  # 用户正在等待的搜索
+    BATCH = 1  # 批量解析、导入等后台任务
+
+
+class RateLimitExceeded(Exception):
+    """在最长等待时间内未获得发送许可"""
+
+    def __init__(self, name: str, waited: float):
+        super().__init__(f"{name} 限流排队超过 {waited:.1f}s")
+        self.name = name
+        self.waited = waited
+
+
+class TokenBucket:
+    """
+    按优先级排队的令牌桶
+
+    令牌以固定速率补充，请求在令牌不足时排队而不是立即失败；
+    队列按 (优先级, 到达顺序) 出队，交互式请求总是先于批量任务获得令牌。
+    上游返回 ``Retry-After`` 时调用 :meth:`backoff`，在此之前不再发放令牌。
+    """
+
+    def __init__(self, name: str, rate: float, burst: int,
+                 max_wait: float, batch_max_wait: float):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self.batch_max_wait = batch_max_wait
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._waiters: List[list] = []
+        self._counter = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _bind_loop(self) -> None:
+        """事件循环变化时（如命令行脚本多次asyncio.run）丢弃旧循环上的等待者"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._waiters = []
+            self._timer = None
+
+    def has_capacity(self) -> bool:
+        """当前是否有空闲令牌且无人排队，用于决定是否值得发起额外的对冲请求"""
+        self._refill()
+        return not self._waiters and self._tokens >= 1 and time.monotonic() >= self._blocked_until
+
+    def _dispatch(self) -> None:
+        """按优先级向排队的请求发放令牌，并安排下一次发放"""
+        self._timer = None
+        self._refill()
+        now = time.monotonic()
+        while self._waiters and now >= self._blocked_until and self._tokens >= 1:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():  # 已超时放弃
+                continue
+            self._tokens -= 1
+            future.set_result(None)
+
+        # 清理队首已放弃的等待者
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)
+
+        if self._waiters:
+            delay = max(self._blocked_until - now, (1 - self._tokens) / self.rate, 0)
+            self._timer = self._loop.call_later(delay, self._dispatch)
+
+    async def acquire(self, priority: Priority = Priority.INTERACTIVE,
+                      max_wait: Optional[float] = None) -> None:
+        """
+        获取一次发送许可，令牌不足时排队等待
+
+        Args:
+            priority: 请求优先级
+            max_wait: 最长等待时间（秒），默认按优先级取配置值
+
+        Raises:
+            RateLimitExceeded: 超过最长等待时间仍未获得令牌
+        """
+        self._bind_loop()
+        if max_wait is None:
+            max_wait = self.max_wait if priority == Priority.INTERACTIVE else self.batch_max_wait
+
+        # 上游要求的暂停时间超过可等待时间时直接失败，不占用队列
+        blocked_for = self._blocked_until - time.monotonic()
+        if blocked_for > max_wait:
+            Metrics.inc("rate_limiter_rejected_total", upstream=self.name, priority=priority.name.lower())
+            raise RateLimitExceeded(self.name, blocked_for)
+
+        started = time.monotonic()
+        future = self._loop.create_future()
+        heapq.heappush(self._waiters, [int(priority), next(self._counter), future])
+        if self._timer is None:
+            self._dispatch()
+
+        try:
+            await asyncio.wait_for(future, timeout=max_wait)
+        except asyncio.TimeoutError:
+            Metrics.inc("rate_limiter_rejected_total", upstream=self.name, priority=priority.name.lower())
+            raise RateLimitExceeded(self.name, time.monotonic() - started)
+        finally:
+            Metrics.observe("rate_limiter_wait_seconds", time.monotonic() - started,
+                            upstream=self.name, priority=priority.name.lower())
+
+    def backoff(self, retry_after: Optional[float]) -> None:
+        """
+        上游返回限流响应后暂停发放令牌
+
+        Args:
+            retry_after: 上游建议的等待秒数，缺失时按一个令牌的补充间隔退避
+        """
+        delay = retry_after if retry_after is not None else max(1.0, 1 / self.rate)
+        self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+        self._tokens = 0
+        Metrics.inc("rate_limiter_backoff_total", upstream=self.name)
+        logger.warning(f"{self.name} 返回限流响应，暂停 {delay:.1f}s")
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    解析Retry-After响应头，支持秒数和HTTP日期两种格式
+
+    Returns:
+        Optional[float]: 需要等待的秒数，无法解析时返回None
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+@lru_cache()
+def get_rate_limiter(name: str) -> TokenBucket:
+    """
+    获取指定上游的令牌桶（进程内共享）
+
+    令牌桶只在当前进程内计数，多个worker进程不共享令牌；配置的速率是整个部署的总速率，
+    按RATE_LIMIT_WORKERS均分到每个进程，未设置时N个worker合计会以N倍的速率请求上游
+    """
+    limits = {
+        "crossref": (settings.CROSSREF_RATE_LIMIT, settings.CROSSREF_RATE_BURST),
+        "semantic_scholar": (settings.SEMANTIC_SCHOLAR_RATE_LIMIT, settings.SEMANTIC_SCHOLAR_RATE_BURST),
+    }
+    rate, burst = limits.get(name, (settings.UPSTREAM_RATE_LIMIT, settings.UPSTREAM_RATE_BURST))
+    workers = max(1, settings.RATE_LIMIT_WORKERS)
+    return TokenBucket(
+        name,
+        rate=rate / workers,
+        burst=max(1, burst // workers),
+        max_wait=settings.RATE_LIMIT_MAX_WAIT,
+        batch_max_wait=settings.RATE_LIMIT_BATCH_MAX_WAIT
+    )
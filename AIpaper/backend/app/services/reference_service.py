@@ -1,11 +1,46 @@
 import aiohttp
 import asyncio
-from typing import Dict, List, Optional, Any, Union
+import time
+import re
+import json
+import hashlib
+from typing import Dict, List, Optional, Any, Union, Callable, Awaitable, AsyncIterator
 from datetime import datetime
+from urllib.parse import quote
+from functools import lru_cache
 import logging
 from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.http_client import HTTPClient
+from app.core.metrics import Metrics
+from app.models.reference import Reference
+from app.services.cache_service import TTLCache, TieredCache, get_shared_cache_backend
+from app.services.citation_style_service import CitationStyleService
+from app.services.dedup_service import DedupIndex, DedupService
+from app.services.metadata_store_service import MetadataStoreService
+from app.services.rate_limiter import Priority, RateLimitExceeded, get_rate_limiter, parse_retry_after
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
+
+Metrics.describe("reference_upstream_requests_total", "引用搜索上游请求结果，按数据源和状态（ok/timeout/rate_limited/error）统计")
+Metrics.describe("reference_upstream_latency_seconds", "单次上游请求耗时")
+Metrics.describe("reference_hedged_requests_total", "因首个请求过慢或失败而发起的对冲请求次数")
+Metrics.describe("citation_memo_total", "临时引用格式化结果缓存的命中情况")
+Metrics.describe("reference_local_store_total", "本地元数据库查询结果，按操作（search/resolve）和是否命中统计")
+
+
+class UpstreamError(Exception):
+    """上游API返回非200状态码"""
+
+    def __init__(self, source: str, status: int, retry_after: Optional[float] = None):
+        super().__init__(f"{source} API返回错误: {status}")
+        self.source = source
+        self.status = status
+        self.retry_after = retry_after
+
 
 class CrossrefResponse(BaseModel):
     """Crossref API响应模型"""
@@ -36,10 +71,67 @@ class ReferenceService:
     """引用检索服务"""
     
     # Crossref API端点
-    CROSSREF_API_URL = "https://api.crossref.org/works"
+    CROSSREF_API_URL = settings.CROSSREF_API_URL.rstrip("/")
     
     # Semantic Scholar API端点
-    SEMANTIC_SCHOLAR_API_URL = "https://api.semanticscholar.org/v1/paper"
+    SEMANTIC_SCHOLAR_API_URL = settings.SEMANTIC_SCHOLAR_API_URL.rstrip("/")
+    
+    # 手写实现的引用样式，其余样式通过CSL渲染
+    BUILTIN_STYLES = ("apa", "mla", "chicago", "gb")
+    
+    # 在Reference模型上预先生成并保存的样式及对应字段
+    MATERIALIZED_STYLES = {
+        "apa": "apa_citation",
+        "mla": "mla_citation",
+        "chicago": "chicago_citation",
+    }
+    
+    # 格式化规则版本，修改内置格式化函数后递增，已保存的格式化引用会在读取时重新生成
+    CITATION_FORMAT_VERSION = 1
+    
+    # 临时引用（未保存到数据库）的格式化结果缓存
+    _citation_memo = TTLCache(maxsize=settings.CITATION_MEMO_SIZE, ttl=24 * 3600)
+    
+    # 内置格式化函数输出的斜体标记
+    _MARKUP_PATTERN = re.compile(r"</?i>")
+    
+    # 从引用字符串中提取DOI
+    DOI_PATTERN = re.compile(r"10\.\d{4,9}/[^\s\"<>]+", re.IGNORECASE)
+    
+    # 批量解析DOI时单次Crossref请求包含的DOI数量（受URL长度限制）
+    CROSSREF_DOI_BATCH_SIZE = 20
+    
+    # 写入本地元数据库的后台任务，保留引用避免被垃圾回收
+    _background_tasks: set = set()
+    
+    @staticmethod
+    def extract_doi(text: str) -> Optional[str]:
+        """
+        从引用字符串中提取DOI，去除末尾的标点
+        
+        右括号只有在DOI中没有与之配对的左括号时才视为外层标点，
+        以保留 ``10.1002/(SICI)...`` 这类本身含括号的DOI
+        
+        Args:
+            text: 引用字符串
+            
+        Returns:
+            Optional[str]: DOI，未找到时返回None
+        """
+        match = ReferenceService.DOI_PATTERN.search(text)
+        if not match:
+            return None
+        doi = match.group(0)
+        while doi:
+            if doi[-1] in ".,;":
+                doi = doi[:-1]
+            elif doi[-1] == ")" and doi.count(")") > doi.count("("):
+                doi = doi[:-1]
+            elif doi[-1] == "]" and doi.count("]") > doi.count("["):
+                doi = doi[:-1]
+            else:
+                break
+        return doi or None
     
     @staticmethod
     async def search_crossref(query: str, limit: int = 5) -> List[Dict[str, Any]]:
@@ -53,69 +145,109 @@ class ReferenceService:
         Returns:
             List[Dict[str, Any]]: 格式化的引用信息列表
         """
+        try:
+            return await ReferenceService._query_crossref(query, limit)
+        except Exception as e:
+            logger.error(f"搜索Crossref时出错: {e}")
+            return []
+    
+    @staticmethod
+    async def _get_json(source: str, url: str, params: Dict[str, Any],
+                        priority: Priority = Priority.INTERACTIVE,
+                        headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        经上游限流器发送GET请求
+        
+        令牌不足时排队等待；上游返回429时按Retry-After暂停该上游的所有请求，
+        并在可等待时间内重试一次
+        
+        Args:
+            source: 数据源名称（对应限流器）
+            url: 请求地址
+            params: 查询参数
+            priority: 请求优先级
+            headers: 额外请求头
+            
+        Returns:
+            Dict[str, Any]: 响应JSON
+            
+        Raises:
+            UpstreamError: 上游返回非200状态码
+            RateLimitExceeded: 排队超过最长等待时间
+        """
+        limiter = get_rate_limiter(source)
+        session = HTTPClient.get_session()
+        last_error = None
+        for _ in range(2):
+            await limiter.acquire(priority)
+            async with session.get(url, params=params, headers=headers) as response:
+                if response.status == 429:
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    limiter.backoff(retry_after)
+                    last_error = UpstreamError(source, response.status, retry_after)
+                    continue
+                if response.status != 200:
+                    raise UpstreamError(source, response.status)
+                return await response.json()
+        raise last_error
+    
+    @staticmethod
+    async def _query_crossref(query: str, limit: int = 5,
+                              priority: Priority = Priority.INTERACTIVE) -> List[Dict[str, Any]]:
+        """请求Crossref搜索接口，出错时抛出异常"""
         params = {
             "query": query,
             "rows": limit,
             "select": "DOI,title,author,publisher,type,issued,container-title,volume,issue,page,URL"
         }
+        # 携带联系邮箱的请求进入Crossref的polite pool，限流更宽松
+        if settings.CROSSREF_MAILTO:
+            params["mailto"] = settings.CROSSREF_MAILTO
         
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(ReferenceService.CROSSREF_API_URL, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        items = data.get("message", {}).get("items", [])
-                        
-                        formatted_results = []
-                        for item in items:
-                            # 格式化日期
-                            published_date = None
-                            if item.get("issued") and item["issued"].get("date-parts") and item["issued"]["date-parts"][0]:
-                                date_parts = item["issued"]["date-parts"][0]
-                                if len(date_parts) >= 1:
-                                    year = date_parts[0]
-                                    month = date_parts[1] if len(date_parts) >= 2 else 1
-                                    day = date_parts[2] if len(date_parts) >= 3 else 1
-                                    published_date = f"{year}-{month:02d}-{day:02d}"
-                            
-                            # 格式化作者
-                            authors = []
-                            if item.get("author"):
-                                for author in item["author"]:
-                                    name = ""
-                                    if author.get("family") and author.get("given"):
-                                        name = f"{author['family']}, {author['given']}"
-                                    elif author.get("family"):
-                                        name = author["family"]
-                                    
-                                    if name:
-                                        authors.append(name)
-                            
-                            # 构建引用信息
-                            reference = {
-                                "doi": item.get("DOI", ""),
-                                "title": item.get("title", [""])[0] if item.get("title") else "",
-                                "authors": authors,
-                                "publisher": item.get("publisher", ""),
-                                "published_date": published_date,
-                                "journal": item.get("container-title", [""])[0] if item.get("container-title") else "",
-                                "volume": item.get("volume", ""),
-                                "issue": item.get("issue", ""),
-                                "pages": item.get("page", ""),
-                                "url": item.get("URL", ""),
-                                "source": "crossref"
-                            }
-                            
-                            formatted_results.append(reference)
-                            
-                        return formatted_results
-                    else:
-                        logger.error(f"Crossref API返回错误: {response.status}")
-                        return []
-            
-            except Exception as e:
-                logger.error(f"搜索Crossref时出错: {e}")
-                return []
+        data = await ReferenceService._get_json("crossref", ReferenceService.CROSSREF_API_URL, params, priority)
+        items = data.get("message", {}).get("items", [])
+        return [ReferenceService._format_crossref_item(item) for item in items]
+    
+    @staticmethod
+    def _format_crossref_item(item: Dict[str, Any]) -> Dict[str, Any]:
+        """将Crossref条目转换为统一的引用信息格式"""
+        # 格式化日期
+        published_date = None
+        if item.get("issued") and item["issued"].get("date-parts") and item["issued"]["date-parts"][0]:
+            date_parts = item["issued"]["date-parts"][0]
+            if len(date_parts) >= 1:
+                year = date_parts[0]
+                month = date_parts[1] if len(date_parts) >= 2 else 1
+                day = date_parts[2] if len(date_parts) >= 3 else 1
+                published_date = f"{year}-{month:02d}-{day:02d}"
+        
+        # 格式化作者
+        authors = []
+        if item.get("author"):
+            for author in item["author"]:
+                name = ""
+                if author.get("family") and author.get("given"):
+                    name = f"{author['family']}, {author['given']}"
+                elif author.get("family"):
+                    name = author["family"]
+                
+                if name:
+                    authors.append(name)
+        
+        # 构建引用信息
+        return {
+            "doi": item.get("DOI", ""),
+            "title": item.get("title", [""])[0] if item.get("title") else "",
+            "authors": authors,
+            "publisher": item.get("publisher", ""),
+            "published_date": published_date,
+            "journal": item.get("container-title", [""])[0] if item.get("container-title") else "",
+            "volume": item.get("volume", ""),
+            "issue": item.get("issue", ""),
+            "pages": item.get("page", ""),
+            "url": item.get("URL", ""),
+            "source": "crossref"
+        }
     
     @staticmethod
     async def search_semantic_scholar(query: str, limit: int = 5) -> List[Dict[str, Any]]:
@@ -129,8 +261,18 @@ class ReferenceService:
         Returns:
             List[Dict[str, Any]]: 格式化的引用信息列表
         """
+        try:
+            return await ReferenceService._query_semantic_scholar(query, limit)
+        except Exception as e:
+            logger.error(f"搜索Semantic Scholar时出错: {e}")
+            return []
+    
+    @staticmethod
+    async def _query_semantic_scholar(query: str, limit: int = 5,
+                                      priority: Priority = Priority.INTERACTIVE) -> List[Dict[str, Any]]:
+        """请求Semantic Scholar搜索接口，出错时抛出异常"""
         # Semantic Scholar搜索API
-        SEARCH_API_URL = "https://api.semanticscholar.org/graph/v1/paper/search"
+        SEARCH_API_URL = f"{ReferenceService.SEMANTIC_SCHOLAR_API_URL}/paper/search"
         
         params = {
             "query": query,
@@ -138,90 +280,556 @@ class ReferenceService:
             "fields": "paperId,title,authors,venue,year,abstract,url,citationCount"
         }
         
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(SEARCH_API_URL, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        items = data.get("data", [])
-                        
-                        formatted_results = []
-                        for item in items:
-                            # 格式化作者
-                            authors = []
-                            if item.get("authors"):
-                                for author in item["authors"]:
-                                    if author.get("name"):
-                                        # 尝试分割姓名为姓和名
-                                        name_parts = author["name"].split()
-                                        if len(name_parts) > 1:
-                                            family = name_parts[-1]
-                                            given = " ".join(name_parts[:-1])
-                                            authors.append(f"{family}, {given}")
-                                        else:
-                                            authors.append(author["name"])
-                            
-                            # 构建引用信息
-                            reference = {
-                                "doi": "",  # S2 API不直接提供DOI
-                                "title": item.get("title", ""),
-                                "authors": authors,
-                                "publisher": "",  # S2 API不直接提供publisher
-                                "published_date": f"{item.get('year', '')}-01-01" if item.get("year") else None,
-                                "journal": item.get("venue", ""),
-                                "volume": "",  # S2 API不直接提供volume
-                                "issue": "",  # S2 API不直接提供issue
-                                "pages": "",  # S2 API不直接提供pages
-                                "url": item.get("url", ""),
-                                "abstract": item.get("abstract", ""),
-                                "citation_count": item.get("citationCount", 0),
-                                "source": "semantic_scholar"
-                            }
-                            
-                            formatted_results.append(reference)
-                            
-                        return formatted_results
+        headers = {"x-api-key": settings.SEMANTIC_SCHOLAR_API_KEY} if settings.SEMANTIC_SCHOLAR_API_KEY else None
+        
+        data = await ReferenceService._get_json("semantic_scholar", SEARCH_API_URL, params, priority, headers)
+        items = data.get("data", [])
+        return [ReferenceService._format_semantic_scholar_item(item) for item in items]
+    
+    @staticmethod
+    def _format_semantic_scholar_item(item: Dict[str, Any]) -> Dict[str, Any]:
+        """将Semantic Scholar条目转换为统一的引用信息格式"""
+        # 格式化作者
+        authors = []
+        if item.get("authors"):
+            for author in item["authors"]:
+                if author.get("name"):
+                    # 尝试分割姓名为姓和名
+                    name_parts = author["name"].split()
+                    if len(name_parts) > 1:
+                        family = name_parts[-1]
+                        given = " ".join(name_parts[:-1])
+                        authors.append(f"{family}, {given}")
                     else:
-                        logger.error(f"Semantic Scholar API返回错误: {response.status}")
-                        return []
+                        authors.append(author["name"])
+        
+        # 构建引用信息
+        return {
+            "doi": "",  # S2 API不直接提供DOI
+            "title": item.get("title", ""),
+            "authors": authors,
+            "publisher": "",  # S2 API不直接提供publisher
+            "published_date": f"{item.get('year', '')}-01-01" if item.get("year") else None,
+            "journal": item.get("venue", ""),
+            "volume": "",  # S2 API不直接提供volume
+            "issue": "",  # S2 API不直接提供issue
+            "pages": "",  # S2 API不直接提供pages
+            "url": item.get("url", ""),
+            "abstract": item.get("abstract", ""),
+            "citation_count": item.get("citationCount", 0),
+            "source": "semantic_scholar"
+        }
+    
+    @staticmethod
+    @lru_cache()
+    def get_search_cache() -> TieredCache:
+        """获取引用搜索结果缓存"""
+        return TieredCache(
+            "reference_search",
+            maxsize=settings.REFERENCE_CACHE_SIZE,
+            ttl=settings.REFERENCE_CACHE_TTL,
+            shared=get_shared_cache_backend()
+        )
+    
+    @staticmethod
+    async def search_references(query: str, limit: int = 5,
+                                budget: Optional[float] = None,
+                                priority: Priority = Priority.INTERACTIVE) -> Dict[str, Any]:
+        """
+        同时搜索Crossref和Semantic Scholar，返回合并结果
+        
+        先查询本地元数据库，本地结果已满足数量时不发起网络请求；否则本地结果与上游结果合并，
+        上游全部不可用时仍返回本地结果。在延迟预算内返回已经响应的数据源结果，超时或出错的数据源在sources中标明。
+        只有全部数据源成功的结果才会进入两级缓存，相同查询的并发请求只会发起一次上游调用
+        
+        Args:
+            query: 搜索关键词
+            limit: 每个源返回的结果数量
+            budget: 延迟预算（秒），默认使用REFERENCE_SEARCH_BUDGET
+            priority: 上游请求优先级，批量任务应使用Priority.BATCH
+            
+        Returns:
+            Dict[str, Any]: {"results": 合并的引用信息列表, "sources": 各数据源状态, "partial": 是否为部分结果}
+        """
+        cache_key = f"{' '.join(query.lower().split())}:{limit}"
+        return await ReferenceService.get_search_cache().get_or_load(
+            cache_key,
+            lambda: ReferenceService._search_local_first(query, limit, budget, priority),
+            # 部分结果不缓存，下次请求重新尝试超时或出错的数据源
+            should_cache=lambda response: not response["partial"] and len(response["results"]) > 0
+        )
+    
+    @staticmethod
+    async def _search_local_first(query: str, limit: int = 5,
+                                  budget: Optional[float] = None,
+                                  priority: Priority = Priority.INTERACTIVE) -> Dict[str, Any]:
+        """先查本地元数据库，不足时再查询上游并合并"""
+        local_results = await asyncio.to_thread(MetadataStoreService.search, query, limit)
+        Metrics.inc("reference_local_store_total", operation="search",
+                    result="hit" if len(local_results) >= limit else "miss")
+        if len(local_results) >= limit:
+            return {"results": local_results, "sources": {"local": "ok"}, "partial": False}
+        
+        response = await ReferenceService._search_upstream(query, limit, budget, priority)
+        
+        # 补充上游未返回的本地结果
+        response["results"] = DedupService.dedup(response["results"] + local_results)
+        response["sources"] = {"local": "ok", **response["sources"]}
+        return response
+    
+    @staticmethod
+    def _remember(references: List[Dict[str, Any]]) -> None:
+        """在后台将上游结果写入本地元数据库，不阻塞响应"""
+        if not references:
+            return
+        task = asyncio.ensure_future(asyncio.to_thread(MetadataStoreService.upsert, references))
+        ReferenceService._background_tasks.add(task)
+        task.add_done_callback(ReferenceService._background_tasks.discard)
+    
+    @staticmethod
+    async def resolve_doi(doi: str, priority: Priority = Priority.INTERACTIVE) -> Optional[Dict[str, Any]]:
+        """
+        按DOI解析文献元数据，优先读取本地元数据库
+        
+        Args:
+            doi: DOI（可带doi.org前缀）
+            priority: 上游请求优先级
+            
+        Returns:
+            Optional[Dict[str, Any]]: 格式化的引用信息，DOI不存在时返回None
+            
+        Raises:
+            UpstreamError: Crossref返回除404以外的错误
+            RateLimitExceeded: 限流排队超时
+        """
+        normalized = MetadataStoreService.normalize_doi(doi)
+        if not normalized:
+            return None
+        
+        reference = await asyncio.to_thread(MetadataStoreService.get_by_doi, normalized)
+        Metrics.inc("reference_local_store_total", operation="resolve",
+                    result="hit" if reference else "miss")
+        if reference:
+            return reference
+        
+        params = {"mailto": settings.CROSSREF_MAILTO} if settings.CROSSREF_MAILTO else {}
+        try:
+            data = await ReferenceService._get_json(
+                "crossref", f"{ReferenceService.CROSSREF_API_URL}/{quote(normalized, safe='/')}", params, priority
+            )
+        except UpstreamError as e:
+            if e.status == 404:
+                return None
+            raise
+        
+        reference = ReferenceService._format_crossref_item(data.get("message", {}))
+        ReferenceService._remember([reference])
+        return reference
+    
+    @staticmethod
+    async def resolve_dois(dois: List[str], priority: Priority = Priority.BATCH) -> Dict[str, Dict[str, Any]]:
+        """
+        批量按DOI解析文献元数据
+        
+        先一次性查询本地元数据库，其余DOI按CROSSREF_DOI_BATCH_SIZE个一组
+        通过Crossref的doi过滤条件查询，每组只发送一次上游请求
+        
+        Args:
+            dois: DOI列表
+            priority: 上游请求优先级
             
+        Returns:
+            Dict[str, Dict[str, Any]]: 规范化DOI -> 引用信息，未解析到的DOI不包含在内
+        """
+        normalized = list(dict.fromkeys(
+            doi for doi in (MetadataStoreService.normalize_doi(d) for d in dois) if doi
+        ))
+        if not normalized:
+            return {}
+        
+        resolved = await asyncio.to_thread(MetadataStoreService.get_by_dois, normalized)
+        Metrics.inc("reference_local_store_total", len(resolved), operation="resolve", result="hit")
+        Metrics.inc("reference_local_store_total", len(normalized) - len(resolved), operation="resolve", result="miss")
+        
+        # 含逗号的DOI无法放入过滤条件，单独解析
+        missing = [doi for doi in normalized if doi not in resolved]
+        single = [doi for doi in missing if "," in doi]
+        batched = [doi for doi in missing if "," not in doi]
+        
+        async def query_batch(batch: List[str]) -> List[Dict[str, Any]]:
+            params = {
+                "filter": ",".join(f"doi:{doi}" for doi in batch),
+                "rows": len(batch)
+            }
+            if settings.CROSSREF_MAILTO:
+                params["mailto"] = settings.CROSSREF_MAILTO
+            try:
+                data = await ReferenceService._get_json("crossref", ReferenceService.CROSSREF_API_URL, params, priority)
+            except Exception as e:
+                logger.error(f"批量解析DOI时出错: {e}")
+                return []
+            references = [ReferenceService._format_crossref_item(item) for item in data.get("message", {}).get("items", [])]
+            ReferenceService._remember(references)
+            return references
+        
+        async def query_single(doi: str) -> List[Dict[str, Any]]:
+            try:
+                reference = await ReferenceService.resolve_doi(doi, priority)
             except Exception as e:
-                logger.error(f"搜索Semantic Scholar时出错: {e}")
+                logger.error(f"解析DOI {doi} 时出错: {e}")
                 return []
+            return [reference] if reference else []
+        
+        size = ReferenceService.CROSSREF_DOI_BATCH_SIZE
+        results = await asyncio.gather(
+            *(query_batch(batched[i:i + size]) for i in range(0, len(batched), size)),
+            *(query_single(doi) for doi in single)
+        )
+        for reference in (reference for batch in results for reference in batch):
+            doi = MetadataStoreService.normalize_doi(reference.get("doi"))
+            if doi in missing:
+                resolved[doi] = reference
+        return resolved
+    
+    @staticmethod
+    @lru_cache()
+    def get_resolve_cache() -> TieredCache:
+        """获取引用字符串解析结果缓存"""
+        return TieredCache(
+            "reference_resolve",
+            maxsize=settings.REFERENCE_CACHE_SIZE,
+            ttl=settings.REFERENCE_CACHE_TTL,
+            shared=get_shared_cache_backend()
+        )
     
     @staticmethod
-    async def search_references(query: str, limit: int = 5) -> List[Dict[str, Any]]:
+    async def resolve_citation(citation: str, priority: Priority = Priority.BATCH) -> Optional[Dict[str, Any]]:
         """
-        同时搜索Crossref和Semantic Scholar，返回合并结果
+        解析一条引用字符串
+        
+        字符串中包含DOI时按DOI解析；否则使用Crossref的bibliographic查询取最佳匹配，
+        结果经两级缓存并写入本地元数据库
+        
+        Args:
+            citation: DOI或完整的引用字符串
+            priority: 上游请求优先级
+            
+        Returns:
+            Optional[Dict[str, Any]]: 格式化的引用信息，无法解析时返回None
+        """
+        doi = ReferenceService.extract_doi(citation)
+        if doi:
+            return await ReferenceService.resolve_doi(doi, priority)
+        
+        async def query_bibliographic() -> Dict[str, Any]:
+            params = {
+                "query.bibliographic": citation,
+                "rows": 1,
+                "select": "DOI,title,author,publisher,type,issued,container-title,volume,issue,page,URL"
+            }
+            if settings.CROSSREF_MAILTO:
+                params["mailto"] = settings.CROSSREF_MAILTO
+            data = await ReferenceService._get_json("crossref", ReferenceService.CROSSREF_API_URL, params, priority)
+            items = data.get("message", {}).get("items", [])
+            if not items:
+                return {}
+            reference = ReferenceService._format_crossref_item(items[0])
+            ReferenceService._remember([reference])
+            return reference
+        
+        cache_key = " ".join(citation.lower().split())
+        # 未匹配到时缓存空字典，避免重复查询
+        reference = await ReferenceService.get_resolve_cache().get_or_load(cache_key, query_bibliographic)
+        return reference or None
+    
+    @staticmethod
+    async def resolve_many(items: List[str], concurrency: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        并发解析一批DOI或引用字符串，按完成顺序逐条产出结果
+        
+        并发数受限，上游请求以批量优先级经限流器发送，不影响交互式搜索；
+        相同的输入只解析一次
+        
+        Args:
+            items: DOI或引用字符串列表
+            concurrency: 最大并发数，默认使用REFERENCE_RESOLVE_CONCURRENCY
+            
+        Returns:
+            AsyncIterator[Dict[str, Any]]: {"index", "input", "status", "reference"}，
+            status为 resolved、not_found、rate_limited、error 或 invalid
+        """
+        semaphore = asyncio.Semaphore(concurrency or settings.REFERENCE_RESOLVE_CONCURRENCY)
+        unique: Dict[str, asyncio.Future] = {}
+        
+        async def resolve(citation: str) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    reference = await ReferenceService.resolve_citation(citation)
+                except (RateLimitExceeded, UpstreamError) as e:
+                    status = "rate_limited" if isinstance(e, RateLimitExceeded) or e.status == 429 else "error"
+                    return {"status": status, "reference": None, "error": str(e)}
+                except Exception as e:
+                    logger.error(f"解析引用时出错: {e}")
+                    return {"status": "error", "reference": None, "error": str(e)}
+            return {"status": "resolved" if reference else "not_found", "reference": reference}
+        
+        async def run(index: int, citation: str) -> Dict[str, Any]:
+            citation = (citation or "").strip()
+            if not citation:
+                return {"index": index, "input": citation, "status": "invalid", "reference": None}
+            key = " ".join(citation.lower().split())
+            if key not in unique:
+                unique[key] = asyncio.ensure_future(resolve(citation))
+            result = await asyncio.shield(unique[key])
+            return {"index": index, "input": citation, **result}
+        
+        tasks = [asyncio.ensure_future(run(index, item)) for index, item in enumerate(items)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # 客户端断开时取消尚未完成的解析
+            for task in list(tasks) + list(unique.values()):
+                task.cancel()
+    
+    @staticmethod
+    def _start_providers(query: str, limit: int,
+                         priority: Priority = Priority.INTERACTIVE) -> Dict[asyncio.Future, str]:
+        """并行发起各数据源的带对冲查询，返回 {任务: 数据源名称}"""
+        providers = {
+            "crossref": ReferenceService._query_crossref,
+            "semantic_scholar": ReferenceService._query_semantic_scholar,
+        }
+        return {
+            asyncio.ensure_future(ReferenceService._hedged_query(source, query_func, query, limit, priority)): source
+            for source, query_func in providers.items()
+        }
+    
+    @staticmethod
+    def _provider_status(task: Optional[asyncio.Future], source: str, budget: float) -> str:
+        """
+        判定数据源查询结果状态并记录指标
+        
+        Args:
+            task: 查询任务，预算内未完成时传None
+            source: 数据源名称
+            budget: 延迟预算（秒），用于日志
+            
+        Returns:
+            str: ok、timeout、rate_limited 或 error
+        """
+        if task is None:
+            status = "timeout"
+            logger.warning(f"{source} 未在 {budget}s 预算内返回，已跳过")
+        elif isinstance(task.exception(), RateLimitExceeded) or (
+                isinstance(task.exception(), UpstreamError) and task.exception().status == 429):
+            status = "rate_limited"
+            logger.warning(f"{source} 限流中，已跳过: {task.exception()}")
+        elif task.exception() is not None:
+            status = "error"
+            logger.error(f"搜索{source}时出错: {task.exception()}")
+        else:
+            status = "ok"
+        Metrics.inc("reference_upstream_requests_total", source=source, status=status)
+        return status
+    
+    @staticmethod
+    async def _search_upstream(query: str, limit: int = 5,
+                               budget: Optional[float] = None,
+                               priority: Priority = Priority.INTERACTIVE) -> Dict[str, Any]:
+        """在延迟预算内并行查询各数据源并去重合并"""
+        if budget is None:
+            budget = settings.REFERENCE_SEARCH_BUDGET
+        
+        tasks = ReferenceService._start_providers(query, limit, priority)
+        
+        # 预算耗尽时不再等待慢的数据源
+        done, pending = await asyncio.wait(tasks.keys(), timeout=budget)
+        for task in pending:
+            task.cancel()
+        
+        sources: Dict[str, str] = {}
+        results_by_source: Dict[str, List[Dict[str, Any]]] = {}
+        for task, source in tasks.items():
+            sources[source] = ReferenceService._provider_status(task if task in done else None, source, budget)
+            if sources[source] == "ok":
+                results_by_source[source] = task.result()
+        
+        # 合并结果并近似去重（优先保留Crossref的结果，缺失字段由其他来源补充）
+        all_results = results_by_source.get("crossref", []) + results_by_source.get("semantic_scholar", [])
+        ReferenceService._remember(all_results)
+        
+        return {
+            "results": DedupService.dedup(all_results),
+            "sources": sources,
+            "partial": any(status != "ok" for status in sources.values()),
+        }
+    
+    @staticmethod
+    async def stream_search(query: str, limit: int = 5,
+                            budget: Optional[float] = None,
+                            priority: Priority = Priority.INTERACTIVE) -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式搜索引用，每个数据源返回后立即产出其结果
+        
+        已产出的结果带有稳定的id；后到的数据源与已产出结果（近似）重复时，
+        与已产出条目合并后以相同id推送（updated），合并未带来变化的重复项被丢弃
         
         Args:
             query: 搜索关键词
             limit: 每个源返回的结果数量
+            budget: 延迟预算（秒），默认使用REFERENCE_SEARCH_BUDGET
+            priority: 上游请求优先级
             
         Returns:
-            List[Dict[str, Any]]: 合并的引用信息列表
+            AsyncIterator[Dict[str, Any]]: {"event": 事件类型, "data": 事件数据}，事件类型为
+            results（{"source", "added", "updated"}）、status（{"source", "status"}）和最后的 done
         """
-        # 并行执行两个API搜索
-        crossref_task = asyncio.create_task(ReferenceService.search_crossref(query, limit))
-        semantic_scholar_task = asyncio.create_task(ReferenceService.search_semantic_scholar(query, limit))
+        if budget is None:
+            budget = settings.REFERENCE_SEARCH_BUDGET
         
-        # 等待两个任务完成
-        crossref_results, semantic_scholar_results = await asyncio.gather(
-            crossref_task, 
-            semantic_scholar_task
-        )
+        cache = ReferenceService.get_search_cache()
+        cache_key = f"{' '.join(query.lower().split())}:{limit}"
+        cached = await cache.get(cache_key)
+        if cached is not None:
+            yield {"event": "results", "data": {
+                "source": "cache",
+                "added": [{"id": i, **result} for i, result in enumerate(cached["results"])],
+                "updated": []
+            }}
+            yield {"event": "done", "data": {
+                "sources": cached["sources"], "partial": False, "count": len(cached["results"])
+            }}
+            return
+        
+        index = DedupIndex()
+        ordered: List[Dict[str, Any]] = []
+        
+        def merge(source: str, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+            added_ids, updated_ids = [], []
+            for result in results:
+                fingerprint = DedupService.fingerprint(result)
+                item_id = index.find(fingerprint)
+                if item_id is None:
+                    item_id = len(ordered)
+                    ordered.append({**result, "id": item_id})
+                    added_ids.append(item_id)
+                else:
+                    item = {**DedupService.merge([ordered[item_id], result]), "id": item_id}
+                    if item != ordered[item_id]:
+                        ordered[item_id] = item
+                        if item_id not in added_ids and item_id not in updated_ids:
+                            updated_ids.append(item_id)
+                index.add(item_id, fingerprint)
+            return {
+                "source": source,
+                "added": [ordered[i] for i in added_ids],
+                "updated": [ordered[i] for i in updated_ids]
+            }
+        
+        local_results = await asyncio.to_thread(MetadataStoreService.search, query, limit)
+        Metrics.inc("reference_local_store_total", operation="search",
+                    result="hit" if len(local_results) >= limit else "miss")
+        sources = {"local": "ok"}
+        if local_results:
+            yield {"event": "results", "data": merge("local", local_results)}
+        
+        if len(local_results) < limit:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + budget
+            tasks = ReferenceService._start_providers(query, limit, priority)
+            pending = set(tasks)
+            try:
+                while pending and loop.time() < deadline:
+                    done, pending = await asyncio.wait(
+                        pending, timeout=deadline - loop.time(), return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        source = tasks[task]
+                        sources[source] = ReferenceService._provider_status(task, source, budget)
+                        yield {"event": "status", "data": {"source": source, "status": sources[source]}}
+                        if sources[source] == "ok":
+                            ReferenceService._remember(task.result())
+                            event = merge(source, task.result())
+                            if event["added"] or event["updated"]:
+                                yield {"event": "results", "data": event}
+                
+                for task in pending:
+                    source = tasks[task]
+                    sources[source] = ReferenceService._provider_status(None, source, budget)
+                    yield {"event": "status", "data": {"source": source, "status": sources[source]}}
+            finally:
+                # 预算耗尽或客户端断开时取消仍在进行的查询
+                for task in pending:
+                    task.cancel()
+        
+        partial = any(status != "ok" for status in sources.values())
+        results = [{k: v for k, v in item.items() if k != "id"} for item in ordered]
+        if not partial and results:
+            await cache.set(cache_key, {"results": results, "sources": sources, "partial": False})
+        yield {"event": "done", "data": {"sources": sources, "partial": partial, "count": len(results)}}
+    
+    @staticmethod
+    async def _hedged_query(source: str,
+                            query_func: Callable[..., Awaitable[List[Dict[str, Any]]]],
+                            query: str, limit: int,
+                            priority: Priority = Priority.INTERACTIVE) -> List[Dict[str, Any]]:
+        """
+        带对冲的上游查询
         
-        # 合并结果
-        all_results = crossref_results + semantic_scholar_results
+        首个请求在REFERENCE_HEDGE_DELAY内未返回（或因网络错误、5xx失败）时，
+        再发起一个相同的请求，取先成功的结果并取消另一个。
+        上游限流器没有空闲令牌时不对冲，避免额外请求加剧限流
         
-        # 根据标题去重（优先保留Crossref的结果）
-        unique_results = {}
-        for result in all_results:
-            title = result["title"].lower()
-            if title not in unique_results or result["source"] == "crossref":
-                unique_results[title] = result
+        Args:
+            source: 数据源名称
+            query_func: 查询函数，失败时抛出异常
+            query: 搜索关键词
+            limit: 返回结果数量限制
+            priority: 请求优先级
+            
+        Returns:
+            List[Dict[str, Any]]: 格式化的引用信息列表
+        """
+        async def attempt(hedged: bool) -> List[Dict[str, Any]]:
+            started = time.monotonic()
+            try:
+                return await query_func(query, limit, priority)
+            finally:
+                Metrics.observe("reference_upstream_latency_seconds", time.monotonic() - started,
+                                source=source, hedged=str(hedged).lower())
         
-        return list(unique_results.values())
+        pending = {asyncio.ensure_future(attempt(False))}
+        hedged = False
+        last_error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=None if hedged else settings.REFERENCE_HEDGE_DELAY,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    last_error = task.exception()
+                    # 4xx（如限流）重试无益，直接失败
+                    if isinstance(last_error, RateLimitExceeded) or (
+                            isinstance(last_error, UpstreamError) and last_error.status < 500):
+                        raise last_error
+                
+                if not hedged and not get_rate_limiter(source).has_capacity():
+                    # 没有空闲配额，只等待首个请求
+                    hedged = True
+                elif not hedged:
+                    hedged = True
+                    Metrics.inc("reference_hedged_requests_total", source=source)
+                    pending.add(asyncio.ensure_future(attempt(True)))
+            
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
     
     @staticmethod
     def format_citation(reference: Dict[str, Any], style: str = "apa") -> str:
@@ -230,20 +838,180 @@ class ReferenceService:
         
         Args:
             reference: 引用数据
-            style: 引用样式 ("apa", "mla", "chicago", "gb")
-            
+            style: 引用样式 ("apa", "mla", "chicago", "gb" 或CSL样式名称)
+        
         Returns:
             str: 格式化的引用字符串
         """
-        if style == "apa":
-            return ReferenceService._format_apa(reference)
-        elif style == "mla":
+        return ReferenceService.format_citations([reference], style)[0]
+    
+    @staticmethod
+    def _format_builtin(reference: Dict[str, Any], style: str) -> str:
+        """使用内置格式化函数，未知样式使用APA"""
+        if style == "mla":
             return ReferenceService._format_mla(reference)
+        elif style == "chicago":
+            return ReferenceService._format_chicago(reference)
         elif style == "gb":
             return ReferenceService._format_gb(reference)
         else:
             return ReferenceService._format_apa(reference)  # 默认APA格式
     
+    @staticmethod
+    def is_supported_style(style: str) -> bool:
+        """样式是否受支持（内置样式或可用的CSL样式）"""
+        return style in ReferenceService.BUILTIN_STYLES or CitationStyleService.has_style(style)
+    
+    @staticmethod
+    def format_citations(references: List[Dict[str, Any]], style: str = "apa",
+                         output: str = "text", sort: bool = False) -> List[str]:
+        """
+        批量格式化引用
+        
+        结果按 (样式, 输出格式, 引用内容) 缓存，重复格式化同一引用不再重新计算；
+        CSL样式的未命中条目共用一次样式准备，渲染失败时退回APA格式
+        
+        Args:
+            references: 引用数据列表
+            style: 引用样式
+            output: CSL样式的输出格式，"text" 或 "html"
+            sort: 是否按样式规则排序（仅CSL样式）
+        
+        Returns:
+            List[str]: 格式化的引用字符串
+        """
+        use_csl = style not in ReferenceService.BUILTIN_STYLES and CitationStyleService.has_style(style)
+        if use_csl and sort:
+            # 排序后的参考文献列表可能包含消歧后缀（如2020a），不按单条缓存
+            return ReferenceService._render_csl(references, style, output, sort=True)
+        
+        keys = [
+            f"{ReferenceService.CITATION_FORMAT_VERSION}:{style}:{output}:" + hashlib.sha1(
+                json.dumps(reference, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+            ).hexdigest()
+            for reference in references
+        ]
+        results = [ReferenceService._citation_memo.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        Metrics.inc("citation_memo_total", len(references) - len(missing), result="hit")
+        Metrics.inc("citation_memo_total", len(missing), result="miss")
+        if not missing:
+            return results
+        
+        if use_csl:
+            rendered = ReferenceService._render_csl([references[i] for i in missing], style, output)
+        else:
+            rendered = [ReferenceService._format_builtin(references[i], style) for i in missing]
+        for i, text in zip(missing, rendered):
+            results[i] = text
+            ReferenceService._citation_memo.set(keys[i], text)
+        return results
+    
+    @staticmethod
+    def _render_csl(references: List[Dict[str, Any]], style: str,
+                    output: str = "text", sort: bool = False) -> List[str]:
+        """使用CSL样式渲染，失败时退回APA格式"""
+        try:
+            return CitationStyleService.render(references, style, output=output, sort=sort)
+        except Exception as e:
+            logger.error(f"使用CSL样式 {style} 格式化引用时出错: {e}")
+            return [ReferenceService._format_apa(reference) for reference in references]
+    
+    @staticmethod
+    def reference_to_dict(reference: Reference) -> Dict[str, Any]:
+        """
+        将Reference记录转换为格式化函数使用的引用数据
+        
+        以原始引用数据为基础，数据库字段优先
+        """
+        data = dict(reference.raw_data) if isinstance(reference.raw_data, dict) else {}
+        
+        authors = reference.authors
+        if isinstance(authors, str):
+            try:
+                authors = json.loads(authors)
+            except ValueError:
+                authors = [a.strip() for a in authors.split(";") if a.strip()]
+        
+        data.update({
+            "title": reference.title or data.get("title") or "",
+            "authors": authors if authors is not None else data.get("authors", []),
+            "journal": reference.journal or data.get("journal", ""),
+            "doi": reference.doi or data.get("doi", ""),
+            "url": reference.url or data.get("url", ""),
+        })
+        if reference.year:
+            data["year"] = reference.year
+            if not str(data.get("published_date") or "").startswith(str(reference.year)):
+                data["published_date"] = f"{reference.year}-01-01"
+        return data
+    
+    @staticmethod
+    def materialize_citations(reference: Reference) -> None:
+        """生成并保存Reference记录的APA、MLA和Chicago格式引用"""
+        data = ReferenceService.reference_to_dict(reference)
+        for style, column in ReferenceService.MATERIALIZED_STYLES.items():
+            setattr(reference, column, ReferenceService._format_builtin(data, style))
+        reference.citations_version = ReferenceService.CITATION_FORMAT_VERSION
+    
+    @staticmethod
+    def document_bibliography(db: Session, document_id: int, style: str = "apa",
+                              output: str = "text") -> List[str]:
+        """
+        生成文档的参考文献列表
+        
+        APA、MLA和Chicago直接读取已保存的格式化引用（按document_id索引只读取一列），
+        缺失或格式化规则版本过旧的记录在此补齐；其他样式按记录现场格式化
+        
+        Args:
+            db: 数据库会话
+            document_id: 文档ID
+            style: 引用样式
+            output: 输出格式，text为纯文本，html保留斜体标记
+        
+        Returns:
+            List[str]: 参考文献条目
+        """
+        column_name = ReferenceService.MATERIALIZED_STYLES.get(style)
+        if column_name is None:
+            references = db.query(Reference).filter(
+                Reference.document_id == document_id,
+                Reference.pdf_source_id.is_(None)
+            ).order_by(Reference.id).all()
+            entries = ReferenceService.format_citations(
+                [ReferenceService.reference_to_dict(reference) for reference in references],
+                style, output=output, sort=True
+            )
+            # 内置样式（及CSL渲染失败时退回的APA格式）总是带斜体标记
+            if output == "text":
+                entries = [ReferenceService.strip_markup(entry) for entry in entries]
+            return entries
+        
+        column = getattr(Reference, column_name)
+        rows = (
+            db.query(Reference.id, column, Reference.citations_version)
+            .filter(Reference.document_id == document_id, Reference.pdf_source_id.is_(None))
+            .all()
+        )
+        entries = {row[0]: row[1] for row in rows}
+        stale_ids = [row[0] for row in rows if row[1] is None or row[2] != ReferenceService.CITATION_FORMAT_VERSION]
+        if stale_ids:
+            for reference in db.query(Reference).filter(Reference.id.in_(stale_ids)):
+                ReferenceService.materialize_citations(reference)
+                entries[reference.id] = getattr(reference, column_name)
+            db.commit()
+        
+        # 已保存的格式化引用带斜体标记，纯文本输出时去除；按作者字母顺序排列，忽略标记
+        plain = {entry_id: ReferenceService.strip_markup(entry) for entry_id, entry in entries.items()}
+        if output == "text":
+            return sorted(plain.values(), key=str.lower)
+        return [entries[entry_id] for entry_id in sorted(entries, key=lambda entry_id: plain[entry_id].lower())]
+    
+    @staticmethod
+    def strip_markup(entry: str) -> str:
+        """去除内置格式化函数添加的斜体标记"""
+        return ReferenceService._MARKUP_PATTERN.sub("", entry)
+    
     @staticmethod
     def _format_apa(reference: Dict[str, Any]) -> str:
         """APA格式化"""
@@ -365,6 +1133,63 @@ class ReferenceService:
         
         return citation
     
+    @staticmethod
+    def _format_chicago(reference: Dict[str, Any]) -> str:
+        """Chicago格式化（作者-日期体系）"""
+        # 作者
+        author_text = ""
+        if reference.get("authors"):
+            authors = reference["authors"]
+            if len(authors) == 1:
+                author_text = authors[0]
+            elif len(authors) == 2:
+                author_text = f"{authors[0]} and {authors[1]}"
+            elif len(authors) == 3:
+                author_text = f"{authors[0]}, {authors[1]}, and {authors[2]}"
+            elif len(authors) > 3:
+                author_text = f"{authors[0]} et al."
+        
+        # 年份
+        year = ""
+        if reference.get("published_date"):
+            year = str(reference["published_date"])[:4]
+        elif reference.get("year"):
+            year = str(reference["year"])[:4]
+        
+        # 标题
+        title = f"\"{reference['title']}.\"" if reference.get("title") else ""
+        
+        # 期刊
+        journal = reference.get("journal", "")
+        if journal:
+            journal = f"<i>{journal}</i>"
+        
+        # 卷期页
+        volume_issue_pages = ""
+        if reference.get("volume"):
+            volume_issue_pages += f" {reference['volume']}"
+            if reference.get("issue"):
+                volume_issue_pages += f" ({reference['issue']})"
+        if reference.get("pages"):
+            volume_issue_pages += f": {reference['pages']}"
+        
+        # 拼接Chicago引用格式
+        citation = ""
+        if author_text:
+            citation += f"{author_text.rstrip('.')}. "
+        if year:
+            citation += f"{year}. "
+        if title:
+            citation += f"{title} "
+        if journal:
+            citation += f"{journal}{volume_issue_pages}. "
+        if reference.get("doi"):
+            citation += f"https://doi.org/{reference['doi']}."
+        elif reference.get("url"):
+            citation += f"{reference['url']}."
+        
+        return citation.strip()
+    
     @staticmethod
     def _format_gb(reference: Dict[str, Any]) -> str:
         """中国标准GB/T 7714格式化"""
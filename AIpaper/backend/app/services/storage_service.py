@@ -0,0 +1,311 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+from abc import ABC, abstractmethod
+from typing import Dict, Any, Optional, List, Tuple, Iterator
+from functools import lru_cache
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class StorageBackend(ABC):
+    """
+    PDF文件存储后端基类
+
+    文件按内容哈希(sha256)寻址，并按哈希前缀分片存放：
+    ``ab/cd/abcd....pdf``，旁边的 ``abcd....json`` 保存文件元数据。
+    由ID即可直接算出存储路径，无需扫描目录。
+    """
+
+    PDF_SUFFIX = ".pdf"
+    META_SUFFIX = ".json"
+
+    @staticmethod
+    def compute_id(file_content: bytes) -> str:
+        """根据文件内容计算内容寻址ID"""
+        return hashlib.sha256(file_content).hexdigest()
+
+    @staticmethod
+    def shard_prefix(pdf_id: str) -> str:
+        """获取ID对应的两级分片目录，如 ``ab/cd``"""
+        return f"{pdf_id[0:2]}/{pdf_id[2:4]}"
+
+    def object_key(self, pdf_id: str, suffix: str = PDF_SUFFIX) -> str:
+        """获取ID对应的相对存储键"""
+        return f"{self.shard_prefix(pdf_id)}/{pdf_id}{suffix}"
+
+    @abstractmethod
+    def save(self, pdf_id: str, file_content: bytes, metadata: Dict[str, Any]) -> str:
+        """保存文件及其元数据，返回存储位置"""
+
+    @abstractmethod
+    def save_file(self, pdf_id: str, source_path: str, metadata: Dict[str, Any]) -> str:
+        """从本地文件保存（避免将大文件读入内存），返回存储位置"""
+
+    @abstractmethod
+    def exists(self, pdf_id: str) -> bool:
+        """文件是否已存在"""
+
+    @abstractmethod
+    def get_metadata(self, pdf_id: str) -> Optional[Dict[str, Any]]:
+        """读取文件元数据，不存在时返回None"""
+
+    def update_metadata(self, pdf_id: str, **fields: Any) -> Optional[Dict[str, Any]]:
+        """合并更新文件元数据"""
+        metadata = self.get_metadata(pdf_id)
+        if metadata is None:
+            return None
+        metadata.update(fields)
+        self._write_metadata(pdf_id, metadata)
+        return metadata
+
+    @abstractmethod
+    def fetch_local(self, pdf_id: str) -> Tuple[Optional[str], bool]:
+        """
+        获取可供本地读取的文件路径
+
+        Returns:
+            Tuple[Optional[str], bool]: (文件路径, 是否为需要调用方删除的临时文件)
+        """
+
+    @abstractmethod
+    def iter_metadata(self) -> Iterator[Dict[str, Any]]:
+        """遍历所有文件的元数据"""
+
+    @abstractmethod
+    def delete(self, pdf_id: str) -> None:
+        """删除文件及其元数据"""
+
+    @abstractmethod
+    def _write_metadata(self, pdf_id: str, metadata: Dict[str, Any]) -> None:
+        """写入文件元数据"""
+
+
+class LocalStorageBackend(StorageBackend):
+    """本地目录存储后端（默认）"""
+
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+        os.makedirs(root_dir, exist_ok=True)
+
+    def path_for(self, pdf_id: str, suffix: str = StorageBackend.PDF_SUFFIX) -> str:
+        """获取ID对应的绝对路径"""
+        return os.path.join(self.root_dir, *self.object_key(pdf_id, suffix).split("/"))
+
+    def save(self, pdf_id: str, file_content: bytes, metadata: Dict[str, Any]) -> str:
+        file_path = self.path_for(pdf_id)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+        # 先写临时文件再原子替换，避免并发读到半个文件
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(file_content)
+        os.replace(tmp_path, file_path)
+
+        self._write_metadata(pdf_id, metadata)
+        return file_path
+
+    def save_file(self, pdf_id: str, source_path: str, metadata: Dict[str, Any]) -> str:
+        file_path = self.path_for(pdf_id)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+        tmp_path = f"{file_path}.tmp"
+        shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, file_path)
+
+        self._write_metadata(pdf_id, metadata)
+        return file_path
+
+    def exists(self, pdf_id: str) -> bool:
+        return os.path.exists(self.path_for(pdf_id)) or self._legacy_path(pdf_id) is not None
+
+    def get_metadata(self, pdf_id: str) -> Optional[Dict[str, Any]]:
+        meta_path = self.path_for(pdf_id, self.META_SUFFIX)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            pass
+
+        # 兼容旧的平铺布局 <uuid>_<filename>
+        legacy_path = self._legacy_path(pdf_id)
+        if legacy_path:
+            return self._legacy_metadata(legacy_path)
+        return None
+
+    def update_metadata(self, pdf_id: str, **fields: Any) -> Optional[Dict[str, Any]]:
+        metadata = self.get_metadata(pdf_id)
+        if metadata is None:
+            return None
+        metadata.update(fields)
+        if metadata.get("legacy"):
+            # 旧布局文件没有元数据文件，状态不持久化
+            return metadata
+        self._write_metadata(pdf_id, metadata)
+        return metadata
+
+    def fetch_local(self, pdf_id: str) -> Tuple[Optional[str], bool]:
+        file_path = self.path_for(pdf_id)
+        if os.path.exists(file_path):
+            return file_path, False
+        return self._legacy_path(pdf_id), False
+
+    def iter_metadata(self) -> Iterator[Dict[str, Any]]:
+        for first in os.scandir(self.root_dir):
+            if first.is_file():
+                # 旧布局文件直接位于根目录
+                if first.name.endswith(self.PDF_SUFFIX) and "_" in first.name:
+                    yield self._legacy_metadata(first.path)
+                continue
+            for second in os.scandir(first.path):
+                if not second.is_dir():
+                    continue
+                for entry in os.scandir(second.path):
+                    if entry.name.endswith(self.META_SUFFIX):
+                        try:
+                            with open(entry.path, "r", encoding="utf-8") as f:
+                                yield json.load(f)
+                        except (OSError, ValueError) as e:
+                            logger.error(f"读取PDF元数据失败 {entry.path}: {e}")
+
+    def delete(self, pdf_id: str) -> None:
+        for suffix in (self.PDF_SUFFIX, self.META_SUFFIX):
+            try:
+                os.remove(self.path_for(pdf_id, suffix))
+            except FileNotFoundError:
+                pass
+
+    def _write_metadata(self, pdf_id: str, metadata: Dict[str, Any]) -> None:
+        meta_path = self.path_for(pdf_id, self.META_SUFFIX)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        tmp_path = f"{meta_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(metadata, f, ensure_ascii=False)
+        os.replace(tmp_path, meta_path)
+
+    def _legacy_path(self, pdf_id: str) -> Optional[str]:
+        """查找旧的平铺布局文件，仅对旧的UUID格式ID生效"""
+        if len(pdf_id) != 36 or pdf_id.count("-") != 4:
+            return None
+        prefix = f"{pdf_id}_"
+        for entry in os.scandir(self.root_dir):
+            if entry.is_file() and entry.name.startswith(prefix):
+                return entry.path
+        return None
+
+    @staticmethod
+    def _legacy_metadata(file_path: str) -> Dict[str, Any]:
+        pdf_id, filename = os.path.basename(file_path).split("_", 1)
+        return {
+            "id": pdf_id,
+            "filename": filename,
+            "size": os.path.getsize(file_path),
+            "upload_time": os.path.getctime(file_path),
+            "status": "uploaded",
+            "legacy": True,
+        }
+
+
+class S3StorageBackend(StorageBackend):
+    """
+    S3兼容存储后端
+
+    通过 ``S3_ENDPOINT_URL`` 可指向MinIO等本地替身服务进行测试。
+    """
+
+    def __init__(self, bucket: str, prefix: str = "pdfs", endpoint_url: Optional[str] = None,
+                 access_key: Optional[str] = None, secret_key: Optional[str] = None,
+                 region: Optional[str] = None):
+        try:
+            import boto3
+        except ImportError as e:
+            raise RuntimeError("使用S3存储后端需要安装boto3") from e
+
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            region_name=region,
+        )
+
+    def object_key(self, pdf_id: str, suffix: str = StorageBackend.PDF_SUFFIX) -> str:
+        return f"{self.prefix}/{super().object_key(pdf_id, suffix)}"
+
+    def save(self, pdf_id: str, file_content: bytes, metadata: Dict[str, Any]) -> str:
+        key = self.object_key(pdf_id)
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=file_content,
+                               ContentType="application/pdf")
+        self._write_metadata(pdf_id, metadata)
+        return f"s3://{self.bucket}/{key}"
+
+    def save_file(self, pdf_id: str, source_path: str, metadata: Dict[str, Any]) -> str:
+        key = self.object_key(pdf_id)
+        self.client.upload_file(source_path, self.bucket, key,
+                                ExtraArgs={"ContentType": "application/pdf"})
+        self._write_metadata(pdf_id, metadata)
+        return f"s3://{self.bucket}/{key}"
+
+    def exists(self, pdf_id: str) -> bool:
+        return self.get_metadata(pdf_id) is not None
+
+    def get_metadata(self, pdf_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            response = self.client.get_object(Bucket=self.bucket,
+                                              Key=self.object_key(pdf_id, self.META_SUFFIX))
+        except self.client.exceptions.NoSuchKey:
+            return None
+        return json.loads(response["Body"].read())
+
+    def fetch_local(self, pdf_id: str) -> Tuple[Optional[str], bool]:
+        if not self.exists(pdf_id):
+            return None, False
+        fd, tmp_path = tempfile.mkstemp(suffix=self.PDF_SUFFIX)
+        os.close(fd)
+        self.client.download_file(self.bucket, self.object_key(pdf_id), tmp_path)
+        return tmp_path, True
+
+    def iter_metadata(self) -> Iterator[Dict[str, Any]]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=f"{self.prefix}/"):
+            for obj in page.get("Contents", []):
+                if obj["Key"].endswith(self.META_SUFFIX):
+                    response = self.client.get_object(Bucket=self.bucket, Key=obj["Key"])
+                    yield json.loads(response["Body"].read())
+
+    def delete(self, pdf_id: str) -> None:
+        self.client.delete_objects(Bucket=self.bucket, Delete={"Objects": [
+            {"Key": self.object_key(pdf_id)},
+            {"Key": self.object_key(pdf_id, self.META_SUFFIX)},
+        ]})
+
+    def _write_metadata(self, pdf_id: str, metadata: Dict[str, Any]) -> None:
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=self.object_key(pdf_id, self.META_SUFFIX),
+            Body=json.dumps(metadata, ensure_ascii=False).encode("utf-8"),
+            ContentType="application/json",
+        )
+
+
+@lru_cache()
+def get_storage() -> StorageBackend:
+    """根据配置获取缓存的存储后端实例"""
+    if settings.STORAGE_BACKEND == "s3":
+        return S3StorageBackend(
+            bucket=settings.S3_BUCKET,
+            prefix="pdfs",
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            access_key=settings.S3_ACCESS_KEY,
+            secret_key=settings.S3_SECRET_KEY,
+            region=settings.S3_REGION,
+        )
+    return LocalStorageBackend(os.path.join(settings.UPLOAD_DIR, "pdfs"))
@@ -0,0 +1,365 @@
+import json
+import time
+import heapq
+import bisect
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, object_session
+
+from app.core.config import get_settings
+from app.core.metrics import Metrics
+from app.models.document import Document
+from app.models.reference import Reference
+from app.services.dedup_service import DedupService
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+Metrics.describe("typeahead_index_total", "文献库前缀索引的加载和淘汰次数，按操作（load/reload/evict）统计")
+Metrics.describe("typeahead_lookup_seconds", "文献库前缀查询耗时（不含索引加载）")
+
+# 前缀区间的上界哨兵，大于任何实际词元
+_PREFIX_END = "\U0010ffff"
+
+
+class LibraryPrefixIndex:
+    """
+    单个用户文献库的前缀索引
+
+    词元（来自标题、作者姓名和引用键）按字典序保存在有序数组中，前缀查询用bisect定位区间；
+    另有一个按完整标题和引用键排序的数组，用于找出以查询开头的条目
+    """
+
+    def __init__(self):
+        # 有序词元数组及对应的引用ID（两个数组下标一一对应）
+        self._term_keys: List[str] = []
+        self._term_ids: List[int] = []
+        # 有序的规范化标题/引用键数组及对应的引用ID
+        self._lead_keys: List[str] = []
+        self._lead_ids: List[int] = []
+        self._entries: Dict[int, Dict[str, Any]] = {}
+        self._entry_keys: Dict[int, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {}
+        # 排序键：年份从新到旧，其次按标题
+        self._sort_keys: Dict[int, Tuple[int, str]] = {}
+        self.loaded_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def keys_for(entry: Dict[str, Any]) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+        """提取条目的索引词元和整体前缀键（规范化标题、引用键）"""
+        title = DedupService.normalize_title(entry.get("title"))
+        terms = set(title.split())
+        for author in entry.get("authors") or []:
+            terms.update(DedupService.normalize_title(str(author)).split())
+        leads = {title} if title else set()
+        if entry.get("citation_key"):
+            citation_key = DedupService.normalize_title(entry["citation_key"])
+            terms.update(citation_key.split())
+            leads.add(citation_key)
+        return tuple(sorted(terms)), tuple(sorted(leads))
+
+    @staticmethod
+    def _sort_key(entry: Dict[str, Any]) -> Tuple[int, str]:
+        year = str(entry.get("year") or "")[:4]
+        return (-int(year) if year.isdigit() else 0, entry.get("title") or "")
+
+    def extend(self, entries: List[Dict[str, Any]]) -> None:
+        """批量加入新条目，每个数组只排序一次（用于加载索引）"""
+        term_pairs = list(zip(self._term_keys, self._term_ids))
+        lead_pairs = list(zip(self._lead_keys, self._lead_ids))
+        for entry in entries:
+            terms, leads = LibraryPrefixIndex.keys_for(entry)
+            term_pairs.extend((term, entry["id"]) for term in terms)
+            lead_pairs.extend((lead, entry["id"]) for lead in leads)
+            self._entries[entry["id"]] = entry
+            self._entry_keys[entry["id"]] = (terms, leads)
+            self._sort_keys[entry["id"]] = LibraryPrefixIndex._sort_key(entry)
+        term_pairs.sort()
+        lead_pairs.sort()
+        self._term_keys = [key for key, _ in term_pairs]
+        self._term_ids = [reference_id for _, reference_id in term_pairs]
+        self._lead_keys = [key for key, _ in lead_pairs]
+        self._lead_ids = [reference_id for _, reference_id in lead_pairs]
+
+    @staticmethod
+    def _insert(keys: List[str], ids: List[int], key: str, reference_id: int) -> None:
+        i = bisect.bisect_right(keys, key)
+        keys.insert(i, key)
+        ids.insert(i, reference_id)
+
+    @staticmethod
+    def _delete(keys: List[str], ids: List[int], key: str, reference_id: int) -> None:
+        lo, hi = bisect.bisect_left(keys, key), bisect.bisect_right(keys, key)
+        try:
+            i = ids.index(reference_id, lo, hi)
+        except ValueError:
+            return
+        del keys[i]
+        del ids[i]
+
+    def add(self, entry: Dict[str, Any]) -> None:
+        """加入或替换条目"""
+        if entry["id"] in self._entries:
+            self.remove(entry["id"])
+        terms, leads = LibraryPrefixIndex.keys_for(entry)
+        for term in terms:
+            LibraryPrefixIndex._insert(self._term_keys, self._term_ids, term, entry["id"])
+        for lead in leads:
+            LibraryPrefixIndex._insert(self._lead_keys, self._lead_ids, lead, entry["id"])
+        self._entries[entry["id"]] = entry
+        self._entry_keys[entry["id"]] = (terms, leads)
+        self._sort_keys[entry["id"]] = LibraryPrefixIndex._sort_key(entry)
+
+    def remove(self, reference_id: int) -> None:
+        """移除条目"""
+        terms, leads = self._entry_keys.pop(reference_id, ((), ()))
+        for term in terms:
+            LibraryPrefixIndex._delete(self._term_keys, self._term_ids, term, reference_id)
+        for lead in leads:
+            LibraryPrefixIndex._delete(self._lead_keys, self._lead_ids, lead, reference_id)
+        self._entries.pop(reference_id, None)
+        self._sort_keys.pop(reference_id, None)
+
+    @staticmethod
+    def _prefix_ids(keys: List[str], ids: List[int], prefix: str) -> Set[int]:
+        lo = bisect.bisect_left(keys, prefix)
+        hi = bisect.bisect_left(keys, prefix + _PREFIX_END, lo)
+        return set(ids[lo:hi])
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        前缀查询
+
+        查询中的每个词都必须是条目某个词元的前缀，各词的匹配集合取交集；
+        标题或引用键以整个查询开头的条目排在前面，其余按年份从新到旧排列
+
+        Args:
+            query: 查询文本
+            limit: 返回数量
+
+        Returns:
+            List[Dict[str, Any]]: 匹配的条目
+        """
+        normalized = DedupService.normalize_title(query)
+        tokens = normalized.split()
+        if not tokens:
+            return []
+
+        # 以整个查询开头的条目必然匹配每个词
+        leading = LibraryPrefixIndex._prefix_ids(self._lead_keys, self._lead_ids, normalized)
+        ranked = heapq.nsmallest(limit, leading, key=self._sort_keys.__getitem__)
+
+        if len(ranked) < limit:
+            matches = None
+            for token in sorted(set(tokens), key=len, reverse=True):
+                ids = LibraryPrefixIndex._prefix_ids(self._term_keys, self._term_ids, token)
+                matches = ids if matches is None else matches & ids
+                if not matches:
+                    break
+            matches -= leading
+            ranked += heapq.nsmallest(limit - len(ranked), matches, key=self._sort_keys.__getitem__)
+
+        return [self._entries[reference_id] for reference_id in ranked]
+
+
+class TypeaheadService:
+    """
+    文献库输入提示服务
+
+    每个用户的前缀索引在首次查询时从数据库加载，之后新增、修改和删除的引用在事务提交后
+    增量更新到已加载的索引；索引总条目数超过上限时按最近最少使用淘汰整个用户索引。
+    查询只访问内存索引，不访问数据库或上游接口。
+    """
+
+    _indexes: "OrderedDict[int, LibraryPrefixIndex]" = OrderedDict()
+    _lock = threading.RLock()
+
+    @staticmethod
+    def to_entry(reference: Any) -> Dict[str, Any]:
+        """将Reference记录（或同名列的查询结果行）转换为索引条目"""
+        authors = reference.authors
+        if isinstance(authors, str):
+            try:
+                authors = json.loads(authors)
+            except ValueError:
+                authors = [a.strip() for a in authors.split(";") if a.strip()]
+        if not isinstance(authors, list):
+            authors = []
+        return {
+            "id": reference.id,
+            "title": reference.title,
+            "authors": [(a.get("family") or a.get("name") or "") if isinstance(a, dict) else str(a) for a in authors],
+            "year": reference.year,
+            "doi": reference.doi,
+            "citation_key": reference.citation_key,
+            "document_id": reference.document_id,
+        }
+
+    @staticmethod
+    def _load(db: Session, user_id: int) -> LibraryPrefixIndex:
+        """从数据库加载用户的全部引用"""
+        rows = db.execute(
+            select(Reference.id, Reference.title, Reference.authors, Reference.year, Reference.doi,
+                   Reference.citation_key, Reference.document_id)
+            .join(Document, Reference.document_id == Document.id)
+            .where(Document.user_id == user_id, Reference.pdf_source_id.is_(None))
+        )
+        index = LibraryPrefixIndex()
+        index.extend([TypeaheadService.to_entry(row) for row in rows])
+        return index
+
+    @staticmethod
+    def get_index(db: Session, user_id: int) -> LibraryPrefixIndex:
+        """
+        获取用户的前缀索引，未加载或已过期时从数据库加载
+
+        Args:
+            db: 数据库会话
+            user_id: 用户ID
+
+        Returns:
+            LibraryPrefixIndex: 前缀索引
+        """
+        with TypeaheadService._lock:
+            index = TypeaheadService._indexes.get(user_id)
+            if index is not None and time.monotonic() - index.loaded_at < settings.TYPEAHEAD_INDEX_TTL:
+                TypeaheadService._indexes.move_to_end(user_id)
+                return index
+
+        reloading = index is not None
+        index = TypeaheadService._load(db, user_id)
+        Metrics.inc("typeahead_index_total", operation="reload" if reloading else "load")
+
+        with TypeaheadService._lock:
+            TypeaheadService._indexes[user_id] = index
+            TypeaheadService._indexes.move_to_end(user_id)
+            TypeaheadService._evict()
+        return index
+
+    @staticmethod
+    def _evict() -> None:
+        """总条目数超过上限时淘汰最久未使用的索引，至少保留最近使用的一个"""
+        total = sum(len(index) for index in TypeaheadService._indexes.values())
+        while total > settings.TYPEAHEAD_MAX_ENTRIES and len(TypeaheadService._indexes) > 1:
+            user_id, index = TypeaheadService._indexes.popitem(last=False)
+            total -= len(index)
+            Metrics.inc("typeahead_index_total", operation="evict")
+            logger.info(f"淘汰用户 {user_id} 的文献库前缀索引（{len(index)} 条）")
+
+    @staticmethod
+    def search(db: Session, user_id: int, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        在用户文献库中按前缀查询引用
+
+        Args:
+            db: 数据库会话（仅在索引未加载时使用）
+            user_id: 用户ID
+            query: 查询文本
+            limit: 返回数量
+
+        Returns:
+            List[Dict[str, Any]]: 匹配的引用
+        """
+        index = TypeaheadService.get_index(db, user_id)
+        started = time.perf_counter()
+        with TypeaheadService._lock:
+            results = index.search(query, limit)
+        Metrics.observe("typeahead_lookup_seconds", time.perf_counter() - started)
+        return results
+
+    @staticmethod
+    def invalidate(user_id: Optional[int] = None) -> None:
+        """丢弃指定用户（或全部）的索引"""
+        with TypeaheadService._lock:
+            if user_id is None:
+                TypeaheadService._indexes.clear()
+            else:
+                TypeaheadService._indexes.pop(user_id, None)
+
+    @staticmethod
+    def _apply(changes: List[Tuple[int, int, Optional[Dict[str, Any]]]]) -> None:
+        """将已提交的变更应用到已加载的索引"""
+        with TypeaheadService._lock:
+            for user_id, reference_id, entry in changes:
+                index = TypeaheadService._indexes.get(user_id)
+                if index is None:
+                    continue
+                if entry is None:
+                    index.remove(reference_id)
+                else:
+                    index.add(entry)
+
+
+# 引用变更先按文档记录在会话上，每次flush结束时一次查询解析文档所属用户，
+# 事务提交后才更新索引，回滚时丢弃
+
+def _record_change(target: Reference, document_id: Optional[int], deleted: bool = False) -> None:
+    # 从PDF中提取的引用不属于用户文献库
+    if not TypeaheadService._indexes or document_id is None or target.pdf_source_id is not None:
+        return
+    session = object_session(target)
+    if session is not None:
+        entry = None if deleted else TypeaheadService.to_entry(target)
+        session.info.setdefault("typeahead_pending", []).append((document_id, target.id, entry))
+
+
+@event.listens_for(Reference, "after_insert")
+def _index_inserted_reference(mapper, connection, target):
+    _record_change(target, target.document_id)
+
+
+@event.listens_for(Reference.document_id, "set", active_history=True)
+def _load_previous_document(target, value, oldvalue, initiator):
+    # active_history使修改document_id时加载原值，after_update中才能从历史中取到原文档
+    return value
+
+
+@event.listens_for(Reference, "after_update")
+def _index_updated_reference(mapper, connection, target):
+    # 引用移到其他文档（可能属于其他用户）时，从原文档所属用户的索引中移除
+    previous = inspect(target).attrs.document_id.history.deleted
+    if previous and previous[0] != target.document_id:
+        _record_change(target, previous[0], deleted=True)
+    _record_change(target, target.document_id)
+
+
+@event.listens_for(Reference, "after_delete")
+def _index_deleted_reference(mapper, connection, target):
+    _record_change(target, target.document_id, deleted=True)
+
+
+@event.listens_for(Session, "after_flush")
+def _resolve_flushed_changes(session, flush_context):
+    pending = session.info.pop("typeahead_pending", None)
+    if not pending or not TypeaheadService._indexes:
+        return
+    document_ids = {document_id for document_id, _, _ in pending}
+    owners = dict(session.connection().execute(
+        select(Document.id, Document.user_id).where(Document.id.in_(document_ids))
+    ).all())
+    changes = [
+        (owners[document_id], reference_id, entry)
+        for document_id, reference_id, entry in pending
+        if owners.get(document_id) in TypeaheadService._indexes
+    ]
+    if changes:
+        session.info.setdefault("typeahead_changes", []).extend(changes)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed_changes(session):
+    changes = session.info.pop("typeahead_changes", None)
+    if changes:
+        TypeaheadService._apply(changes)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_rolled_back_changes(session, previous_transaction):
+    session.info.pop("typeahead_pending", None)
+    session.info.pop("typeahead_changes", None)
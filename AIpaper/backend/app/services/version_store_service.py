@@ -0,0 +1,543 @@
+import json
+import zlib
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from sqlalchemy import exists, func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased, undefer_group
+
+from app.core.config import get_settings
+from app.db.database import SessionLocal
+from app.models.document_version import DocumentVersion
+from app.services.cache_service import TTLCache
+from app.services.diff_service import DiffService
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# 增量操作：正整数表示从上一版本复制若干行，负整数表示跳过若干行，字符串列表表示插入的行
+DeltaOps = List[Union[int, List[str]]]
+
+
+class VersionStoreService:
+    """
+    文档版本的增量存储
+
+    每隔DOCUMENT_VERSION_KEYFRAME_INTERVAL个版本保存一个完整快照（关键帧），其余版本只保存
+    相对上一版本的按行增量（zlib压缩的JSON）。还原任一版本只需读取最近的关键帧并依次应用
+    不超过关键帧间隔个增量。is_keyframe为空的旧记录保存的是完整快照，直接视为关键帧。
+    """
+
+    # 增量格式版本
+    DELTA_FORMAT = 1
+
+    # 压缩后的增量超过完整内容该比例时改存关键帧（大幅改写时增量不划算）
+    MAX_DELTA_RATIO = 0.5
+
+    # 版本号冲突（并发保存）时的最大尝试次数
+    VERSION_NUMBER_RETRIES = 3
+
+    # 进程内缓存最近还原或保存的版本内容（按版本记录ID），保存新版本时通常可直接命中上一版本
+    _content_cache = TTLCache(maxsize=32, ttl=3600)
+
+    # 每个文档最后一个排队的后台转换任务，同一文档的版本按保存顺序依次转换
+    _finalize_tails: Dict[int, asyncio.Future] = {}
+
+    @staticmethod
+    def diff_lines(old: Optional[str], new: Optional[str]) -> DeltaOps:
+        """
+        计算按行的增量操作
+
+        Args:
+            old: 上一版本文本
+            new: 新版本文本
+
+        Returns:
+            DeltaOps: 增量操作
+        """
+        a = (old or "").splitlines(keepends=True)
+        b = (new or "").splitlines(keepends=True)
+        ops: DeltaOps = []
+        for tag, i1, i2, j1, j2 in DiffService.opcodes(a, b):
+            if tag == "equal":
+                ops.append(i2 - i1)
+                continue
+            if i2 > i1:
+                ops.append(-(i2 - i1))
+            if j2 > j1:
+                ops.append(b[j1:j2])
+        return ops
+
+    @staticmethod
+    def apply_ops(base: Optional[str], ops: DeltaOps) -> str:
+        """
+        将增量操作应用到上一版本文本
+
+        Args:
+            base: 上一版本文本
+            ops: 增量操作
+
+        Returns:
+            str: 新版本文本
+        """
+        lines = (base or "").splitlines(keepends=True)
+        result: List[str] = []
+        position = 0
+        for op in ops:
+            if isinstance(op, int):
+                if op > 0:
+                    result.extend(lines[position:position + op])
+                    position += op
+                else:
+                    position -= op
+            else:
+                result.extend(op)
+        return "".join(result)
+
+    @staticmethod
+    def delta_ops(base: Dict[str, Optional[str]], target: Dict[str, Optional[str]]) -> Dict[str, Optional[DeltaOps]]:
+        """
+        计算两个版本之间content和outline的增量操作
+
+        Args:
+            base: 上一版本的 {"content", "outline"}
+            target: 新版本的 {"content", "outline"}
+
+        Returns:
+            Dict[str, Optional[DeltaOps]]: 各字段的增量操作，新版本字段为空时为None
+        """
+        return {
+            field: None if target[field] is None else VersionStoreService.diff_lines(base[field], target[field])
+            for field in ("content", "outline")
+        }
+
+    @staticmethod
+    def pack_delta(ops: Dict[str, Optional[DeltaOps]]) -> bytes:
+        """将delta_ops的结果压缩为增量（字段为null时还原为None）"""
+        payload: Dict[str, Any] = {"format": VersionStoreService.DELTA_FORMAT, **ops}
+        return zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+    @staticmethod
+    def encode_delta(base: Dict[str, Optional[str]], target: Dict[str, Optional[str]]) -> bytes:
+        """
+        编码两个版本之间的增量（content和outline）
+
+        Args:
+            base: 上一版本的 {"content", "outline"}
+            target: 新版本的 {"content", "outline"}
+
+        Returns:
+            bytes: 压缩后的增量
+        """
+        return VersionStoreService.pack_delta(VersionStoreService.delta_ops(base, target))
+
+    @staticmethod
+    def summarize_ops(ops: Optional[DeltaOps]) -> Dict[str, int]:
+        """根据内容的增量操作统计新增和删除的行数"""
+        added = removed = 0
+        for op in ops or []:
+            if isinstance(op, list):
+                added += len(op)
+            elif op < 0:
+                removed -= op
+        return {"added_lines": added, "removed_lines": removed}
+
+    @staticmethod
+    def apply_delta(base: Dict[str, Optional[str]], delta: bytes) -> Dict[str, Optional[str]]:
+        """
+        将压缩增量应用到上一版本
+
+        Args:
+            base: 上一版本的 {"content", "outline"}
+            delta: encode_delta的结果
+
+        Returns:
+            Dict[str, Optional[str]]: 新版本的 {"content", "outline"}
+        """
+        payload = json.loads(zlib.decompress(delta).decode("utf-8"))
+        return {
+            field: None if payload.get(field) is None else VersionStoreService.apply_ops(base[field], payload[field])
+            for field in ("content", "outline")
+        }
+
+    @staticmethod
+    def is_keyframe(version: DocumentVersion) -> bool:
+        """是否为关键帧（旧记录的is_keyframe为空，也是完整快照）"""
+        return version.is_keyframe is not False
+
+    @staticmethod
+    def _keyframe_filter():
+        return or_(DocumentVersion.is_keyframe.is_(None), DocumentVersion.is_keyframe.is_(True))
+
+    @staticmethod
+    def reconstruct(db: Session, document_id: int, version_number: int) -> Optional[Dict[str, Optional[str]]]:
+        """
+        还原指定版本的内容和大纲
+
+        Args:
+            db: 数据库会话
+            document_id: 文档ID
+            version_number: 版本号
+
+        Returns:
+            Optional[Dict[str, Optional[str]]]: {"content", "outline"}，版本不存在时返回None
+        """
+        # 关键帧位置和各行内容在同一条语句中读取：后台转换可能随时把关键帧改为增量，
+        # 分开查询时会拿到已清空快照的"关键帧"
+        query = db.query(
+            DocumentVersion.id, DocumentVersion.version_number, DocumentVersion.is_keyframe,
+            DocumentVersion.content, DocumentVersion.outline, DocumentVersion.delta
+        ).filter(
+            DocumentVersion.document_id == document_id,
+            DocumentVersion.version_number <= version_number
+        ).order_by(DocumentVersion.version_number.desc())
+
+        # 关键帧之后最多关键帧间隔个增量，通常只需读取这么多行
+        limit = settings.DOCUMENT_VERSION_KEYFRAME_INTERVAL + 1
+        rows = query.limit(limit).all()
+        if not rows or rows[0].version_number != version_number:
+            return None
+
+        # 从目标版本往前找到最近的缓存版本或关键帧作为起点
+        found = VersionStoreService._find_start(rows)
+        if found is None and len(rows) == limit:
+            rows = query.all()
+            found = VersionStoreService._find_start(rows)
+        if found is None:
+            logger.error(f"文档 {document_id} 版本 {version_number} 之前没有关键帧，无法还原")
+            return None
+        start, state = found
+
+        for row in reversed(rows[:start]):
+            if row.is_keyframe is not False:
+                state = {"content": row.content, "outline": row.outline}
+            else:
+                state = VersionStoreService.apply_delta(state, row.delta)
+
+        VersionStoreService._content_cache.set(str(rows[0].id), dict(state))
+        return state
+
+    @staticmethod
+    def _find_start(rows: List[Any]) -> Optional[Tuple[int, Dict[str, Optional[str]]]]:
+        """在按版本号降序的行中找到第一个命中缓存的版本或关键帧，返回其下标和内容"""
+        for i, row in enumerate(rows):
+            cached = VersionStoreService._content_cache.get(str(row.id))
+            if cached is not None:
+                return i, dict(cached)
+            if row.is_keyframe is not False:
+                return i, {"content": row.content, "outline": row.outline}
+        return None
+
+    @staticmethod
+    def get_version_content(db: Session, version: DocumentVersion) -> Dict[str, Optional[str]]:
+        """
+        获取版本记录的完整内容和大纲
+
+        Args:
+            db: 数据库会话
+            version: 版本记录
+
+        Returns:
+            Dict[str, Optional[str]]: {"content", "outline"}
+        """
+        # 版本记录可能在后台转换为增量之前加载，重新在同一条语句中读取is_keyframe和快照
+        row = db.query(
+            DocumentVersion.is_keyframe, DocumentVersion.content, DocumentVersion.outline
+        ).filter(DocumentVersion.id == version.id).first()
+        if row is not None and row.is_keyframe is not False and row.content is not None:
+            return {"content": row.content, "outline": row.outline}
+        return VersionStoreService.reconstruct(db, version.document_id, version.version_number) or \
+            {"content": None, "outline": None}
+
+    @staticmethod
+    def _neighbours(db: Session, document_id: int, version_number: int) -> Tuple[Optional[int], Optional[int]]:
+        """返回指定版本之前的上一版本号和上一个关键帧版本号"""
+        previous_number = db.query(func.max(DocumentVersion.version_number)).filter(
+            DocumentVersion.document_id == document_id,
+            DocumentVersion.version_number < version_number
+        ).scalar()
+        keyframe_number = db.query(func.max(DocumentVersion.version_number)).filter(
+            DocumentVersion.document_id == document_id,
+            DocumentVersion.version_number < version_number,
+            VersionStoreService._keyframe_filter()
+        ).scalar()
+        return previous_number, keyframe_number
+
+    @staticmethod
+    def _delta_allowed(version_number: int, previous_number: Optional[int], keyframe_number: Optional[int]) -> bool:
+        """有上一版本且距上一个关键帧未满关键帧间隔时可以保存增量"""
+        return previous_number is not None and keyframe_number is not None and \
+            version_number - keyframe_number < settings.DOCUMENT_VERSION_KEYFRAME_INTERVAL
+
+    @staticmethod
+    def _delta_worthwhile(delta: bytes, target: Dict[str, Optional[str]]) -> bool:
+        """增量不超过完整内容的MAX_DELTA_RATIO时才保存增量"""
+        full_size = len((target["content"] or "").encode("utf-8")) + len((target["outline"] or "").encode("utf-8"))
+        return len(delta) <= full_size * VersionStoreService.MAX_DELTA_RATIO
+
+    @staticmethod
+    def build_version(db: Session, document_id: int, version_number: int, content: Optional[str],
+                      outline: Optional[str], defer_delta: bool = False, **fields: Any) -> DocumentVersion:
+        """
+        创建新版本记录（加入会话并flush，由调用方提交）
+
+        版本号已被并发保存占用时，改用当前最大版本号的下一个重试，调用方应以返回记录的version_number为准
+
+        距上一个关键帧已满关键帧间隔、没有上一版本，或增量不划算时保存关键帧，否则保存增量。
+        defer_delta为True时先保存完整快照，提交后由schedule_finalize在后台计算变更摘要并转换为增量
+
+        Args:
+            db: 数据库会话
+            document_id: 文档ID
+            version_number: 新版本号
+            content: 新版本内容
+            outline: 新版本大纲
+            defer_delta: 是否推迟到后台计算增量
+            **fields: 其他版本字段（title、word_count、commit_message、changes_summary等）
+
+        Returns:
+            DocumentVersion: 新版本记录
+        """
+        target = {"content": content, "outline": outline}
+        for attempt in range(VersionStoreService.VERSION_NUMBER_RETRIES):
+            try:
+                # 在保存点中写入，版本号冲突时只回滚这一条版本记录
+                with db.begin_nested():
+                    version = VersionStoreService._add_version(
+                        db, document_id, version_number, target, defer_delta, fields
+                    )
+                break
+            except IntegrityError:
+                if attempt == VersionStoreService.VERSION_NUMBER_RETRIES - 1:
+                    raise
+                # 其他请求已提交了同一版本号，改用当前最大版本号的下一个
+                latest = db.query(func.max(DocumentVersion.version_number)).filter(
+                    DocumentVersion.document_id == document_id
+                ).scalar()
+                logger.warning(f"文档 {document_id} 版本号 {version_number} 冲突，改用 {(latest or 0) + 1}")
+                version_number = (latest or 0) + 1
+
+        VersionStoreService._content_cache.set(str(version.id), dict(target))
+        return version
+
+    @staticmethod
+    def _add_version(db: Session, document_id: int, version_number: int, target: Dict[str, Optional[str]],
+                     defer_delta: bool, fields: Dict[str, Any]) -> DocumentVersion:
+        """按build_version的规则创建版本记录并flush（版本号重复时抛出IntegrityError）"""
+        version = DocumentVersion(document_id=document_id, version_number=version_number, **fields)
+
+        delta = None
+        if not defer_delta:
+            previous_number, keyframe_number = VersionStoreService._neighbours(db, document_id, version_number)
+            if VersionStoreService._delta_allowed(version_number, previous_number, keyframe_number):
+                base = VersionStoreService.reconstruct(db, document_id, previous_number)
+                if base is not None:
+                    delta = VersionStoreService.encode_delta(base, target)
+                    if not VersionStoreService._delta_worthwhile(delta, target):
+                        delta = None
+
+        if delta is None:
+            version.is_keyframe = True
+            version.content = target["content"]
+            version.outline = target["outline"]
+        else:
+            version.is_keyframe = False
+            version.base_version = previous_number
+            version.delta = delta
+
+        db.add(version)
+        db.flush()
+        return version
+
+    @staticmethod
+    def finalize_version(version_id: int) -> None:
+        """
+        计算版本相对上一版本的变更摘要，并按关键帧间隔将其完整快照转换为增量（在后台线程中执行）
+
+        Args:
+            version_id: 版本记录ID
+        """
+        db = SessionLocal()
+        try:
+            version = db.query(DocumentVersion).options(undefer_group("snapshot")).filter(
+                DocumentVersion.id == version_id
+            ).first()
+            if version is None or version.is_keyframe is False:
+                return
+
+            document_id, version_number = version.document_id, version.version_number
+            previous_number, keyframe_number = VersionStoreService._neighbours(db, document_id, version_number)
+            if previous_number is None:
+                return
+            base = VersionStoreService.reconstruct(db, document_id, previous_number)
+            if base is None:
+                return
+
+            # 变更摘要和增量共用同一次按行差异
+            target = {"content": version.content, "outline": version.outline}
+            ops = VersionStoreService.delta_ops(base, target)
+            version.changes_summary = VersionStoreService.summarize_ops(ops["content"])
+
+            if VersionStoreService._delta_allowed(version_number, previous_number, keyframe_number):
+                delta = VersionStoreService.pack_delta(ops)
+                if VersionStoreService._delta_worthwhile(delta, target):
+                    version.is_keyframe = False
+                    version.base_version = previous_number
+                    version.delta = delta
+                    version.content = None
+                    version.outline = None
+
+            db.commit()
+            VersionStoreService._content_cache.set(str(version_id), target)
+        finally:
+            db.close()
+
+    @staticmethod
+    def schedule_finalize(document_id: int, version_id: int) -> None:
+        """
+        在后台执行finalize_version，不阻塞保存请求（须在事件循环中、版本提交后调用）
+
+        同一文档的任务按调用顺序串行执行，保证关键帧间隔的判断基于已转换的前序版本
+
+        Args:
+            document_id: 文档ID
+            version_id: 版本记录ID
+        """
+        previous = VersionStoreService._finalize_tails.get(document_id)
+
+        async def run():
+            if previous is not None:
+                await asyncio.wait({previous})
+            await asyncio.to_thread(VersionStoreService.finalize_version, version_id)
+
+        task = asyncio.ensure_future(run())
+        VersionStoreService._finalize_tails[document_id] = task
+
+        def done(task: asyncio.Future, document_id: int = document_id) -> None:
+            if VersionStoreService._finalize_tails.get(document_id) is task:
+                del VersionStoreService._finalize_tails[document_id]
+            if not task.cancelled() and task.exception() is not None:
+                logger.error(f"版本 {version_id} 增量转换失败: {str(task.exception())}")
+
+        task.add_done_callback(done)
+
+    @staticmethod
+    async def wait_finalized() -> None:
+        """等待已排队的后台版本转换全部完成（应用关闭时调用）"""
+        while VersionStoreService._finalize_tails:
+            await asyncio.wait(set(VersionStoreService._finalize_tails.values()))
+
+    @staticmethod
+    def pending_finalize(db: Session) -> List[Tuple[int, int]]:
+        """
+        查找未完成后台转换的版本（进程退出时仍在队列中的任务）
+
+        这类版本仍是关键帧、没有变更摘要，且之前还有版本
+
+        Args:
+            db: 数据库会话
+
+        Returns:
+            List[Tuple[int, int]]: 按文档和版本号排序的 (文档ID, 版本记录ID)
+        """
+        previous = aliased(DocumentVersion)
+        rows = db.query(DocumentVersion.document_id, DocumentVersion.id).filter(
+            DocumentVersion.is_keyframe.is_(True),
+            DocumentVersion.changes_summary.is_(None),
+            exists().where(
+                previous.document_id == DocumentVersion.document_id,
+                previous.version_number < DocumentVersion.version_number
+            )
+        ).order_by(DocumentVersion.document_id, DocumentVersion.version_number).all()
+        return [(row.document_id, row.id) for row in rows]
+
+    @staticmethod
+    async def resume_pending() -> None:
+        """重新排队上次未完成的后台版本转换（应用启动时调用）"""
+        def load() -> List[Tuple[int, int]]:
+            db = SessionLocal()
+            try:
+                return VersionStoreService.pending_finalize(db)
+            finally:
+                db.close()
+
+        try:
+            pending = await asyncio.to_thread(load)
+        except Exception as e:
+            logger.error(f"查找未完成的版本转换失败: {str(e)}")
+            return
+        if pending:
+            logger.info(f"重新排队 {len(pending)} 个未完成的版本转换")
+        for document_id, version_id in pending:
+            VersionStoreService.schedule_finalize(document_id, version_id)
+
+    @staticmethod
+    def compact_document(db: Session, document_id: int, batch_size: int = 100) -> Dict[str, int]:
+        """
+        将文档的旧版本（完整快照）转换为增量存储
+
+        按版本号顺序分批处理并逐批提交，只在内存中保留上一版本的内容
+
+        Args:
+            db: 数据库会话
+            document_id: 文档ID
+            batch_size: 每批处理的版本数
+
+        Returns:
+            Dict[str, int]: {"versions", "converted", "keyframes"}
+        """
+        interval = settings.DOCUMENT_VERSION_KEYFRAME_INTERVAL
+        stats = {"versions": 0, "converted": 0, "keyframes": 0}
+        previous: Optional[Dict[str, Optional[str]]] = None
+        previous_number = None
+        since_keyframe = 0
+        last_number = 0
+
+        while True:
+            versions = db.query(DocumentVersion).options(undefer_group("snapshot")).filter(
+                DocumentVersion.document_id == document_id,
+                DocumentVersion.version_number > last_number
+            ).order_by(DocumentVersion.version_number).limit(batch_size).all()
+            if not versions:
+                break
+
+            for version in versions:
+                stats["versions"] += 1
+                if version.is_keyframe is False:
+                    current = VersionStoreService.apply_delta(previous, version.delta)
+                else:
+                    current = {"content": version.content, "outline": version.outline}
+
+                if version.is_keyframe is None:
+                    # 旧记录：未满关键帧间隔且增量划算时改存增量，否则标记为关键帧
+                    delta = None
+                    if previous is not None and since_keyframe + 1 < interval:
+                        delta = VersionStoreService.encode_delta(previous, current)
+                        full_size = len((current["content"] or "").encode("utf-8")) + \
+                            len((current["outline"] or "").encode("utf-8"))
+                        if len(delta) > full_size * VersionStoreService.MAX_DELTA_RATIO:
+                            delta = None
+                    if delta is None:
+                        version.is_keyframe = True
+                    else:
+                        version.is_keyframe = False
+                        version.base_version = previous_number
+                        version.delta = delta
+                        version.content = None
+                        version.outline = None
+                        stats["converted"] += 1
+
+                if version.is_keyframe:
+                    stats["keyframes"] += 1
+                    since_keyframe = 0
+                else:
+                    since_keyframe += 1
+                previous, previous_number = current, version.version_number
+                last_number = version.version_number
+
+            db.commit()
+            db.expunge_all()
+
+        return stats
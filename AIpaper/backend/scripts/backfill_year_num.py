@@ -0,0 +1,109 @@
+"""
+为已入库的PDF分块补写数值年份year_num
+
+检索时年份范围条件按year_num下推到向量库，year_num引入之前入库的分块不会命中
+年份过滤。本脚本按分块的原始年份（缺失时取PDF目录中的年份）补写year_num，
+包括共享向量集合和旧版按PDF单独存放的向量库。
+
+用法（在backend目录下执行）:
+    python -m scripts.backfill_year_num
+    python -m scripts.backfill_year_num --dry-run
+"""
+import argparse
+import logging
+import os
+import sys
+from typing import Dict, Optional
+
+from langchain.vectorstores import Chroma
+
+from app.db.database import SessionLocal
+from app.services.pdf_service import PDFService
+
+# 导入所有模型，确保模型间的关系映射可以解析
+from app.models.user import User
+from app.models.document import Document
+from app.models.reference import Reference
+from app.models.pdf_source import PDFSource
+from app.models.document_version import DocumentVersion
+from app.models.comment import Comment
+from app.models.chunk_fingerprint import ChunkFingerprint
+from app.models.paper_metadata import PaperMetadata
+from app.models.reference_fingerprint import ReferenceFingerprint
+
+
+def load_catalog_years() -> Dict[str, int]:
+    """PDF目录中已解析的年份：PDF ID -> 年份"""
+    db = SessionLocal()
+    try:
+        rows = db.query(PDFSource.vector_db_id, PDFSource.year).filter(
+            PDFSource.year.isnot(None)
+        ).distinct().all()
+        return {row.vector_db_id: row.year for row in rows}
+    finally:
+        db.close()
+
+
+def backfill(name: str, vectordb: Chroma, catalog_years: Dict[str, int],
+             batch_size: int, dry_run: bool) -> int:
+    """分批读取集合中的分块元数据，为缺少year_num的分块补写"""
+    collection = vectordb._collection
+    updated = 0
+    offset = 0
+    while True:
+        batch = collection.get(include=["metadatas"], limit=batch_size, offset=offset)
+        if not batch["ids"]:
+            break
+        offset += len(batch["ids"])
+
+        ids, metadatas = [], []
+        for chunk_id, metadata in zip(batch["ids"], batch["metadatas"]):
+            metadata = metadata or {}
+            if metadata.get("year_num") is not None:
+                continue
+            year: Optional[int] = PDFService._parse_year(metadata.get("year"))
+            if year is None:
+                year = catalog_years.get(metadata.get("pdf_id"))
+            if year is None:
+                continue
+            ids.append(chunk_id)
+            metadatas.append({**metadata, "year_num": year})
+
+        if ids and not dry_run:
+            collection.update(ids=ids, metadatas=metadatas)
+        updated += len(ids)
+        print(f"{name}: 已检查 {offset} 个分块，补写 {updated} 个", flush=True)
+
+    if updated and not dry_run:
+        vectordb.persist()
+    return updated
+
+
+def main(batch_size: int, dry_run: bool) -> int:
+    catalog_years = load_catalog_years()
+    total = 0
+
+    if os.path.isdir(PDFService.SHARED_VECTOR_DIR):
+        # 只修改元数据，不需要嵌入模型
+        vectordb = Chroma(
+            collection_name=PDFService.SHARED_COLLECTION,
+            persist_directory=PDFService.SHARED_VECTOR_DIR
+        )
+        total += backfill(PDFService.SHARED_COLLECTION, vectordb, catalog_years, batch_size, dry_run)
+
+    for pdf_id in PDFService._legacy_store_ids(None):
+        vectordb = Chroma(persist_directory=os.path.join(PDFService.VECTOR_DIR, f"pdf_{pdf_id}"))
+        total += backfill(f"pdf_{pdf_id}", vectordb, catalog_years, batch_size, dry_run)
+
+    print(f"完成: {'需要' if dry_run else '已'}补写 {total} 个分块")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="为已入库的PDF分块补写数值年份year_num")
+    parser.add_argument("--batch-size", type=int, default=1000, help="每批读取的分块数")
+    parser.add_argument("--dry-run", action="store_true", help="只统计需要补写的分块，不写入")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main(args.batch_size, args.dry_run))
@@ -0,0 +1,135 @@
+"""
+文本列压缩基准测试
+
+用数据库中的文档内容（或指定的文本文件）比较不同压缩方式、级别和预置字典的
+压缩率与编解码吞吐量。字典用一半样本训练、另一半样本评估，避免结果偏高。
+
+用法（在backend目录下执行）:
+    python -m scripts.benchmark_compression --limit 500
+    python -m scripts.benchmark_compression --files "docs/**/*.md"
+    python -m scripts.benchmark_compression --train-dictionary uploads/dicts/v1.dict --codec zlib
+"""
+import argparse
+import glob
+import importlib.util
+import os
+import statistics
+import sys
+import time
+from typing import List, Optional
+
+from app.db.types import TextCompressor, train_dictionary
+
+# 导入所有模型，确保模型间的关系映射可以解析
+from app.models.user import User
+from app.models.document import Document
+from app.models.reference import Reference
+from app.models.pdf_source import PDFSource
+from app.models.document_version import DocumentVersion
+from app.models.comment import Comment
+from app.models.chunk_fingerprint import ChunkFingerprint
+from app.models.paper_metadata import PaperMetadata
+from app.models.reference_fingerprint import ReferenceFingerprint
+
+
+def load_from_db(limit: int) -> List[str]:
+    from app.db.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        texts = [row.content for row in db.query(Document.content).filter(
+            Document.content.isnot(None)
+        ).order_by(Document.id.desc()).limit(limit)]
+        # 版本关键帧与文档内容相近，补充少量不同时期的快照
+        texts += [row.content for row in db.query(DocumentVersion.content).filter(
+            DocumentVersion.content.isnot(None)
+        ).order_by(DocumentVersion.id.desc()).limit(limit // 4)]
+        return [t for t in texts if t]
+    finally:
+        db.close()
+
+
+def load_from_files(pattern: str, limit: int) -> List[str]:
+    texts = []
+    for path in sorted(glob.glob(pattern, recursive=True))[:limit]:
+        if os.path.isfile(path):
+            with open(path, encoding="utf-8", errors="replace") as f:
+                texts.append(f.read())
+    return texts
+
+
+def measure(name: str, compressor: TextCompressor, texts: List[str], repeat: int) -> None:
+    original = sum(len(t.encode("utf-8")) for t in texts)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        packed = [compressor.compress(t) for t in texts]
+    encode_seconds = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for value in packed:
+            compressor.decompress(value)
+    decode_seconds = (time.perf_counter() - start) / repeat
+
+    assert [compressor.decompress(value) for value in packed] == texts
+    stored = sum(len(value) for value in packed)
+    ratios = [len(t.encode("utf-8")) / len(value) for t, value in zip(texts, packed) if value]
+    print(
+        f"{name:<20} 压缩率 {original / stored:6.2f}x  中位数 {statistics.median(ratios):6.2f}x  "
+        f"压缩 {original / encode_seconds / 1e6:8.1f} MB/s  解压 {original / decode_seconds / 1e6:8.1f} MB/s"
+    )
+
+
+def main(args: argparse.Namespace) -> int:
+    texts = load_from_files(args.files, args.limit) if args.files else load_from_db(args.limit)
+    if len(texts) < 2:
+        print("样本不足（至少需要2条文本）", file=sys.stderr)
+        return 1
+
+    if args.train_dictionary:
+        dictionary = train_dictionary(texts, args.dictionary_size, codec=args.codec)
+        os.makedirs(os.path.dirname(os.path.abspath(args.train_dictionary)), exist_ok=True)
+        with open(args.train_dictionary, "wb") as f:
+            f.write(dictionary)
+        print(f"已生成{args.codec}字典: {args.train_dictionary}（{len(dictionary)} 字节，{len(texts)} 条样本）")
+        return 0
+
+    train, test = texts[::2], texts[1::2]
+    total = sum(len(t.encode("utf-8")) for t in test)
+    print(f"评估样本: {len(test)} 条，{total / 1e6:.2f} MB（字典训练样本 {len(train)} 条），最小压缩大小 {args.min_size} 字节")
+
+    measure("none", TextCompressor("none"), test, args.repeat)
+    zlib_dictionary = train_dictionary(train, args.dictionary_size, codec="zlib")
+    for level in (1, 6, 9):
+        measure(f"zlib-{level}", TextCompressor("zlib", level, args.min_size), test, args.repeat)
+    measure("zlib-6+dict", TextCompressor("zlib", 6, args.min_size, zlib_dictionary), test, args.repeat)
+
+    if importlib.util.find_spec("zstandard") is None:
+        print("未安装zstandard，跳过zstd")
+    else:
+        for level in (3, 9, 19):
+            measure(f"zstd-{level}", TextCompressor("zstd", level, args.min_size), test, args.repeat)
+        zstd_dictionary: Optional[bytes] = None
+        try:
+            zstd_dictionary = train_dictionary(train, args.dictionary_size, codec="zstd")
+        except Exception as e:
+            # 样本太少或太小时zstd字典训练会失败
+            print(f"zstd字典训练失败: {str(e)}")
+        if zstd_dictionary:
+            measure("zstd-3+dict", TextCompressor("zstd", 3, args.min_size, zstd_dictionary), test, args.repeat)
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="文本列压缩基准测试")
+    parser.add_argument("--files", default=None, help="文本文件的glob模式，默认读取数据库中的文档")
+    parser.add_argument("--limit", type=int, default=200, help="最多读取的样本数")
+    parser.add_argument("--repeat", type=int, default=3, help="每种配置重复编解码的次数")
+    parser.add_argument("--min-size", type=int, default=1024, help="小于该字节数的文本不压缩")
+    parser.add_argument("--dictionary-size", type=int, default=32 * 1024, help="字典大小（字节）")
+    parser.add_argument("--codec", default="zlib", choices=["zlib", "zstd"], help="生成字典所用的压缩方式")
+    parser.add_argument("--train-dictionary", default=None, help="用全部样本生成字典并写入该路径，不运行基准测试")
+    args = parser.parse_args()
+
+    sys.exit(main(args))
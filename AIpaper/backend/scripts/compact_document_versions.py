@@ -0,0 +1,120 @@
+"""
+将已有的文档版本（完整快照）转换为增量存储
+
+旧版本不转换也可以正常读取（视为关键帧），转换后历史版本只保留关键帧的完整快照。
+
+用法（在backend目录下执行）:
+    python -m scripts.compact_document_versions
+    python -m scripts.compact_document_versions --document-id 42
+    python -m scripts.compact_document_versions --unique-index
+    python -m scripts.compact_document_versions --finalize-pending
+"""
+import argparse
+import logging
+import sys
+
+from sqlalchemy import func, text
+
+from app.db.database import SessionLocal, engine
+from app.services.version_store_service import VersionStoreService
+
+# 导入所有模型，确保模型间的关系映射可以解析
+from app.models.user import User
+from app.models.document import Document
+from app.models.reference import Reference
+from app.models.pdf_source import PDFSource
+from app.models.document_version import DocumentVersion
+from app.models.comment import Comment
+from app.models.chunk_fingerprint import ChunkFingerprint
+from app.models.paper_metadata import PaperMetadata
+from app.models.reference_fingerprint import ReferenceFingerprint
+
+
+INDEX_NAME = "ix_document_versions_document_id_version_number"
+
+
+def ensure_unique_index() -> int:
+    """将已有库中 (document_id, version_number) 的普通索引替换为唯一索引，存在重复版本号时不做修改"""
+    db = SessionLocal()
+    try:
+        duplicates = db.query(
+            DocumentVersion.document_id, DocumentVersion.version_number, func.count(DocumentVersion.id)
+        ).group_by(
+            DocumentVersion.document_id, DocumentVersion.version_number
+        ).having(func.count(DocumentVersion.id) > 1).all()
+    finally:
+        db.close()
+    if duplicates:
+        for document_id, version_number, count in duplicates:
+            print(f"文档 {document_id} 的版本号 {version_number} 有 {count} 条记录", flush=True)
+        print("存在重复版本号，请先处理后再创建唯一索引")
+        return 1
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP INDEX IF EXISTS {INDEX_NAME}"))
+        conn.execute(text(
+            f"CREATE UNIQUE INDEX {INDEX_NAME} ON document_versions (document_id, version_number)"
+        ))
+    print("已创建唯一索引")
+    return 0
+
+
+def finalize_pending() -> int:
+    """完成进程退出时仍在队列中的版本转换（变更摘要和增量）"""
+    db = SessionLocal()
+    try:
+        pending = VersionStoreService.pending_finalize(db)
+    finally:
+        db.close()
+    for _, version_id in pending:
+        VersionStoreService.finalize_version(version_id)
+    print(f"完成: 处理未完成转换的版本 {len(pending)} 个")
+    return 0
+
+
+def main(document_id: int) -> int:
+    db = SessionLocal()
+    try:
+        if document_id is not None:
+            document_ids = [document_id]
+        else:
+            # 只处理还有未转换旧版本的文档
+            document_ids = [
+                row.document_id for row in db.query(DocumentVersion.document_id).filter(
+                    DocumentVersion.is_keyframe.is_(None)
+                ).distinct().order_by(DocumentVersion.document_id)
+            ]
+
+        totals = {"versions": 0, "converted": 0, "keyframes": 0}
+        for doc_id in document_ids:
+            stats = VersionStoreService.compact_document(db, doc_id)
+            for key in totals:
+                totals[key] += stats[key]
+            print(
+                f"文档 {doc_id}: {stats['versions']} 个版本，转换为增量 {stats['converted']} 个，"
+                f"关键帧 {stats['keyframes']} 个",
+                flush=True,
+            )
+
+        print(
+            f"完成: {len(document_ids)} 个文档，{totals['versions']} 个版本，"
+            f"转换为增量 {totals['converted']} 个，关键帧 {totals['keyframes']} 个"
+        )
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="将文档版本转换为增量存储")
+    parser.add_argument("--document-id", type=int, default=None, help="只处理指定文档")
+    parser.add_argument("--unique-index", action="store_true", help="将版本号索引替换为唯一索引（已有库升级时执行一次）")
+    parser.add_argument("--finalize-pending", action="store_true", help="完成未完成的后台版本转换")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    if args.unique_index:
+        sys.exit(ensure_unique_index())
+    if args.finalize_pending:
+        sys.exit(finalize_pending())
+    sys.exit(main(args.document_id))
@@ -0,0 +1,214 @@
+"""
+Crossref / Semantic Scholar 本地模拟服务
+
+返回预先录制的Crossref条目（未匹配的查询按查询词生成条目），可配置响应延迟、
+错误率和429比例，用于在不访问公共API的情况下压测引用搜索。
+
+用法（在backend目录下执行）:
+    python -m scripts.fake_upstream --port 8099 --latency 200 --jitter 80 --error-rate 0.02 --rate-limit-rate 0.01
+
+启动后端前将上游地址指向模拟服务:
+    CROSSREF_API_URL=http://127.0.0.1:8099/works
+    SEMANTIC_SCHOLAR_API_URL=http://127.0.0.1:8099/graph/v1
+
+GET /_stats 返回各接口的请求计数，POST /_reset 清零。
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "crossref_works.json")
+
+_WORD = re.compile(r"\w+")
+
+
+def load_fixtures(path: str) -> List[Dict[str, Any]]:
+    """读取录制的Crossref条目，支持条目列表或完整的Crossref响应"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        message = data.get("message", data)
+        data = message.get("items", [message])
+    return data
+
+
+def tokens(text: str) -> set:
+    return set(_WORD.findall(text.lower()))
+
+
+def to_semantic_scholar(item: Dict[str, Any]) -> Dict[str, Any]:
+    """将Crossref条目转换为Semantic Scholar的论文格式"""
+    date_parts = (item.get("issued") or {}).get("date-parts") or [[None]]
+    return {
+        "paperId": hashlib.sha1(item["DOI"].encode("utf-8")).hexdigest(),
+        "title": (item.get("title") or [""])[0],
+        "authors": [
+            {"name": f"{author.get('given', '')} {author.get('family', '')}".strip()}
+            for author in item.get("author", [])
+        ],
+        "venue": (item.get("container-title") or [""])[0],
+        "year": date_parts[0][0],
+        "abstract": None,
+        "url": item.get("URL"),
+        "citationCount": int(hashlib.sha1(item["DOI"].encode("utf-8")).hexdigest()[:4], 16) % 500,
+        "externalIds": {"DOI": item["DOI"]},
+    }
+
+
+class FakeUpstream:
+    """模拟上游的状态：条目、故障注入参数和请求计数"""
+
+    def __init__(self, fixtures: List[Dict[str, Any]], args: argparse.Namespace):
+        self.fixtures = fixtures
+        self.by_doi = {item["DOI"].lower(): item for item in fixtures}
+        self.args = args
+        self.random = random.Random(args.seed)
+        self.stats: Counter = Counter()
+
+    def synthesize(self, query: str, n: int) -> Dict[str, Any]:
+        """按查询词生成确定性的条目，相同查询每次返回相同结果"""
+        digest = hashlib.sha1(f"{query}:{n}".encode("utf-8")).hexdigest()
+        words = sorted(tokens(query)) or ["untitled"]
+        return {
+            "DOI": f"10.5555/fake.{digest[:12]}",
+            "type": "journal-article",
+            "title": [f"{' '.join(words).title()}: Study {n + 1}"],
+            "author": [{"given": "A.", "family": f"Author{int(digest[12:16], 16) % 1000}"}],
+            "container-title": ["Journal of Synthetic Results"],
+            "publisher": "Fake Upstream",
+            "issued": {"date-parts": [[1990 + int(digest[16:18], 16) % 35]]},
+            "volume": str(int(digest[18:20], 16) % 60 + 1),
+            "page": f"{int(digest[20:22], 16)}-{int(digest[20:22], 16) + 12}",
+            "URL": f"https://doi.org/10.5555/fake.{digest[:12]}",
+        }
+
+    def search(self, query: str, rows: int) -> List[Dict[str, Any]]:
+        """按词重合度排序录制条目，不足时补充生成的条目"""
+        query_tokens = tokens(query)
+        scored = sorted(
+            ((len(query_tokens & tokens((item.get("title") or [""])[0])), i) for i, item in enumerate(self.fixtures)),
+            reverse=True
+        )
+        items = [self.fixtures[i] for score, i in scored if score > 0][:rows]
+        if not self.args.no_synthesize:
+            items += [self.synthesize(query, n) for n in range(rows - len(items))]
+        return items
+
+    def lookup(self, doi: str) -> Optional[Dict[str, Any]]:
+        doi = doi.lower()
+        if doi in self.by_doi:
+            return self.by_doi[doi]
+        if doi.startswith("10.5555/fake.") or (not self.args.no_synthesize and "notfound" not in doi):
+            item = self.synthesize(doi, 0)
+            item["DOI"] = doi
+            return item
+        return None
+
+    async def inject(self, route: str) -> Optional[web.Response]:
+        """模拟延迟，并按配置比例返回429或503"""
+        self.stats[route] += 1
+        latency = self.args.latency
+        if route == "semantic_scholar" and self.args.s2_latency is not None:
+            latency = self.args.s2_latency
+        delay = max(0.0, self.random.gauss(latency, self.args.jitter)) / 1000
+        await asyncio.sleep(delay)
+
+        roll = self.random.random()
+        if roll < self.args.rate_limit_rate:
+            self.stats[f"{route}_429"] += 1
+            return web.json_response(
+                {"status": "error", "message": "Too Many Requests"},
+                status=429,
+                headers={"Retry-After": str(self.args.retry_after)}
+            )
+        if roll < self.args.rate_limit_rate + self.args.error_rate:
+            self.stats[f"{route}_5xx"] += 1
+            return web.json_response({"status": "error", "message": "Service Unavailable"}, status=503)
+        return None
+
+
+def create_app(upstream: FakeUpstream) -> web.Application:
+    routes = web.RouteTableDef()
+
+    @routes.get("/works")
+    async def crossref_works(request: web.Request) -> web.Response:
+        failure = await upstream.inject("crossref")
+        if failure:
+            return failure
+        params = request.query
+        rows = int(params.get("rows", 20))
+        if "filter" in params:
+            dois = [part[4:] for part in params["filter"].split(",") if part.startswith("doi:")]
+            items = [item for item in (upstream.lookup(doi) for doi in dois) if item]
+        else:
+            query = params.get("query.bibliographic") or params.get("query") or ""
+            items = upstream.search(query, rows)
+        return web.json_response({
+            "status": "ok",
+            "message-type": "work-list",
+            "message": {"items": items[:rows], "total-results": len(items)},
+        })
+
+    @routes.get("/works/{doi:.+}")
+    async def crossref_work(request: web.Request) -> web.Response:
+        failure = await upstream.inject("crossref")
+        if failure:
+            return failure
+        item = upstream.lookup(request.match_info["doi"])
+        if item is None:
+            return web.Response(status=404, text="Resource not found.")
+        return web.json_response({"status": "ok", "message-type": "work", "message": item})
+
+    @routes.get("/graph/v1/paper/search")
+    async def semantic_scholar_search(request: web.Request) -> web.Response:
+        failure = await upstream.inject("semantic_scholar")
+        if failure:
+            return failure
+        limit = int(request.query.get("limit", 10))
+        items = upstream.search(request.query.get("query", ""), limit)
+        return web.json_response({
+            "total": len(items),
+            "offset": 0,
+            "data": [to_semantic_scholar(item) for item in items],
+        })
+
+    @routes.get("/_stats")
+    async def stats(request: web.Request) -> web.Response:
+        return web.json_response(dict(upstream.stats))
+
+    @routes.post("/_reset")
+    async def reset(request: web.Request) -> web.Response:
+        upstream.stats.clear()
+        return web.json_response({"status": "ok"})
+
+    app = web.Application()
+    app.add_routes(routes)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crossref / Semantic Scholar 本地模拟服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES, help="录制的Crossref条目（JSON）")
+    parser.add_argument("--latency", type=float, default=150.0, help="平均响应延迟（毫秒）")
+    parser.add_argument("--jitter", type=float, default=50.0, help="延迟标准差（毫秒）")
+    parser.add_argument("--s2-latency", type=float, default=None, help="Semantic Scholar的平均延迟，默认与--latency相同")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回503的比例")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="返回429的比例")
+    parser.add_argument("--retry-after", type=int, default=1, help="429响应的Retry-After（秒）")
+    parser.add_argument("--no-synthesize", action="store_true", help="只返回录制的条目，不生成条目")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子")
+    args = parser.parse_args()
+
+    upstream = FakeUpstream(load_fixtures(args.fixtures), args)
+    print(f"模拟上游已启动: http://{args.host}:{args.port}（{len(upstream.fixtures)} 条录制条目）", flush=True)
+    web.run_app(create_app(upstream), host=args.host, port=args.port, print=None)
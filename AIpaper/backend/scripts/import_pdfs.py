@@ -0,0 +1,62 @@
+"""
+PDF批量导入命令行工具
+
+用法（在backend目录下执行）:
+    python -m scripts.import_pdfs /path/to/library.zip
+    python -m scripts.import_pdfs /path/to/pdf_dir --concurrency 8
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+from app.services.import_service import ImportService
+
+# 导入所有模型，确保模型间的关系映射可以解析
+from app.models.user import User
+from app.models.document import Document
+from app.models.reference import Reference
+from app.models.pdf_source import PDFSource
+from app.models.document_version import DocumentVersion
+from app.models.comment import Comment
+from app.models.chunk_fingerprint import ChunkFingerprint
+from app.models.paper_metadata import PaperMetadata
+from app.models.reference_fingerprint import ReferenceFingerprint
+
+
+async def main(path: str, concurrency: int, document_id: int, interval: float) -> int:
+    job = ImportService.create_job(path)
+    task = asyncio.create_task(
+        ImportService.run_import(job, path, concurrency=concurrency, document_id=document_id)
+    )
+
+    # 定期输出汇总进度
+    while not task.done():
+        await asyncio.wait({task}, timeout=interval)
+        done = job["processed"] + job["failed"] + job["skipped_duplicates"]
+        print(
+            f"[{job['status']}] {done}/{job['total']} "
+            f"处理成功 {job['processed']}，跳过重复 {job['skipped_duplicates']}，失败 {job['failed']}",
+            flush=True,
+        )
+
+    for error in job["errors"]:
+        print(f"  失败: {error}", file=sys.stderr)
+
+    return 0 if job["status"] == "completed" else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="从ZIP文件或目录批量导入PDF")
+    parser.add_argument("path", help="ZIP文件或包含PDF的目录")
+    parser.add_argument("--concurrency", type=int, default=None, help="并行处理的PDF数量")
+    parser.add_argument("--document-id", type=int, default=None, help="导入的PDF关联的文档ID")
+    parser.add_argument("--interval", type=float, default=2.0, help="进度输出间隔（秒）")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        parser.error(f"路径不存在: {args.path}")
+
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(asyncio.run(main(args.path, args.concurrency, args.document_id, args.interval)))
@@ -0,0 +1,194 @@
+"""
+引用搜索压测工具
+
+按目标QPS向 /api/references/search 发送请求（开环：按固定间隔发出，不等待前一个请求返回），
+统计延迟分位数、错误数和部分结果比例，并根据 /metrics 的前后差值计算缓存命中率和上游请求数。
+
+用法（在backend目录下执行，后端和 scripts.fake_upstream 已启动）:
+    python -m scripts.loadtest_references --qps 50 --duration 30
+    python -m scripts.loadtest_references --qps 100 --duration 60 --repeat-ratio 0.8 \\
+        --upstream-stats http://127.0.0.1:8099/_stats
+"""
+import argparse
+import asyncio
+import random
+import re
+import sys
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+WORDS = (
+    "deep learning neural network graph attention transformer retrieval augmented language model "
+    "vision protein folding reinforcement policy gradient convolution recurrent memory optimization "
+    "bayesian inference causal discovery federated privacy quantum chemistry molecular dynamics "
+    "climate forecasting citation recommendation summarization translation speech recognition"
+).split()
+
+_METRIC_LINE = re.compile(r"^([a-zA-Z_:][\w:]*)(\{[^}]*\})?\s+([-+\deE.]+)$")
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def parse_metrics(text: str) -> Dict[Tuple[str, str], float]:
+    """解析Prometheus文本格式，返回 (指标名, 标签) -> 值"""
+    metrics = {}
+    for line in text.splitlines():
+        match = _METRIC_LINE.match(line.strip())
+        if match:
+            metrics[(match.group(1), match.group(2) or "")] = float(match.group(3))
+    return metrics
+
+
+async def fetch_metrics(session: aiohttp.ClientSession, url: str) -> Dict[Tuple[str, str], float]:
+    try:
+        async with session.get(url) as response:
+            return parse_metrics(await response.text())
+    except aiohttp.ClientError:
+        return {}
+
+
+async def fetch_json(session: aiohttp.ClientSession, url: Optional[str]) -> Dict[str, int]:
+    if not url:
+        return {}
+    try:
+        async with session.get(url) as response:
+            return await response.json()
+    except aiohttp.ClientError:
+        return {}
+
+
+class QueryGenerator:
+    """
+    生成查询：按repeat_ratio从已发出的热门查询中重复选取（用于测试缓存），其余为新查询
+    """
+
+    def __init__(self, repeat_ratio: float, hot_set: int, seed: Optional[int]):
+        self.repeat_ratio = repeat_ratio
+        self.hot_set = hot_set
+        self.random = random.Random(seed)
+        self.issued: List[str] = []
+
+    def next(self) -> str:
+        if self.issued and self.random.random() < self.repeat_ratio:
+            # 偏向最早的查询，近似Zipf分布
+            pool = self.issued[:self.hot_set]
+            return pool[min(int(self.random.expovariate(1 / max(1, len(pool) / 5))), len(pool) - 1)]
+        query = " ".join(self.random.sample(WORDS, self.random.randint(2, 4)))
+        self.issued.append(query)
+        return query
+
+
+async def run(args: argparse.Namespace) -> int:
+    base_url = args.base_url.rstrip("/")
+    generator = QueryGenerator(args.repeat_ratio, args.hot_set, args.seed)
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    sources: Counter = Counter()
+    partial = 0
+    in_flight = 0
+    max_in_flight = 0
+
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    connector = aiohttp.TCPConnector(limit=args.max_connections)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        metrics_before = await fetch_metrics(session, f"{base_url}/metrics")
+        upstream_before = await fetch_json(session, args.upstream_stats)
+
+        async def one(query: str) -> None:
+            nonlocal partial, in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            started = time.perf_counter()
+            try:
+                async with session.get(f"{base_url}/api/references/search",
+                                       params={"query": query, "limit": args.limit}) as response:
+                    body = await response.json() if response.status == 200 else None
+                    statuses[str(response.status)] += 1
+                if body:
+                    partial += bool(body.get("partial"))
+                    for source, state in (body.get("sources") or {}).items():
+                        sources[f"{source}:{state}"] += 1
+            except asyncio.TimeoutError:
+                statuses["timeout"] += 1
+            except aiohttp.ClientError as e:
+                statuses[type(e).__name__] += 1
+            finally:
+                latencies.append(time.perf_counter() - started)
+                in_flight -= 1
+
+        total = int(args.qps * args.duration)
+        interval = 1 / args.qps
+        tasks = []
+        start = time.perf_counter()
+        for i in range(total):
+            delay = start + i * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(one(generator.next())))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+        metrics_after = await fetch_metrics(session, f"{base_url}/metrics")
+        upstream_after = await fetch_json(session, args.upstream_stats)
+
+    ok = statuses.get("200", 0)
+    print(f"请求数: {total}  耗时: {elapsed:.1f}s  实际QPS: {total / elapsed:.1f}  最大并发: {max_in_flight}")
+    print(f"状态: {dict(statuses)}")
+    print(
+        "延迟(ms): "
+        + "  ".join(f"p{p}={percentile(latencies, p) * 1000:.1f}" for p in (50, 90, 95, 99))
+        + f"  max={max(latencies) * 1000:.1f}"
+    )
+    if ok:
+        print(f"部分结果: {partial}/{ok} ({partial / ok:.1%})")
+    if sources:
+        print(f"数据源状态: {dict(sources)}")
+
+    def delta(name: str, label_filter: str = "") -> Dict[str, float]:
+        result = {}
+        for (metric, labels), value in metrics_after.items():
+            if metric == name and label_filter in labels:
+                result[labels] = value - metrics_before.get((metric, labels), 0)
+        return result
+
+    cache = delta("cache_requests_total", 'cache="reference_search"')
+    if cache:
+        lookups = sum(cache.values())
+        misses = sum(v for labels, v in cache.items() if 'result="miss"' in labels)
+        if lookups:
+            print(f"搜索缓存命中率: {1 - misses / lookups:.1%}（{int(lookups)} 次查询）")
+    upstream = delta("reference_upstream_requests_total")
+    if upstream:
+        print("上游请求（应用统计）: " + ", ".join(f"{labels} {int(v)}" for labels, v in sorted(upstream.items()) if v))
+    if upstream_after:
+        counts = {key: upstream_after[key] - upstream_before.get(key, 0) for key in upstream_after}
+        print(f"上游请求（模拟服务统计）: {counts}")
+
+    return 0 if ok == total else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="引用搜索压测")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="后端地址")
+    parser.add_argument("--qps", type=float, default=20.0, help="目标每秒请求数")
+    parser.add_argument("--duration", type=float, default=30.0, help="压测时长（秒）")
+    parser.add_argument("--limit", type=int, default=10, help="每次搜索的结果数量")
+    parser.add_argument("--repeat-ratio", type=float, default=0.5, help="重复已发出查询的比例")
+    parser.add_argument("--hot-set", type=int, default=50, help="重复查询时的候选查询数")
+    parser.add_argument("--timeout", type=float, default=10.0, help="单个请求超时（秒）")
+    parser.add_argument("--max-connections", type=int, default=500, help="客户端最大连接数")
+    parser.add_argument("--upstream-stats", default=None, help="模拟上游的统计地址，如 http://127.0.0.1:8099/_stats")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子")
+    args = parser.parse_args()
+
+    sys.exit(asyncio.run(run(args)))
@@ -0,0 +1,97 @@
+"""
+将文档内容和版本快照列转换为压缩存储
+
+PostgreSQL上先把TEXT列改为BYTEA（原文按UTF-8转换，无需改写即可读取），
+再按批重写已有数据使其按当前配置压缩。SQLite列类型不受限制，只需重写数据。
+
+用法（在backend目录下执行）:
+    python -m scripts.migrate_compressed_text
+    python -m scripts.migrate_compressed_text --alter-only
+"""
+import argparse
+import logging
+import sys
+
+from sqlalchemy import text, update
+
+from app.db.database import SessionLocal, engine
+
+# 导入所有模型，确保模型间的关系映射可以解析
+from app.models.user import User
+from app.models.document import Document
+from app.models.reference import Reference
+from app.models.pdf_source import PDFSource
+from app.models.document_version import DocumentVersion
+from app.models.comment import Comment
+from app.models.chunk_fingerprint import ChunkFingerprint
+from app.models.paper_metadata import PaperMetadata
+from app.models.reference_fingerprint import ReferenceFingerprint
+
+# 表 -> 压缩列
+COLUMNS = {
+    Document: ["content"],
+    DocumentVersion: ["content", "outline"],
+}
+
+
+def alter_columns() -> None:
+    """PostgreSQL: 将TEXT列改为BYTEA"""
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        for model, columns in COLUMNS.items():
+            table = model.__tablename__
+            for column in columns:
+                data_type = conn.execute(text(
+                    "SELECT data_type FROM information_schema.columns "
+                    "WHERE table_name = :table AND column_name = :column"
+                ), {"table": table, "column": column}).scalar()
+                if data_type == "bytea":
+                    continue
+                conn.execute(text(
+                    f"ALTER TABLE {table} ALTER COLUMN {column} TYPE BYTEA USING convert_to({column}, 'UTF8')"
+                ))
+                print(f"{table}.{column}: {data_type} -> bytea", flush=True)
+
+
+def recompress(model, columns, batch_size: int) -> int:
+    """按主键分批读取并重写压缩列（读出时自动解压，写入时按当前配置压缩）"""
+    db = SessionLocal()
+    count = 0
+    last_id = 0
+    try:
+        while True:
+            # 显式带上updated_at，避免重写数据改变文档的修改时间
+            extra = [model.updated_at] if hasattr(model, "updated_at") else []
+            rows = db.query(model.id, *[getattr(model, c) for c in columns], *extra).filter(
+                model.id > last_id
+            ).order_by(model.id).limit(batch_size).all()
+            if not rows:
+                break
+            db.execute(update(model), [row._asdict() for row in rows])
+            db.commit()
+            count += len(rows)
+            last_id = rows[-1].id
+            print(f"{model.__tablename__}: {count}", flush=True)
+    finally:
+        db.close()
+    return count
+
+
+def main(alter_only: bool, batch_size: int) -> int:
+    alter_columns()
+    if alter_only:
+        return 0
+    for model, columns in COLUMNS.items():
+        recompress(model, columns, batch_size)
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="将文档内容和版本快照列转换为压缩存储")
+    parser.add_argument("--alter-only", action="store_true", help="只修改列类型，不重写已有数据")
+    parser.add_argument("--batch-size", type=int, default=200, help="每批重写的记录数")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main(args.alter_only, args.batch_size))
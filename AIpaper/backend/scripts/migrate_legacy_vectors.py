@@ -0,0 +1,152 @@
+"""
+将旧版按PDF单独存放的向量库迁移到所有PDF共享的向量集合
+
+检索只读取共享集合，旧版向量库（VECTOR_DIR/pdf_<id>）中的分块迁移后才能被检索到。
+本脚本把每个旧版向量库的分块连同已有的嵌入向量按SimHash去重写入共享集合，
+并为没有PDF源文件记录的PDF补建记录（不关联文档），使其可以按作者、期刊、关键词过滤。
+迁移完成的目录写入标记文件后保留，重复执行时跳过。
+
+用法（在backend目录下执行）:
+    python -m scripts.migrate_legacy_vectors
+    python -m scripts.migrate_legacy_vectors --dry-run
+    python -m scripts.migrate_legacy_vectors --reembed
+"""
+import argparse
+import logging
+import os
+import sys
+from typing import Any, Dict, List
+
+from langchain.schema import Document as ChunkDocument
+from langchain.vectorstores import Chroma
+
+from app.db.database import SessionLocal
+from app.services.pdf_service import PDFService
+from app.services.storage_service import get_storage
+
+# 导入所有模型，确保模型间的关系映射可以解析
+from app.models.user import User
+from app.models.document import Document
+from app.models.reference import Reference
+from app.models.pdf_source import PDFSource
+from app.models.document_version import DocumentVersion
+from app.models.comment import Comment
+from app.models.chunk_fingerprint import ChunkFingerprint
+from app.models.paper_metadata import PaperMetadata
+from app.models.reference_fingerprint import ReferenceFingerprint
+
+
+def load_chunks(pdf_id: str) -> Dict[str, Any]:
+    """读取旧版向量库中的全部分块（单个PDF的分块数有限，一次读取）"""
+    vectordb = Chroma(persist_directory=os.path.join(PDFService.VECTOR_DIR, f"pdf_{pdf_id}"))
+    return vectordb._collection.get(include=["embeddings", "metadatas", "documents"])
+
+
+def build_documents(pdf_id: str, chunks: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """按原分块顺序整理分块内容、元数据和嵌入向量"""
+    rows = []
+    for position, (content, metadata, embedding) in enumerate(
+            zip(chunks["documents"], chunks["metadatas"], chunks["embeddings"])):
+        metadata = dict(metadata or {})
+        rows.append({
+            "order": (metadata.get("chunk_id", position), position),
+            "content": content or "",
+            "metadata": metadata,
+            "embedding": embedding,
+        })
+    rows.sort(key=lambda row: row["order"])
+
+    for index, row in enumerate(rows):
+        metadata = row["metadata"]
+        metadata.pop("chunk_uid", None)
+        metadata.pop("simhash", None)
+        metadata["pdf_id"] = pdf_id
+        metadata["chunk_id"] = index
+        year_num = PDFService._parse_year(metadata.get("year"))
+        if year_num is not None:
+            metadata["year_num"] = year_num
+    return rows
+
+
+def backfill_pdf_source(pdf_id: str, metadata: Dict[str, Any], chunk_count: int) -> str:
+    """为没有PDF源文件记录的PDF补建记录，已有但未完成索引的记录更新为已完成"""
+    fields = PDFService.indexed_source_fields(metadata, chunk_count)
+    db = SessionLocal()
+    try:
+        rows = db.query(PDFSource).filter(PDFSource.vector_db_id == pdf_id).all()
+        if not rows:
+            file_info = get_storage().get_metadata(pdf_id) or {}
+            db.add(PDFSource(
+                filename=file_info.get("filename") or metadata.get("source") or f"{pdf_id}.pdf",
+                file_path=get_storage().object_key(pdf_id),
+                file_size=file_info.get("size") or 0,
+                vector_db_id=pdf_id,
+                document_id=None,
+                **fields
+            ))
+            db.commit()
+            return "created"
+
+        updated = False
+        for row in rows:
+            if row.index_status != "completed":
+                for key, value in fields.items():
+                    setattr(row, key, value)
+                updated = True
+        db.commit()
+        return "updated" if updated else "kept"
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def migrate(pdf_id: str, reembed: bool, dry_run: bool) -> Dict[str, Any]:
+    """迁移单个旧版向量库"""
+    rows = build_documents(pdf_id, load_chunks(pdf_id))
+    if dry_run or not rows:
+        return {"chunks": len(rows), "stored": 0, "duplicates": 0, "source": "-"}
+
+    documents = [ChunkDocument(page_content=row["content"], metadata=row["metadata"]) for row in rows]
+    vectors = None if reembed else {
+        index: list(row["embedding"]) for index, row in enumerate(rows) if row["embedding"] is not None
+    }
+    stats = PDFService._store_chunks(pdf_id, documents, vectors)
+    source = backfill_pdf_source(pdf_id, rows[0]["metadata"], len(rows))
+
+    marker = os.path.join(PDFService.VECTOR_DIR, f"pdf_{pdf_id}", PDFService.LEGACY_MIGRATED_MARKER)
+    with open(marker, "w", encoding="utf-8") as f:
+        f.write(f"{PDFService.SHARED_COLLECTION}\n")
+    return {"chunks": len(rows), "source": source, **stats}
+
+
+def main(reembed: bool, dry_run: bool) -> int:
+    pdf_ids = PDFService._legacy_store_ids(None)
+    failed = 0
+    for pdf_id in pdf_ids:
+        try:
+            stats = migrate(pdf_id, reembed, dry_run)
+        except Exception as e:
+            # 单个向量库损坏或向量维度不一致时跳过，不影响其余PDF
+            failed += 1
+            print(f"pdf_{pdf_id}: 迁移失败: {e}", flush=True)
+            continue
+        print(
+            f"pdf_{pdf_id}: {stats['chunks']} 个分块，写入 {stats['stored']} 个，"
+            f"重复 {stats['duplicates']} 个，源文件记录 {stats['source']}",
+            flush=True,
+        )
+
+    print(f"完成: {len(pdf_ids)} 个旧版向量库，失败 {failed} 个{'（未写入）' if dry_run else ''}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="将旧版独立向量库迁移到共享向量集合")
+    parser.add_argument("--reembed", action="store_true", help="重新计算嵌入向量（嵌入模型已更换时使用）")
+    parser.add_argument("--dry-run", action="store_true", help="只统计分块，不写入")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main(args.reembed, args.dry_run))